@@ -12,7 +12,7 @@ __version__ = '1.0 (stable)'
 # Import high-level  modules
 from . import grid,options,display,main,atomic_populations
 
-from .qcinfo import QCinfo
+from .qcinfo import QCinfo,MOSpec
 from .grid import grid_init,get_grid,set_grid
 from .main import run_orbkit,init
 from .read import main_read
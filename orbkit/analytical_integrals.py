@@ -28,12 +28,11 @@ You should have received a copy of the GNU Lesser General Public
 License along with orbkit.  If not, see <http://www.gnu.org/licenses/>.
 '''
 import numpy
-from multiprocessing import Pool
 
 from orbkit import cy_overlap
-from orbkit.core import exp,lquant,get_lxlylz,get_cart2sph,l_deg
+from orbkit.core import exp,lquant,get_lxlylz,get_cart2sph,l_deg,BasisPlan
 from orbkit.core import create_mo_coeff,validate_drv,require
-from orbkit.omp_functions import slicer
+from orbkit.omp_functions import slicer,executor
 
 def get_ao_overlap(coord_a,coord_b,ao_spec,ao_spherical=None,lxlylz_b=None,
                    drv=None):
@@ -165,47 +164,18 @@ def cartesian2spherical_aoom(ao_overlap_matrix,ao_spec,ao_spherical):
   
   ..hint: 
   
-    Only supported up to g atomic orbitals and only for contracted 
-    atomic orbitals.
+    Only supported for contracted atomic orbitals. The transformation is 
+    carried out as T . S . T^T with the sparse transformation matrix T of 
+    :class:`orbkit.core.BasisPlan`.
   '''
+  plan = BasisPlan(None,ao_spec,ao_spherical)
   
-  # Get the exponents of the Cartesian basis functions
-  exp_list,assign = get_lxlylz(ao_spec,get_assign=True)
-  
-  if ao_overlap_matrix.shape != (len(exp_list),len(exp_list)):
+  if ao_overlap_matrix.shape != (len(plan.lxlylz),len(plan.lxlylz)):
     raise IOError('No contraction is currently not supported for a '+ 
                   'spherical harmonics. Please come back'+
                   ' manually after calling `contract_ao_overlap_matrix()`.')
   
-  l = [[] for i in ao_spec]
-  for i,j in enumerate(assign):
-    l[j].append(i) 
-  
-  indices = []
-  c = 0
-  for i0,(j0,k0) in enumerate(ao_spherical):
-    sph0 = get_cart2sph(*k0)    
-    for c0 in range(len(sph0[0])):
-      for i,j in enumerate(l[j0]):
-        if tuple(exp_list[j]) == sph0[0][c0]:
-          indices.append(i + l[j0][0])
-      c += 1
-  
-  c = 0
-  aoom_sph = numpy.zeros((len(ao_spherical),len(ao_spherical)))
-  for i0,(j0,k0) in enumerate(ao_spherical):
-    sph0 = get_cart2sph(*k0)    
-    for c0 in range(len(sph0[0])):
-      d = 0 
-      for i1,(j1,k1) in enumerate(ao_spherical):
-        sph1 = get_cart2sph(*k1)
-        for c1 in range(len(sph1[0])):
-          aoom_sph[i0,i1] += (sph0[1][c0]*sph0[2] * sph1[1][c1]*sph1[2]
-                              * ao_overlap_matrix[indices[c],indices[d]])
-          d += 1
-      c+=1
-  
-  return aoom_sph
+  return plan.cartesian2spherical_matrix(ao_overlap_matrix)
 
 def get_mo_overlap(mo_a,mo_b,ao_overlap_matrix):
   '''Computes the overlap of two molecular orbitals.
@@ -244,9 +214,10 @@ def initializer(gargs):
 
 def get_slice(x):  
   return cy_overlap.mooverlapmatrix(global_args['mo_a'],global_args['mo_b'],
-                             global_args['ao_overlap_matrix'],x[0],x[1])
+                             global_args['ao_overlap_matrix'],x[0],x[1],
+                             numthreads=global_args.get('numthreads',1))
 
-def get_mo_overlap_matrix(mo_a,mo_b,ao_overlap_matrix,numproc=1):
+def get_mo_overlap_matrix(mo_a,mo_b,ao_overlap_matrix,numproc=1,numthreads=1):
   '''Computes the overlap of two sets of molecular orbitals.
   
   **Parameters:**
@@ -259,6 +230,8 @@ def get_mo_overlap_matrix(mo_a,mo_b,ao_overlap_matrix,numproc=1):
     Contains the overlap matrix of the basis set.
   numproc : int
     Specifies number of subprocesses for multiprocessing.
+  numthreads : int
+    Specifies number of OpenMP threads within each process.
   
   **Returns:**
   
@@ -267,7 +240,8 @@ def get_mo_overlap_matrix(mo_a,mo_b,ao_overlap_matrix,numproc=1):
   '''
   global_args = {'mo_a': create_mo_coeff(mo_a,name='mo_a'),
                  'mo_b': create_mo_coeff(mo_b,name='mo_b'),
-                 'ao_overlap_matrix': ao_overlap_matrix}
+                 'ao_overlap_matrix': require(ao_overlap_matrix,dtype='f'),
+                 'numthreads': numthreads}
     
   if ((global_args['mo_a'].shape[1] != ao_overlap_matrix.shape[0]) or
       (global_args['mo_b'].shape[1] != ao_overlap_matrix.shape[1])):
@@ -281,8 +255,8 @@ def get_mo_overlap_matrix(mo_a,mo_b,ao_overlap_matrix,numproc=1):
   
   # Start the worker processes
   if numproc > 1:
-    pool = Pool(processes=numproc, initializer=initializer, initargs=(global_args,))
-    it = pool.imap(get_slice, ij)
+    it = executor.imap(get_slice,ij,numproc,initializer=initializer,
+                       global_args=global_args)
   else:
     initializer(global_args)
   
@@ -291,17 +265,12 @@ def get_mo_overlap_matrix(mo_a,mo_b,ao_overlap_matrix,numproc=1):
   #--- Send each task to single processor
   for l,[m,n] in enumerate(ij):
     #--- Call function to compute one-electron density
-    mo_overlap_matrix[m:n,:] = it.next() if numproc > 1 else get_slice(ij[l])
-  
-  #--- Close the worker processes
-  if numproc > 1:  
-    pool.close()
-    pool.join()
+    mo_overlap_matrix[m:n,:] = next(it) if numproc > 1 else get_slice(ij[l])
   
   #cy_overlap.mooverlapmatrix(moom,mo_a,mo_b,ao_overlap_matrix,0,len(moom))
   return mo_overlap_matrix
 
-def get_moom_atoms(atoms,qc,mo_a,mo_b,ao_overlap_matrix,numproc=1):
+def get_moom_atoms(atoms,qc,mo_a,mo_b,ao_overlap_matrix,numproc=1,numthreads=1):
   '''Computes the molecular orbital overlap matrix for selected atoms.
     
   **Parameters:**
@@ -316,6 +285,8 @@ def get_moom_atoms(atoms,qc,mo_a,mo_b,ao_overlap_matrix,numproc=1):
     Contains the overlap matrix of the basis set.
   numproc : int
     Specifies number of subprocesses for multiprocessing.
+  numthreads : int
+    Specifies number of OpenMP threads within each process.
   
   **Returns:**
   
@@ -328,7 +299,8 @@ def get_moom_atoms(atoms,qc,mo_a,mo_b,ao_overlap_matrix,numproc=1):
   ao_overlap_matrix = numpy.ascontiguousarray(ao_overlap_matrix[:,indices])
   return get_mo_overlap_matrix(numpy.ascontiguousarray(mo_a),
                                numpy.ascontiguousarray(mo_b[:,indices]),
-                               ao_overlap_matrix,numproc=numproc)
+                               ao_overlap_matrix,numproc=numproc,
+                               numthreads=numthreads)
 
 def get_dipole_moment(qc,component=['x','y','z']):
   '''Computes the dipole moment analytically.
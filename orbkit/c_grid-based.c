@@ -8,15 +8,36 @@
 
 void c_lcreator(double* ao_list, int* lxlylz, double* coeff_list, 
                 double* at_pos, double* x, double* y, double* z, 
-                int npts, int ao_num , int pnum, int drv, int is_normalized)
+                ptrdiff_t npts, int ao_num , int pnum, int drv, 
+                int is_normalized)
 {
   // vector grid only!
+  c_lcreator_fused(ao_list, lxlylz, coeff_list, at_pos, x, y, z, 
+                   npts, ao_num, pnum, &drv, 1, ao_num*npts, npts, NULL, 
+                   is_normalized);
+}
+
+void c_lcreator_fused(double* ao_list, int* lxlylz, double* coeff_list, 
+                      double* at_pos, double* x, double* y, double* z, 
+                      ptrdiff_t npts, int ao_num , int pnum, int* drv, 
+                      int ndrv, ptrdiff_t ao_stride, ptrdiff_t ao_ld, 
+                      double* rcut2, int is_normalized)
+{
+  // vector grid only!
+  // The AOs (or derivatives thereof) requested by drv[0..ndrv-1] are computed 
+  // in one pass over the grid, i.e., the exponentials are shared.
+  // The result for drv[id] is stored at ao_list[id*ao_stride + il*ao_ld + i],
+  // i.e., npts may be a block of a larger grid with ao_ld points.
+  // All offsets are ptrdiff_t, since ao_num*npts may exceed the range of int.
+  // If rcut2 is not NULL, primitive ii is skipped at all points with a 
+  // squared distance to the atom larger than rcut2[ii].
   double *norm;
   double X, Y, Z;
   int *lx,*ly,*lz;
   double rr, *ao_l0;
   double sum;
-  int i,il,ii;
+  ptrdiff_t i;
+  int il,ii,id,is_zero;
 
   norm = (double*) malloc(ao_num * pnum * sizeof(double));
   lx = (int*) malloc(ao_num * sizeof(int));
@@ -42,31 +63,51 @@ void c_lcreator(double* ao_list, int* lxlylz, double* coeff_list,
     Z = z[i]-at_pos[2];
     rr = X*X+Y*Y+Z*Z;
     
+    is_zero = 1;
     for (ii=0; ii<pnum; ii++)
     {
+      if (rcut2 != NULL && rr > rcut2[ii])
+      {
+        ao_l0[ii] = 0.;
+        continue;
+      }
       ao_l0[ii] = coeff_list[2*ii+1] * exp(-coeff_list[2*ii] * rr);
+      is_zero = 0;
+    }
+    
+    if (is_zero)
+    {
+      // All primitives are negligible at this point
+      for (il=0; il<ao_num; il++)
+        for (id=0; id<ndrv; id++)
+          ao_list[id*ao_stride + il*ao_ld + i] = 0.;
+      continue;
     }
     
     for (il=0; il<ao_num; il++)
     {
-      sum = 0.;
-      if (drv == 0)
+      for (id=0; id<ndrv; id++)
       {
-        for (ii=0; ii<pnum; ii++)
+        sum = 0.;
+        if (drv[id] == 0)
         {
-          sum += norm[il*pnum + ii] * ao_l0[ii];
+          for (ii=0; ii<pnum; ii++)
+          {
+            sum += norm[il*pnum + ii] * ao_l0[ii];
+          }
+          sum *= xyz(X, Y, Z, lx[il], ly[il], lz[il]);
         }
-        sum *= xyz(X, Y, Z, lx[il], ly[il], lz[il]);
-      }
-      else
-      {
-        for (ii=0; ii<pnum; ii++)
+        else
         {
-          sum += norm[il*pnum + ii] * ao_l0[ii] *
-             get_ao_xyz(X, Y, Z, lx[il], ly[il], lz[il], coeff_list[2*ii], drv);
-        }        
+          for (ii=0; ii<pnum; ii++)
+          {
+            if (ao_l0[ii] == 0.) continue;
+            sum += norm[il*pnum + ii] * ao_l0[ii] *
+               get_ao_xyz(X, Y, Z, lx[il], ly[il], lz[il], coeff_list[2*ii], drv[id]);
+          }        
+        }
+        ao_list[id*ao_stride + il*ao_ld + i] = sum;
       }
-      ao_list[il*npts+i] = sum;
     }
   }
 
@@ -77,4 +118,144 @@ void c_lcreator(double* ao_list, int* lxlylz, double* coeff_list,
   free(lz);
   free(ao_l0);
 }
-  
\ No newline at end of file
+  
+void c_lcreator_reg(double* ao_list, int* lxlylz, double* coeff_list, 
+                    double* at_pos, double* x, double* y, double* z, 
+                    int nx, int ny, int nz, int ao_num , int pnum, 
+                    int* drv, int ndrv, ptrdiff_t ao_stride, 
+                    ptrdiff_t ao_ld, double* rcut2, int is_normalized)
+{
+  // regular grid only!
+  // A Cartesian Gaussian factorizes in x, y, and z, i.e., the exponential 
+  // and the polynomial are evaluated on the 1d axes and the AO is obtained 
+  // by an outer product.
+  // The result for drv[id] is stored at ao_list[id*ao_stride + il*ao_ld + i],
+  // i.e., the nx points may be a block of a larger x-axis.
+  // If rcut2 is not NULL, primitive ii is only evaluated for the grid points 
+  // with |X|, |Y|, and |Z| smaller than sqrt(rcut2[ii]).
+  static const int drv_xyz[10][3] = {{0,0,0},
+                                     {1,0,0},{0,1,0},{0,0,1},
+                                     {2,0,0},{0,2,0},{0,0,2},
+                                     {1,1,0},{1,0,1},{0,1,1}};
+  double *ex, *ey, *ez;
+  double *fx, *fy, *fz;
+  double *X, *Y, *Z;
+  double alpha, c, fxy, *ao, *gx, *gy, *gz;
+  int lx, ly, lz;
+  ptrdiff_t npts = (ptrdiff_t) nx*ny*nz, p;
+  int dmax[3] = {0,0,0};
+  int i0,i1,j0,j1,k0,k1;
+  int i,j,k,d,il,ii,id;
+
+  // Highest derivative order required for each axis
+  for (id=0; id<ndrv; id++)
+  {
+    for (d=0; d<3; d++)
+    {
+      if (drv_xyz[drv[id]][d] > dmax[d]) dmax[d] = drv_xyz[drv[id]][d];
+    }
+  }
+
+  X = (double*) malloc(nx * sizeof(double));
+  Y = (double*) malloc(ny * sizeof(double));
+  Z = (double*) malloc(nz * sizeof(double));
+  ex = (double*) malloc(nx * sizeof(double));
+  ey = (double*) malloc(ny * sizeof(double));
+  ez = (double*) malloc(nz * sizeof(double));
+  fx = (double*) malloc(3 * nx * sizeof(double));
+  fy = (double*) malloc(3 * ny * sizeof(double));
+  fz = (double*) malloc(3 * nz * sizeof(double));
+
+  for (i=0; i<nx; i++) X[i] = x[i]-at_pos[0];
+  for (j=0; j<ny; j++) Y[j] = y[j]-at_pos[1];
+  for (k=0; k<nz; k++) Z[k] = z[k]-at_pos[2];
+
+  for (id=0; id<ndrv; id++)
+  {
+    for (il=0; il<ao_num; il++)
+      for (p=0; p<npts; p++) ao_list[id*ao_stride + il*ao_ld + p] = 0.;
+  }
+
+  for (ii=0; ii<pnum; ii++)
+  {
+    alpha = coeff_list[2*ii];
+    // Range of the axes, where the primitive is not negligible
+    i0 = nx; i1 = 0;
+    j0 = ny; j1 = 0;
+    k0 = nz; k1 = 0;
+    for (i=0; i<nx; i++) 
+    {
+      ex[i] = 0.;
+      if (rcut2 != NULL && X[i]*X[i] > rcut2[ii]) continue;
+      ex[i] = exp(-alpha * X[i]*X[i]);
+      if (i < i0) i0 = i;
+      i1 = i+1;
+    }
+    for (j=0; j<ny; j++) 
+    {
+      ey[j] = 0.;
+      if (rcut2 != NULL && Y[j]*Y[j] > rcut2[ii]) continue;
+      ey[j] = exp(-alpha * Y[j]*Y[j]);
+      if (j < j0) j0 = j;
+      j1 = j+1;
+    }
+    for (k=0; k<nz; k++) 
+    {
+      ez[k] = 0.;
+      if (rcut2 != NULL && Z[k]*Z[k] > rcut2[ii]) continue;
+      ez[k] = exp(-alpha * Z[k]*Z[k]);
+      if (k < k0) k0 = k;
+      k1 = k+1;
+    }
+    if (i0 >= i1 || j0 >= j1 || k0 >= k1) continue;
+
+    for (il=0; il<ao_num; il++)
+    {
+      lx = lxlylz[3*il];
+      ly = lxlylz[3*il+1];
+      lz = lxlylz[3*il+2];
+      c = coeff_list[2*ii+1] * ao_norm(lx,ly,lz,alpha,is_normalized);
+
+      for (d=0; d<=dmax[0]; d++)
+        for (i=i0; i<i1; i++)
+          fx[d*nx+i] = c * ex[i] * get_ao_1d(X[i], lx, alpha, d);
+      for (d=0; d<=dmax[1]; d++)
+        for (j=j0; j<j1; j++)
+          fy[d*ny+j] = ey[j] * get_ao_1d(Y[j], ly, alpha, d);
+      for (d=0; d<=dmax[2]; d++)
+        for (k=k0; k<k1; k++)
+          fz[d*nz+k] = ez[k] * get_ao_1d(Z[k], lz, alpha, d);
+
+      for (id=0; id<ndrv; id++)
+      {
+        gx = &fx[drv_xyz[drv[id]][0]*nx];
+        gy = &fy[drv_xyz[drv[id]][1]*ny];
+        gz = &fz[drv_xyz[drv[id]][2]*nz];
+        for (i=i0; i<i1; i++)
+        {
+          if (gx[i] == 0.) continue;
+          for (j=j0; j<j1; j++)
+          {
+            fxy = gx[i] * gy[j];
+            if (fxy == 0.) continue;
+            ao = &ao_list[id*ao_stride + il*ao_ld + ((ptrdiff_t) i*ny + j)*nz];
+            for (k=k0; k<k1; k++)
+            {
+              ao[k] += fxy * gz[k];
+            }
+          }
+        }
+      }
+    }
+  }
+
+  free(X);
+  free(Y);
+  free(Z);
+  free(ex);
+  free(ey);
+  free(ez);
+  free(fx);
+  free(fy);
+  free(fz);
+}
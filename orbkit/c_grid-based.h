@@ -1,5 +1,19 @@
 //c_grid-based.h
+#include <stddef.h>
 
 void c_lcreator(double* ao_list, int* lxlylz, double* coeff_list, 
                 double* at_pos, double* x, double* y, double* z, 
-                int npts, int ao_num , int pnum, int drv, int is_normalized);  
\ No newline at end of file
+                ptrdiff_t npts, int ao_num , int pnum, int drv, 
+                int is_normalized);
+
+void c_lcreator_fused(double* ao_list, int* lxlylz, double* coeff_list, 
+                      double* at_pos, double* x, double* y, double* z, 
+                      ptrdiff_t npts, int ao_num , int pnum, int* drv, 
+                      int ndrv, ptrdiff_t ao_stride, ptrdiff_t ao_ld, 
+                      double* rcut2, int is_normalized);
+
+void c_lcreator_reg(double* ao_list, int* lxlylz, double* coeff_list, 
+                    double* at_pos, double* x, double* y, double* z, 
+                    int nx, int ny, int nz, int ao_num , int pnum, 
+                    int* drv, int ndrv, ptrdiff_t ao_stride, 
+                    ptrdiff_t ao_ld, double* rcut2, int is_normalized);
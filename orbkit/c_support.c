@@ -25,6 +25,44 @@ double xyz(double x,double y,double z,int lx,int ly,int lz)
   return ipow(x,lx)*ipow(y,ly)*ipow(z,lz);
 }
 
+double get_ao_1d(double X, int l, double alpha, int drv)
+{
+  /*FUNCTION get_ao_1d  
+  calculate the polynomial part of the one-dimensional factor 
+  X^l * exp(-alpha*X^2) or of its first (drv=1) or second (drv=2) derivative,
+  i.e., the result has to be multiplied by exp(-alpha*X^2).
+  */
+  double ao_x = 0;
+  switch(drv)
+  {
+    case 0:
+    {
+      ao_x = ipow(X,l);
+    } break;
+    case 1:
+    {
+      ao_x = - 2 * alpha * ipow(X,l+1);
+      if (l > 0)
+      {
+        ao_x += l * ipow(X,l-1);
+      }
+    } break;
+    case 2:
+    {
+      ao_x = 2 * alpha * ipow(X,l) * (2 * alpha * X*X - (2*l+1));
+      if (l >= 2)
+      {
+        ao_x += (l*l-l) * ipow(X,l-2);
+      }
+    } break;
+    default:
+    {
+      printf("False statement for derivative variable!");
+    }
+  }
+  return ao_x;
+}
+
 double get_ao_xyz(double X, double Y, double Z, int lx, int ly, int lz, double alpha, int drv)
 {
   /*FUNCTION get_ao_xyz  
@@ -120,51 +158,18 @@ double get_ao_xyz(double X, double Y, double Z, int lx, int ly, int lz, double a
     } break;
     case 7: // d/dx d/dy
     {
-      ao_xyz = 4 * pow(alpha,2) * xyz(X, Y, Z, lx+1, ly+1, lz);        
-      if (lx == 0 && ly > 0)
-      {
-        ao_xyz += ly * xyz(X, Y, Z, lx, ly-1, lz);
-      }
-      else if (lx > 0 && ly == 0)
-      {
-        ao_xyz += lx * xyz(X, Y, Z, lx-1, ly, lz);
-      }
-      else if (lx > 0 && ly > 0)
-      {
-        ao_xyz += lx * ly * xyz(X, Y, Z, lx-1, ly-1, lz);
-      }
+      ao_xyz = get_ao_1d(X, lx, alpha, 1) * get_ao_1d(Y, ly, alpha, 1) 
+                * ipow(Z,lz);
     } break;
     case 8: // d/dx d/dz
     {
-      ao_xyz = 4 * pow(alpha,2) * xyz(X, Y, Z, lx+1, ly, lz+1);        
-      if (lx == 0 && lz > 0)
-      {
-        ao_xyz += lz * xyz(X, Y, Z, lx, ly, lz-1);
-      }
-      else if (lx > 0 && lz == 0)
-      {
-        ao_xyz += lx * xyz(X, Y, Z, lx-1, ly, lz);
-      }
-      else if (lx > 0 && lz > 0)
-      {
-        ao_xyz += lx * lz * xyz(X, Y, Z, lx-1, ly, lz-1);
-      }
+      ao_xyz = get_ao_1d(X, lx, alpha, 1) * ipow(Y,ly) 
+                * get_ao_1d(Z, lz, alpha, 1);
     } break;
     case 9: // d/dy d/dz
     {
-      ao_xyz = 4 * pow(alpha,2) * xyz(X, Y, Z, lx, ly+1, lz+1);        
-      if (ly == 0 && lz > 0)
-      {
-        ao_xyz += lz * xyz(X, Y, Z, lx, ly, lz-1);
-      }
-      else if (ly > 0 && lz == 0)
-      {
-        ao_xyz += ly * xyz(X, Y, Z, lx, ly-1, lz);
-      }
-      else if (ly > 0 && lz > 0)
-      {
-        ao_xyz += ly * lz * xyz(X, Y, Z, lx, ly-1, lz-1);
-      }
+      ao_xyz = ipow(X,lx) * get_ao_1d(Y, ly, alpha, 1) 
+                * get_ao_1d(Z, lz, alpha, 1);
     } break;
     default:
     {
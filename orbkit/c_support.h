@@ -1,6 +1,7 @@
 //c_support.h
 
 double xyz(double x,double y,double z,int lx,int ly,int lz);
+double get_ao_1d(double X, int l, double alpha, int drv);
 double get_ao_xyz(double X, double Y, double Z, int lx, int ly, int lz, 
                   double alpha, int drv);
 double ao_norm(int l,int m,int n,double alpha, int is_normalized);
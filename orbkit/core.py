@@ -29,14 +29,19 @@ import time
 
 import numpy
 
-from multiprocessing import Pool
-
 # Import orbkit modules
-from orbkit import grid,cy_grid,cy_core
+from orbkit import grid,cy_core,omp_functions
 from orbkit.display import display
+from orbkit.qcinfo import MOSpec
+
+#: Specifies the fraction of the number of atomic orbitals, above which the 
+#: number of molecular orbitals makes the density matrix route the default
+#: (cf. :func:`prepare_dm`).
+dm_fraction = 0.5
 
 def ao_creator(geo_spec,ao_spec,ao_spherical=None,drv=None,
-               x=None,y=None,z=None,is_vector=None):
+               x=None,y=None,z=None,is_vector=None,tol=0.,rcut2=None,
+               plan=None,numthreads=1):
   '''Calculates all contracted atomic orbitals or its
   derivatives with respect to a specific variable (e.g. drv = 'x' or drv = 0).
   
@@ -46,19 +51,42 @@ def ao_creator(geo_spec,ao_spec,ao_spherical=None,drv=None,
     See :ref:`Central Variables` in the manual for details.
   sel_ao : int
     Index of the requested atomic orbital
-  drv : int or string, {None, 'x', 'y', 'z', 0, 1, 2}, optional
+  drv : int or string or list of those, {None, 'x', 'y', 'z', 'xx', ...}, optional
     If not None, an analytical  calculation of the derivatives for 
     the atomic orbitals with respect to DRV is requested.
+    If DRV is a list, all requested derivatives are computed in a single
+    pass over the grid, e.g., ``drv=[None,'x','y','z','xx','yy','zz','xy','xz','yz']``
+    returns the values, the gradients, and the Hessians at once.
   x,y,z : None or list of floats, optional
     If not None, provides a list of Cartesian coordinates, 
     else the respective coordinates of grid. will be used
   is_vector : bool, optional
     If True, a vector grid will be applied
+  tol : float, optional
+    If larger than zero, primitives with a contribution smaller than TOL 
+    are skipped point by point, and shells with an atom outside of 
+    the cutoff radius (cf. :func:`get_cutoff_radii`) of the grid's bounding box
+    are skipped completely.
+  rcut2 : None or numpy.ndarray, shape=(NPRIM,), optional
+    If not None, contains precomputed squared cutoff radii 
+    (cf. :func:`get_cutoff_radii`) and overrides TOL.
+  plan : None or BasisPlan, optional
+    If not None, contains the prepared basis set information, and geo_spec, 
+    ao_spec, and ao_spherical are ignored. (cf. :class:`BasisPlan`)
+  numthreads : int, optional
+    Specifies the number of OpenMP threads used by the compiled kernel.
   
   **Returns:**
   
-  ao_list : numpy.ndarray, shape=((NAO,) + N)
-    Contains the computed NAO atomic orbitals on a grid.
+  ao_list : numpy.ndarray, shape=((NAO,) + N) or ((NDRV,NAO) + N)
+    Contains the computed NAO atomic orbitals on a grid. If DRV is a list,
+    the first axis corresponds to the NDRV requested derivatives.
+  
+  ..hint: 
+  
+    For regular grids (:literal:`is_vector=False`), the Cartesian Gaussians 
+    are evaluated separately on the x-, y-, and z-axis and combined by an 
+    outer product. The grid is not converted to a vector grid.
   '''
   # Create the grid
   if all(v is None for v in [x,y,z,is_vector]) and not grid.is_initialized:
@@ -70,11 +98,8 @@ def ao_creator(geo_spec,ao_spec,ao_spherical=None,drv=None,
   if z is None: z = grid.z
   if is_vector is None: is_vector = grid.is_vector
   
-  was_vector = is_vector  
   if not is_vector:
     N = (len(x),len(y),len(z))
-    # Convert regular grid to vector grid
-    x,y,z = cy_grid.grid2vector(x.copy(),y.copy(),z.copy())
   else:
     if len(x) != len(y) or len(x) != len(z):
       raise ValueError("Dimensions of x-, y-, and z- coordinate differ!")
@@ -84,27 +109,63 @@ def ao_creator(geo_spec,ao_spec,ao_spherical=None,drv=None,
   y = require(y, dtype='f')
   z = require(z, dtype='f') 
   
-  geo_spec = require(geo_spec, dtype='f')
-  lxlylz,assign = get_lxlylz(ao_spec,get_assign=True,bincount=True)
-  ao_coeffs,pnum_list,atom_indices = prepare_ao_calc(ao_spec)
+  if plan is None:
+    plan = BasisPlan(geo_spec,ao_spec,ao_spherical)
+  
+  is_drv_list = isinstance(drv,(list,tuple))
+  drv = require([validate_drv(i) for i in drv] if is_drv_list 
+                else [validate_drv(drv)], dtype='i')
   
-  is_normalized = each_ao_is_normalized(ao_spec)
-  drv = validate_drv(drv)
+  if rcut2 is None and tol > 0:
+    rcut2 = plan.get_cutoff_radii(tol,drv=drv.tolist())
+  elif rcut2 is not None:
+    rcut2 = require(rcut2,dtype='f')
   
-  lxlylz = require(lxlylz,dtype='i')
-  assign = require(assign,dtype='i')
-  ao_list = cy_core.aocreator(lxlylz,assign,ao_coeffs,pnum_list,geo_spec,
-                              atom_indices,x,y,z,drv,is_normalized)
-  if 'N' in ao_spec[0]:
+  args = (plan.lxlylz,plan.assign,plan.ao_coeffs,plan.pnum_list,plan.geo_spec,
+          plan.atom_indices,x,y,z,drv,plan.is_normalized,rcut2)
+  if is_vector:
+    ao_list = cy_core.aocreator_fused(*args,numthreads=numthreads)
+  else:
+    # Separable evaluation on the axes of the regular grid
+    ao_list = cy_core.aocreator_regular(*args,numthreads=numthreads)
+  if plan.renorm is not None:
     # Renormalize atomic orbital
-    ao_list *= ao_spec[0]['N']
-  if not (ao_spherical is None or ao_spherical == []):
-    ao_list = cartesian2spherical(ao_list,ao_spec,ao_spherical)
+    ao_list *= plan.renorm
+  if plan.cart2sph is not None:
+    ao_list = numpy.array([plan.cartesian2spherical(i) for i in ao_list])
   
-  if not was_vector: return ao_list.reshape((len(ao_list),) + N,order='C')
-  return ao_list
+  ao_list = ao_list.reshape(ao_list.shape[:2] + N,order='C')
+  return ao_list if is_drv_list else ao_list[0]
  
-def mo_creator(ao_list,mo_spec):
+def get_drv_components(drv):
+  '''Returns the derivatives of the atomic orbitals required for the 
+  calculation of the derivatives DRV of the electron density.
+  
+  **Parameters:**
+  
+  drv : list of strings
+    Contains the requested derivatives of the density, e.g., ['x','xx','xy'].
+  
+  **Returns:**
+  
+  components : list of int
+    Contains the unique derivative indices (cf. :func:`validate_drv`) starting 
+    with 0, i.e., the atomic orbitals themselves.
+  '''
+  components = [0]
+  def append(ii_d):
+    ii_d = validate_drv(ii_d)
+    if ii_d not in components:
+      components.append(ii_d)
+  for ii_d in drv:
+    append(ii_d)
+    if len(ii_d) == 2:
+      append(ii_d[0])
+      if not ('2' in ii_d or ii_d[0] == ii_d[1]):
+        append(ii_d[1])
+  return components
+
+def mo_creator(ao_list,mo_spec,out=None,numthreads=1):
   '''Calculates the molecular orbitals.
   
   **Parameters:**
@@ -115,22 +176,128 @@ def mo_creator(ao_list,mo_spec):
     See :ref:`Central Variables` for details.
   mo_coeff : numpy.ndarray, shape = (NMO,NAO)
     Contains the molecular orbital coefficients of all orbitals.
+  out : None or numpy.ndarray, shape=((NMO,) + N) or (NMO,NPTS), optional
+    If not None, the molecular orbitals are written directly to this array, 
+    e.g., to a slice ``mo_list[:,i:j]`` of a preallocated array.
+  numthreads : int, optional
+    Specifies the number of OpenMP threads used by the compiled kernel.
     
   **Returns:**
   
   mo_list : numpy.ndarray, shape=((NMO,) + N)
     Contains the NMO=len(mo_spec) molecular orbitals on a grid.
+  
+  ..hint: 
+  
+    The contraction is carried out by the BLAS routine dgemm.
   '''
   ao_list = require(ao_list,dtype='f')
   shape = ao_list.shape
   ao_list.shape = (shape[0],-1)
   mo_coeff = create_mo_coeff(mo_spec,name='The argument `mo_spec`')
-  mo_list = cy_core.mocreator(ao_list,mo_coeff).reshape(
-                                                 ((len(mo_coeff),) + shape[1:]),
-                                                 order='C')
+  if out is not None:
+    mo_list = out
+    out = out.reshape((len(mo_coeff),ao_list.shape[1]))
+    if not numpy.may_share_memory(out,mo_list):
+      raise ValueError('The argument `out` cannot be reshaped without copying.')
+  mo_list_2d = cy_core.mocreator(ao_list,mo_coeff,out=out,numthreads=numthreads)
   ao_list.shape = shape
-  return mo_list
+  if out is not None:
+    return mo_list
+  return mo_list_2d.reshape(((len(mo_coeff),) + shape[1:]),order='C')
 
+def rho_creator(geo_spec,ao_spec,mo_spec,ao_spherical=None,drv=None,
+                x=None,y=None,z=None,is_vector=None,tol=0.,rcut2=None,
+                plan=None,mo_coeff=None,block=128,numthreads=1):
+  '''Calculates the electron density, the norm of the molecular orbitals, and
+  the derivatives of the density without storing the molecular orbitals.
+  
+  The grid is processed in small blocks of points. For each block, the atomic 
+  orbitals are computed and contracted to the molecular orbitals chunk by 
+  chunk, and the density is accumulated immediately, i.e., the memory 
+  requirement does not depend on the number of molecular orbitals. 
+  
+  **Parameters:**
+  
+  geo_spec,ao_spec,mo_spec,ao_spherical :
+    See :ref:`Central Variables` in the manual for details.
+  drv : None or list of strings, optional
+    If not None, the derivatives of the density with respect to DRV, e.g.,
+    ``drv=['x','y','z','xx']``, are computed as well.
+  x,y,z,is_vector,tol,rcut2,plan :
+    See :func:`ao_creator` for details.
+  mo_coeff : None or numpy.ndarray, shape = (NMO,NAO), optional
+    If not None, contains the molecular orbital coefficients, which are used
+    instead of the coefficients of mo_spec, e.g., if PLAN is restricted to 
+    a subset of the atomic orbitals.
+  block : int, optional
+    Specifies the number of grid points per block.
+  numthreads : int, optional
+    Specifies the number of OpenMP threads used by the compiled kernel.
+  
+  **Returns:**
+  
+  :if drv is None: rho, mo_norm
+  :else: rho, mo_norm, delta_rho
+  
+  rho : numpy.ndarray, shape=(N)
+    Contains the density on a grid.
+  mo_norm : numpy.ndarray, shape=(NMO,)
+    Contains the sum of the squared molecular orbitals over the grid.
+  delta_rho : numpy.ndarray, shape=((NDRV,) + N)
+    Contains the derivatives with respect to drv (NDRV=len(drv)) of 
+    the density on a grid.
+  '''
+  if all(v is None for v in [x,y,z,is_vector]) and not grid.is_initialized:
+    display('\nSetting up the grid...')
+    grid.grid_init(is_vector=True)
+    display(grid.get_grid())   # Display the grid    
+  if x is None: x = grid.x
+  if y is None: y = grid.y
+  if z is None: z = grid.z
+  if is_vector is None: is_vector = grid.is_vector
+  
+  if not is_vector:
+    N = (len(x),len(y),len(z))
+  else:
+    if len(x) != len(y) or len(x) != len(z):
+      raise ValueError("Dimensions of x-, y-, and z- coordinate differ!")
+    N = (len(x),)
+  
+  if plan is None:
+    plan = BasisPlan(geo_spec,ao_spec,ao_spherical)
+  if mo_coeff is None:
+    mo_coeff = create_mo_coeff(mo_spec,name='The argument `mo_spec`')
+  occ = require(create_mo_occ(mo_spec),dtype='f')
+  
+  # Indices of the required derivatives of the MOs for each derivative of rho
+  components = get_drv_components([] if drv is None else drv)
+  drv_index = []
+  for ii_d in ([] if drv is None else drv):
+    index = [components.index(validate_drv(ii_d)),-1,-1]
+    if len(ii_d) == 2:
+      index[1] = components.index(validate_drv(ii_d[0]))
+      index[2] = (index[1] if '2' in ii_d or ii_d[0] == ii_d[1] 
+                  else components.index(validate_drv(ii_d[1])))
+    drv_index.append(index)
+  drv_index = require(numpy.reshape(drv_index,(-1,3)),dtype='i')
+  components = require(components,dtype='i')
+  
+  if rcut2 is None and tol > 0:
+    rcut2 = plan.get_cutoff_radii(tol,drv=components.tolist())
+  elif rcut2 is not None:
+    rcut2 = require(rcut2,dtype='f')
+  
+  rho,mo_norm,delta_rho = cy_core.rhocreator(plan.lxlylz,plan.assign,
+                        plan.ao_coeffs,plan.pnum_list,plan.geo_spec,
+                        plan.atom_indices,require(x,dtype='f'),
+                        require(y,dtype='f'),require(z,dtype='f'),components,
+                        plan.is_normalized,plan.cartesian_mo_coeff(mo_coeff),
+                        occ,drv_index,rcut2,is_regular=not is_vector,
+                        block=block,numthreads=numthreads)
+  if drv is None:
+    return rho.reshape(N), mo_norm
+  return rho.reshape(N), mo_norm, delta_rho.reshape((len(drv),) + N)
 
 def cartesian2spherical(ao_list,ao_spec,ao_spherical):
   '''Transforms the atomic orbitals from a Cartesian Gaussian basis to a 
@@ -153,44 +320,13 @@ def cartesian2spherical(ao_list,ao_spec,ao_spherical):
   
   ..hint: 
   
-    The conversion is currently only supported up to g atomic orbitals.
+    For repeated transformations, use the cached sparse transformation matrix
+    of :class:`BasisPlan` (cf. :meth:`BasisPlan.cartesian2spherical`).
   '''
-  # Get the exponents of the Cartesian basis functions
-  #indices = get_lxlylz(ao_spec,get_label=True)
-  
-  #shape = list(ao_list.shape)
-  #shape[0] = len(ao_spherical)
-  #ao_list_sph = numpy.zeros(shape)
-  #for i0,(j0,k0) in enumerate(ao_spherical):
-    #sph0 = cy_core.get_cart2sph(*k0)
-    #for c0 in range(len(sph0[0])):
-      #index0 = int(numpy.argwhere(indices == j0*1000 + sph0[0][c0]))
-      #ao_list_sph[i0,:] += sph0[1][c0]*sph0[2]*ao_list[index0,:]
-  
-  #return ao_list_sph
-  
-  
-  
-  lxlylz,assign = get_lxlylz(ao_spec,get_assign=True)
+  plan = BasisPlan(None,ao_spec,ao_spherical)
+  return plan.cartesian2spherical(ao_list)
 
-  l = [[] for i in ao_spec]
-  for i,j in enumerate(assign):
-    l[j].append(i) 
-  
-  shape = list(ao_list.shape)
-  shape[0] = len(ao_spherical)
-  ao_list_sph = numpy.zeros(shape)
-  for i0,(j0,k0) in enumerate(ao_spherical):
-    sph0 = get_cart2sph(*k0)
-    for c0 in range(len(sph0[0])):
-      for i,j in enumerate(l[j0]):
-        if tuple(lxlylz[j]) == sph0[0][c0]:
-          index0 = i + l[j0][0]
-      ao_list_sph[i0,:] += sph0[1][c0]*sph0[2]*ao_list[index0,:]
-  
-  return ao_list_sph
-
-def slice_rho(xx):
+def slice_rho(xx,spec=None):
   '''Calculates the density, the molecular orbitals, or the derivatives thereof
   with respect to Spec['Derivative'] for one slice (xx)
   
@@ -204,6 +340,8 @@ def slice_rho(xx):
       | **If not is_vector:** One slice at x=xx will be computed.
       | **Else:**  One slice from index xx[0] to xx[1] will be calculated.
       
+  spec : None or dict, optional
+    If None, the global variable Spec set by :func:`initializer` is used.
   Spec : dict, global
     Dictionary containing all required varibles:
       :geo_spec: List of floats, shape=(NATOMS, 3) (see :ref:`Central Variables` for details).
@@ -238,93 +376,283 @@ def slice_rho(xx):
     Contains the derivatives with respect to drv (NDRV=len(drv)) of 
     the density on a grid.
   '''
+  if spec is None:
+    spec = Spec
   try:
-    # All desired information is stored in the Global variable Spec 
-    geo_spec = Spec['geo_spec']
-    ao_spec = Spec['ao_spec']
-    ao_spherical = Spec['ao_spherical']
-    mo_spec = Spec['mo_spec']
-    drv = Spec['Derivative']
-    calc_mo = Spec['calc_mo']
-    if Spec['calc_ao']:
-      _mo_creator = lambda x,y: x
-    else: 
-      _mo_creator = mo_creator
-      
-    
-    # Set up Grid
-    x = grid.x[xx[0]:xx[1]]
-    y = grid.y[xx[0]:xx[1]]
-    z = grid.z[xx[0]:xx[1]]
-    N = (len(x),)
-    
-    if drv is not None and calc_mo:
-      delta_mo_list = []
-      for ii_d in drv:
-        # Calculate the derivatives of the AOs and MOs for this slice 
-        delta_ao_list = ao_creator(geo_spec,ao_spec,ao_spherical=ao_spherical,drv=ii_d,
-                    x=x,y=y,z=z,is_vector=True)
-        delta_mo_list.append(_mo_creator(delta_ao_list,mo_spec))
-      return numpy.array(delta_mo_list)
-    # Calculate the MOs and AOs for this slice 
-    ao_list = ao_creator(geo_spec,ao_spec,ao_spherical=ao_spherical,x=x,y=y,z=z,is_vector=True)
-    mo_list = _mo_creator(ao_list,mo_spec)
-    
-    if calc_mo:
-      return numpy.array(mo_list)
+    # Set up Grid (broadcast to the worker processes, if available)
+    gx,gy,gz = spec['grid'] if 'grid' in spec else (grid.x,grid.y,grid.z)
+    is_regular = spec['is_regular']
+    tol = spec.get('tol',0.)
+    if not is_regular:
+      return slice_rho_block(spec,gx[xx[0]:xx[1]],gy[xx[0]:xx[1]],
+                             gz[xx[0]:xx[1]])
     
-    # Initialize a numpy array for the density 
-    rho = numpy.zeros(N)
+    # The slice contains complete yz-planes of the regular grid
+    nyz = len(gy)*len(gz)
+    x = gx[xx[0]//nyz:xx[1]//nyz]
+    if tol <= 0:
+      return slice_rho_block(spec,x,gy,gz)
     
-    # Initialize a numpy array for the norm of the MOs 
-    mo_norm = numpy.zeros((len(mo_list)))
-    
-    # Calculate the density and the norm 
-    for ii_mo in range(len(mo_list)): 
-      mo_norm[ii_mo] = numpy.sum(numpy.square(mo_list[ii_mo]))
-      rho += mo_spec[ii_mo]['occ_num'] * numpy.square(numpy.abs(mo_list[ii_mo]))
-      
-    if drv is None:
-      # Return the density and the norm 
-      return rho, mo_norm
-    else:
-      # Initialize a numpy array for the derivative of the density 
-      delta_rho = numpy.zeros((len(drv),) + N)
-      for i,ii_d in enumerate(drv):
-        # Calculate the derivatives of the AOs and MOs for this slice 
-        delta_ao_list = ao_creator(geo_spec,ao_spec,ao_spherical=ao_spherical,drv=ii_d,
-                                   x=x,y=y,z=z,is_vector=True)
-        delta_mo_list = mo_creator(delta_ao_list,mo_spec)        
-        if len(ii_d) == 2:
-          ao_0 = ao_creator(geo_spec,ao_spec,ao_spherical=ao_spherical,drv=ii_d[0],
-                                  x=x,y=y,z=z)
-          if '2' in ii_d or ii_d[0] == ii_d[1]:          
-            delta2_mo_list = numpy.array(mo_creator(ao_0,mo_spec))**2
+    # With screening, the slice is divided into 3-d blocks, i.e., the set of
+    # active atomic orbitals is determined for each block separately
+    nx,ny,nz = len(x),len(gy),len(gz)
+    edge = max(nx,64)
+    result = None
+    for j in range(0,ny,edge):
+      for k in range(0,nz,edge):
+        y,z = gy[j:j+edge],gz[k:k+edge]
+        block = slice_rho_block(spec,x,y,z)
+        is_mo = isinstance(block,numpy.ndarray)
+        if is_mo:
+          block = [block]
+        if result is None:
+          result = [numpy.zeros(i.shape[:-1] + (nx*nyz,)) for i in block]
+        for i,data in enumerate(block):
+          if not is_mo and i == 1:
+            # The norm of the MOs 
+            result[i] = data if j == k == 0 else result[i] + data
           else:
-            ao_1 = ao_creator(geo_spec,ao_spec,ao_spherical=ao_spherical,drv=ii_d[1],
-                                  x=x,y=y,z=z,is_vector=True)
-            delta2_mo_list = (numpy.array(mo_creator(ao_0,mo_spec)) *
-                              numpy.array(mo_creator(ao_1,mo_spec)))
-        # Calculate the derivative of the density
-        for ii_mo in range(len(mo_list)): 
-          delta_rho[i] += (mo_spec[ii_mo]['occ_num'] * 
-                    2 * delta_mo_list[ii_mo]*mo_list[ii_mo])
-          if len(ii_d) == 2:
-            delta_rho[i] += mo_spec[ii_mo]['occ_num'] * 2 * delta2_mo_list[ii_mo]
-      # Return the derivative of the density 
-      return rho, mo_norm, delta_rho
+            out = result[i].reshape(result[i].shape[:-1] + (nx,ny,nz))
+            out[...,j:j+edge,k:k+edge] = data.reshape(data.shape[:-1] + 
+                                                      (nx,len(y),len(z)))
+    return result[0] if is_mo else tuple(result)
   except KeyboardInterrupt:
     # Catch keybord interrupt signal to prevent a hangup of the worker processes 
     return 0
   # slice_rho 
 
+def slice_rho_block(spec,x,y,z):
+  '''Calculates the results of :func:`slice_rho` for a block of grid points, 
+  i.e., for the axes x, y, and z of a regular block or for the points of a 
+  vector grid (cf. spec['is_regular']). If spec['tol'] > 0, only the atomic 
+  orbitals, which are not negligible within the bounding box of the block, 
+  are computed.
+  '''
+  geo_spec = spec['geo_spec']
+  ao_spec = spec['ao_spec']
+  ao_spherical = spec['ao_spherical']
+  mo_spec = spec['mo_spec']
+  drv = spec['Derivative']
+  calc_mo = spec['calc_mo']
+  numthreads = spec.get('numthreads',1)
+  if spec['calc_ao']:
+    _mo_creator = lambda x,y: x
+  else: 
+    _mo_creator = lambda ao_list,mo_spec: mo_creator(ao_list,mo_spec,
+                                              numthreads=numthreads)
+  is_regular = spec['is_regular']
+  tol = spec.get('tol',0.)
+  N = (len(x)*len(y)*len(z),) if is_regular else (len(x),)
+  
+  dm = spec.get('dm') if not calc_mo else None
+  plan = spec['plan']
+  rcut2 = None
+  mo_coeff = None
+  if tol > 0:
+    # Restrict the calculation to the AOs, which are not negligible within 
+    # the bounding box of this block
+    rcut2 = spec['rcut2']
+    bbox = numpy.array([[min(i),max(i)] for i in [x,y,z]])
+    shells,ao_index = plan.get_active(rcut2,bbox)
+    if len(shells) < len(plan.assign):
+      plan,rcut2 = plan.select(shells,rcut2=rcut2)
+      if spec['calc_ao']:
+        nao = spec['plan'].nao
+        def _mo_creator(ao_list,mo_spec):
+          # Scatter the active AOs to the complete set of AOs
+          ao_full = numpy.zeros((nao,) + ao_list.shape[1:])
+          ao_full[ao_index] = ao_list
+          return ao_full
+      else:
+        # Only the matching columns of the MO coefficients are needed
+        mo_coeff = create_mo_coeff(mo_spec)[:,ao_index]
+        _mo_creator = lambda ao_list,mo_spec: mo_creator(ao_list,mo_coeff,
+                                                numthreads=numthreads)
+        if dm is not None:
+          dm = dm[numpy.ix_(ao_index,ao_index)]
+  
+  def _ao_creator(drv):
+    # Computes all requested derivatives in one pass, shape=((NDRV,NAO) + N)
+    if plan.nao == 0:
+      return numpy.zeros((len(drv),0) + N)
+    ao_list = ao_creator(geo_spec,ao_spec,ao_spherical=ao_spherical,drv=drv,
+                         x=x,y=y,z=z,is_vector=not is_regular,rcut2=rcut2,
+                         plan=plan,numthreads=numthreads)
+    return ao_list.reshape(ao_list.shape[:2] + N)
+  
+  if drv is not None and calc_mo:
+    # Calculate the derivatives of the AOs and MOs for this block 
+    delta_ao_list = _ao_creator(drv=drv)
+    return numpy.array([_mo_creator(i,mo_spec) for i in delta_ao_list])
+  
+  if not calc_mo and dm is None:
+    # Accumulate the density block by block without storing the MOs
+    result = rho_creator(geo_spec,ao_spec,mo_spec,ao_spherical=ao_spherical,
+                         drv=drv,x=x,y=y,z=z,is_vector=not is_regular,
+                         rcut2=rcut2,plan=plan,mo_coeff=mo_coeff,
+                         numthreads=numthreads)
+    if drv is None:
+      return result[0].reshape(N), result[1]
+    return (result[0].reshape(N), result[1], 
+            result[2].reshape((len(drv),) + N))
+  
+  # Calculate the AOs and all required derivatives thereof for this block 
+  components = [0] if drv is None else get_drv_components(drv)
+  ao_list = _ao_creator(drv=components)
+  
+  if dm is not None:
+    # Calculate the density from the AO density matrix without the MOs
+    mo_norm = numpy.zeros(len(mo_spec))
+    if drv is None:
+      return rho_from_dm(ao_list,dm), mo_norm
+    rho,delta_rho = rho_from_dm(ao_list,dm,drv=drv)
+    return rho, mo_norm, delta_rho
+  
+  # Calculate the MOs for this block 
+  return numpy.array(_mo_creator(ao_list[0],mo_spec))
+
+def slice_rho_shared(args):
+  '''Calls :func:`slice_rho` for one slice (xx) and writes the result directly
+  to the output arrays, which are memory-mapped from the files given by 
+  `shared` (cf. :meth:`orbkit.omp_functions.Executor.shared_zeros`), i.e., 
+  only the norm of the MOs (or None) is sent back to the parent process.
+  '''
+  xx,shared = args
+  result = slice_rho(xx)
+  if isinstance(result,int):
+    # Keyboard interrupt
+    return result
+  i,j = xx
+  def write(key,value):
+    data = omp_functions.open_shared(*shared[key])
+    data[...,i:j] = value
+    del data
+  if Spec['calc_mo']:
+    write('ao_list' if Spec['calc_ao'] else 'mo_list',result)
+    return None
+  write('rho',result[0])
+  if len(result) > 2:
+    write('delta_rho',result[2])
+  return result[1]
+
 def initializer(global_args):
   global Spec
   Spec = global_args
   
+def prepare_spec(qc,calc_ao=False,calc_mo=False,drv=None,tol=0.,dm=None,
+                 numthreads=1):
+  '''Returns the dictionary `Spec` containing all information required by 
+  :func:`slice_rho` (cf. :func:`rho_compute` for details on the parameters).
+  '''
+  if isinstance(qc,dict):
+    Spec = dict(qc)
+  else:
+    Spec = qc.todict()
+  # The basis set information is prepared only once (cached for QCinfo)
+  Spec['plan'] = get_basis_plan(qc)
+  Spec['calc_ao'] = calc_ao
+  Spec['calc_mo'] = calc_mo
+  Spec['Derivative'] = drv
+  Spec['tol'] = tol
+  Spec['numthreads'] = numthreads
+  Spec['dm'] = None if calc_mo else prepare_dm(Spec['mo_spec'],dm)
+  if tol > 0:
+    Spec['rcut2'] = Spec['plan'].get_cutoff_radii(tol,
+                                     drv=None if drv is None else list(drv))
+  Spec['is_regular'] = not grid.is_vector
+  Spec.pop('grid',None)
+  return Spec
+
+def rho_iter(qc,calc_ao=False,calc_mo=False,drv=None,numproc=1,
+             slice_length=1e4,tol=0.,dm=None,numthreads=1,ordered=True,
+             max_pending=None):
+  r'''Generator version of :func:`rho_compute`, which yields the results 
+  slice by slice as soon as they are available, i.e., the results for the 
+  complete grid are never held in memory. 
+  
+  The indices refer to the flattened grid, i.e., to ``numpy.ravel(rho)`` for 
+  regular grids (z runs fastest). At most `max_pending` slices are computed 
+  in advance by the worker processes.
+  
+  **Parameters:**
+  
+  qc,calc_ao,calc_mo,drv,numproc,slice_length,tol,dm,numthreads :
+    See :func:`rho_compute` for details.
+  ordered : bool, optional
+    If True, the slices are yielded in the order of the grid, else in the 
+    order of completion. (Only relevant if numproc > 1.)
+  max_pending : None or int, optional
+    Specifies the maximum number of pending slices. If None, 2*numproc 
+    slices are used.
+  
+  **Yields:**
+  
+  index_range : tuple of int
+    Contains the first and the last (exclusive) index (i,j) of the slice.
+  data : numpy.ndarray
+    :if calc_mo or calc_ao and drv is None: shape=(NMO,j-i) -- mo_list
+    :if calc_mo or calc_ao and drv is not None: shape=(NDRV,NMO,j-i) -- delta_mo_list
+    :else: shape=(j-i,) -- rho
+  delta_rho : None or numpy.ndarray, shape=(NDRV,j-i)
+    Contains derivatives of the density with respect to drv, if requested.
+  
+  **Example:**
+  
+    >>> n = 0.
+    >>> for (i,j),rho,delta_rho in rho_iter(qc,numproc=4):
+    ...   n += rho.sum()*grid.d3r
+  '''
+  if calc_ao and calc_mo:
+    raise ValueError('Choose either calc_ao=True or calc_mo=True')
+  elif calc_ao:
+    calc_mo = True 
+  if drv is not None and not isinstance(drv,(list,tuple)):
+    drv = [drv]
+  elif drv is not None:
+    drv = list(drv)
+  
+  if not grid.is_initialized:
+    display('\nSetting up the grid...')
+    grid.grid_init(is_vector=True)
+    display(grid.get_grid())   # Display the grid
+  
+  Spec = prepare_spec(qc,calc_ao=calc_ao,calc_mo=calc_mo,drv=drv,tol=tol,dm=dm,
+                      numthreads=numthreads)
+  
+  # Define the slices (complete yz-planes for regular grids)
+  N = (len(grid.x),) if grid.is_vector else (len(grid.x),len(grid.y),len(grid.z))
+  npts = int(numpy.prod(N))
+  slice_length = int(slice_length)
+  if slice_length <= 0: slice_length = int(numpy.ceil(npts/float(numproc)))
+  if not grid.is_vector:
+    nyz = N[1]*N[2]
+    slice_length = max(1,slice_length//nyz)*nyz
+  slice_length = max(1,slice_length)
+  xx = [numpy.array([i,min(i + slice_length,npts)],dtype=int) 
+        for i in range(0,npts,slice_length)]
+  numproc = min(numproc,len(xx))
+  
+  # The generator keeps its own Spec and grid, i.e., other calculations may 
+  # be carried out between two slices
+  Spec['grid'] = (grid.x,grid.y,grid.z)
+  if numproc > 1:
+    it = omp_functions.executor.iter(slice_rho,xx,numproc,
+                                     initializer=initializer,global_args=Spec,
+                                     ordered=ordered,max_pending=max_pending)
+  else:
+    it = ((s,slice_rho(i,Spec)) for s,i in enumerate(xx))
+  
+  for s,result in it:
+    index_range = tuple(int(i) for i in xx[s])
+    if calc_mo:
+      yield index_range, result, None
+    else:
+      yield index_range, result[0], (result[2] if drv is not None else None)
+
 def rho_compute(qc,calc_ao=False,calc_mo=False,drv=None,laplacian=False,
                 numproc=1,slice_length=1e4,vector=None,save_hdf5=False,
-                **kwargs):
+                tol=0.,dm=None,numthreads=1,compression=None,
+                compression_opts=None,shuffle=False,resume=False,**kwargs):
   r'''Calculate the density, the molecular orbitals, or the derivatives thereof.
   
   orbkit divides 3-dimensional regular grids into 2-dimensional slices and 
@@ -355,6 +683,30 @@ def rho_compute(qc,calc_ao=False,calc_mo=False,drv=None,laplacian=False,
     If True, computes the laplacian of the density.
   numproc : int
     Specifies number of subprocesses for multiprocessing.
+  numthreads : int, optional
+    Specifies the number of OpenMP threads used by the compiled kernels 
+    within each process, i.e., numproc*numthreads cores are used.
+  tol : float, optional
+    If larger than zero, specifies the tolerance for the screening of 
+    primitives and shells in :func:`ao_creator`.
+  dm : None, bool, or numpy.ndarray, shape=(NAO,NAO), optional
+    Specifies, if the density is computed from the AO density matrix 
+    instead of the molecular orbitals, or provides an arbitrary AO density 
+    matrix. See :func:`prepare_dm` for details.
+  save_hdf5 : bool or str, optional
+    If not False, specifies the name of an HDF5 file, to which the results 
+    are written slice by slice. The chunks of the datasets are aligned to the 
+    slices, and the completed slices are marked in the dataset `slice_done`.
+  compression : None or str, {'gzip', 'lzf'}, optional
+    Specifies the compression filter of the HDF5 datasets.
+  compression_opts : None or int, optional
+    Specifies the compression level (0-9) of the gzip filter.
+  shuffle : bool, optional
+    If True, the HDF5 shuffle filter is applied before the compression.
+  resume : bool, optional
+    If True and the HDF5 file exists, only the slices, which have not been 
+    completed before, are computed. The file has to be created with the same 
+    input and options (except for numproc and numthreads).
   grid : module or class, global
     Contains the grid, i.e., grid.x, grid.y, and grid.z. If grid.is_initialized
     is not True, functions runs grid.grid_init().
@@ -396,7 +748,8 @@ def rho_compute(qc,calc_ao=False,calc_mo=False,drv=None,laplacian=False,
   slice_length = slice_length if not vector else vector
   if slice_length == 0:
     return rho_compute_no_slice(qc,calc_ao=calc_ao,calc_mo=calc_mo,drv=drv,
-                                laplacian=laplacian,**kwargs)
+                                laplacian=laplacian,tol=tol,dm=dm,
+                                numthreads=numthreads,**kwargs)
   if laplacian:
     if not (drv is None or drv == ['xx','yy','zz'] or drv == ['x2','y2','z2']):
       display('Note: You have set the option `laplacian` and specified values\n' +
@@ -415,13 +768,8 @@ def rho_compute(qc,calc_ao=False,calc_mo=False,drv=None,laplacian=False,
     
   # Specify the global variable containing all desired information needed 
   # by the function slice_rho   
-  if isinstance(qc,dict):
-    Spec = qc
-  else:
-    Spec = qc.todict()
-  Spec['calc_ao'] = calc_ao
-  Spec['calc_mo'] = calc_mo
-  Spec['Derivative'] = drv
+  Spec = prepare_spec(qc,calc_ao=calc_ao,calc_mo=calc_mo,drv=drv,tol=tol,dm=dm,
+                      numthreads=numthreads)
   if calc_ao:
     if Spec['ao_spherical'] is None: 
       lxlylz,assign = get_lxlylz(Spec['ao_spec'],get_assign=True)
@@ -441,14 +789,19 @@ def rho_compute(qc,calc_ao=False,calc_mo=False,drv=None,laplacian=False,
   
   was_vector = grid.is_vector
   N = (len(grid.x),) if was_vector else (len(grid.x),len(grid.y),len(grid.z))
-  if not was_vector:
-    grid.grid2vector()
-    display('Converting the regular grid to a vector grid containing ' +
-            '%.2e grid points...' % len(grid.x))
+  # Regular grids are not converted to vector grids. Instead, they are 
+  # divided into slices of complete yz-planes, for which the atomic orbitals 
+  # are computed separately on the x-, y-, and z-axes.
+  Spec['is_regular'] = not was_vector
   
   # Define the slice length
-  npts = len(grid.x)
+  npts = numpy.prod(N)
   if slice_length < 0: slice_length = numpy.ceil(npts/float(numproc))+1
+  if not was_vector:
+    nyz = N[1]*N[2]
+    slice_length = max(1,int(slice_length//nyz))*nyz
+    display('The regular grid contains %.2e grid points ' % npts + 
+            'and will be sliced along the x-axis.')
   sNum = int(numpy.floor(npts/slice_length)+1)
   
   # The number of worker processes is capped to the number of 
@@ -466,9 +819,13 @@ def rho_compute(qc,calc_ao=False,calc_mo=False,drv=None,laplacian=False,
   else:
     display('The calculation will be carried out with %d subprocesses.' 
             % numproc)
+  if numthreads > 1:
+    display('Each process uses %d threads.' % numthreads)
   display('\nThere are %d contracted %s AOs' % (len(Spec['mo_spec'][0]['coeffs']),
           'Cartesian' if not Spec['ao_spherical'] else 'spherical')+ 
           ('' if calc_ao else ' and %d MOs to be calculated.' % mo_num) )
+  if Spec['dm'] is not None:
+    display('The density will be computed from the AO density matrix.')
   
   # Initialize some additional user information 
   status_old = 0
@@ -479,11 +836,23 @@ def rho_compute(qc,calc_ao=False,calc_mo=False,drv=None,laplacian=False,
   # Initialize an array to store the results 
   mo_norm = numpy.zeros((mo_num,))
   
+  # The worker processes write their results directly to memory-mapped files 
+  is_shared = numproc > 1 and not save_hdf5
+  shared = {}
   def zeros(shape,name,save_hdf5):
-    if not save_hdf5:
+    if is_shared:
+      filename,data = omp_functions.executor.shared_zeros(shape)
+      shared[name] = (filename,shape)
+      return data
+    elif not save_hdf5:
       return numpy.zeros(shape)
     else:
-      return f.create_dataset(name,shape,dtype=numpy.float64,chunks=shape[:-1] + (slice_length,))
+      # Each slice covers complete chunks
+      shape = tuple(int(i) for i in numpy.atleast_1d(shape))
+      chunks = (1,)*(len(shape)-1) + (max(1,min(int(slice_length),shape[-1])),)
+      return f.require_dataset(name,shape,dtype=numpy.float64,chunks=chunks,
+                               compression=compression,shuffle=shuffle,
+                               compression_opts=compression_opts)
   def reshape(data,shape):
     if not save_hdf5:
       return data.reshape(shape)
@@ -493,10 +862,21 @@ def rho_compute(qc,calc_ao=False,calc_mo=False,drv=None,laplacian=False,
   
   if save_hdf5:
     import h5py
-    f = h5py.File(str(save_hdf5), 'w')
-    f['x'] = grid.x
-    f['y'] = grid.y
-    f['z'] = grid.z
+    from os.path import exists
+    if numproc > 1:
+      # Start the worker processes first, i.e., they do not inherit the file
+      omp_functions.executor.get_pool(numproc)
+    key = get_rho_key(Spec,slice_length)
+    is_resumed = resume and exists(str(save_hdf5))
+    f = h5py.File(str(save_hdf5), 'a' if is_resumed else 'w')
+    if is_resumed and f.attrs.get('key') != key:
+      f.close()
+      raise ValueError('The file %s has been created with a different input ' 
+                       % save_hdf5 + 'or different options and cannot be resumed.')
+    f.attrs['key'] = key
+    for i in 'xyz':
+      if i not in f:
+        f[i] = getattr(grid,i)
   
   if calc_mo:
     mo_list = zeros((mo_num,npts) if drv is None else (len(drv),mo_num,npts),
@@ -504,7 +884,18 @@ def rho_compute(qc,calc_ao=False,calc_mo=False,drv=None,laplacian=False,
   else:
     rho = zeros(npts,'rho',save_hdf5)
     if is_drv:
-      delta_rho = zeros((len(drv),npts),'rho',save_hdf5)
+      delta_rho = zeros((len(drv),npts),'delta_rho',save_hdf5)
+  # With screening, vector grids are sliced along a space-filling curve, i.e.,
+  # each slice covers a compact region and only requires the atomic orbitals
+  # in its vicinity. The results are stored in the order of the curve and 
+  # scattered back at the end. (Not for HDF5 output, which may be resumed.)
+  order = None
+  if was_vector and tol > 0 and not save_hdf5 and npts > slice_length:
+    order = get_spatial_order(grid.x,grid.y,grid.z)
+    Spec['grid'] = tuple(numpy.asarray(i)[order] for i in (grid.x,grid.y,grid.z))
+  elif numproc > 1:
+    # The grid is broadcast to the persistent worker processes
+    Spec['grid'] = (grid.x,grid.y,grid.z)
   
   # Write the slices in x to an array xx 
   xx = []
@@ -519,22 +910,43 @@ def rho_compute(qc,calc_ao=False,calc_mo=False,drv=None,laplacian=False,
       xx.append((numpy.array([i,i + slice_length],dtype=int)))
     i += slice_length 
   
+  # Slices, which have to be computed
+  todo = list(range(len(xx)))
+  if save_hdf5:
+    # Per-slice completion bitmap (and norms of the MOs)
+    slice_done = f.require_dataset('slice_done',(len(xx),),dtype=numpy.uint8)
+    if not calc_mo:
+      slice_mo_norm = f.require_dataset('slice_mo_norm',(len(xx),mo_num),
+                                        dtype=numpy.float64)
+    todo = numpy.flatnonzero(slice_done[...] == 0).tolist()
+    if len(todo) < len(xx):
+      display('Resuming %s: %d of %d slices have already been computed.' 
+              % (save_hdf5,len(xx)-len(todo),len(xx)))
+  sNum = len(todo)
+  
   # Start the worker processes
   if numproc > 1:
-    pool = Pool(processes=numproc, initializer=initializer, initargs=(Spec,))
-    it = pool.imap(slice_rho, xx)
-  else:
-    initializer(Spec)
+    if is_shared:
+      it = omp_functions.executor.imap(slice_rho_shared,
+                                       [(xx[s],shared) for s in todo],numproc,
+                                       initializer=initializer,global_args=Spec)
+    else:
+      it = omp_functions.executor.imap(slice_rho,[xx[s] for s in todo],numproc,
+                                       initializer=initializer,global_args=Spec)
   
   # Compute the density slice by slice   
-  for s in range(sNum):
+  for c,s in enumerate(todo):
     # Which slice do we compute 
     i = xx[s][0]
     j = xx[s][1]    
     # Perform the compution for the current slice 
-    result = it.next() if numproc > 1 else slice_rho(xx[s])
+    result = next(it) if numproc > 1 else slice_rho(xx[s],Spec)
     # What output do we expect 
-    if calc_mo:
+    if is_shared:
+      # The results have been written to shared memory by the worker
+      if not calc_mo:
+        mo_norm += result
+    elif calc_mo:
       if not is_drv:
         mo_list[:,i:j] = result[:,:]
       else:
@@ -546,29 +958,49 @@ def rho_compute(qc,calc_ao=False,calc_mo=False,drv=None,laplacian=False,
       if is_drv:
         for ii_d in range(len(drv)):
           delta_rho[ii_d,i:j] = result[2][ii_d,:]
-    
+    if save_hdf5:
+      # Mark the slice as completed
+      if not calc_mo:
+        slice_mo_norm[s] = result[1]
+      slice_done[s] = 1
+      f.flush()
     
     # Print out the progress of the computation 
-    status = numpy.floor(s*10/float(sNum))*10
+    status = numpy.floor(c*10/float(sNum))*10
     if not status % 10 and status != status_old:
       t.append(time.time())
       display('\tFinished %(f)d %% (%(s)d slices in %(t).3f s)' 
                 % {'f': status,
-                's': s + 1 - s_old,
+                's': c + 1 - s_old,
                 't': t[-1]-t[-2]})
       status_old = status
-      s_old = s + 1
+      s_old = c + 1
   
-  # Close the worker processes
-  if numproc > 1:
-    pool.close()
-    pool.join()
-    
-  if not was_vector:
-    grid.vector2grid(*N)
-    display('Converting the output from a vector grid to a regular grid...')
+  if save_hdf5 and not calc_mo:
+    # Include the slices of previous runs
+    mo_norm = slice_mo_norm[...].sum(axis=0)
   
-  if not was_vector and drv is None:
+  # The worker processes are kept alive (cf. omp_functions.executor)
+  if is_shared:
+    if calc_mo:
+      name = 'ao_list' if calc_ao else 'mo_list'
+      mo_list = omp_functions.executor.release_shared(shared[name][0],mo_list)
+    else:
+      rho = omp_functions.executor.release_shared(shared['rho'][0],rho)
+      if is_drv:
+        delta_rho = omp_functions.executor.release_shared(
+                                        shared['delta_rho'][0],delta_rho)
+  Spec.pop('grid',None)
+  
+  if order is not None:
+    # Scatter the results back to the order of the grid row by row, i.e., 
+    # without a second copy of the complete result
+    for data in ([mo_list] if calc_mo else 
+                 [rho.reshape(1,-1)] + ([delta_rho] if is_drv else [])):
+      for row in data.reshape(-1,npts):
+        row[order] = row.copy()
+  
+  if not was_vector and drv is None and Spec['dm'] is None:
     # Print the norm of the MOs 
     display('\nNorm of the MOs:')
     for ii_mo in range(len(mo_norm)):
@@ -603,9 +1035,29 @@ def rho_compute(qc,calc_ao=False,calc_mo=False,drv=None,laplacian=False,
     return rho, delta_rho
   # rho_compute 
 
+def get_rho_key(Spec,slice_length):
+  '''Returns a fingerprint of the input and the options of :func:`rho_compute`
+  (cf. :func:`prepare_spec`), which is used to validate resumed HDF5 files.
+  '''
+  import hashlib
+  h = hashlib.sha1()
+  h.update(get_basis_key(Spec['geo_spec'],Spec['ao_spec'],
+                         Spec['ao_spherical']).encode())
+  h.update(create_mo_coeff(Spec['mo_spec']).tobytes())
+  h.update(create_mo_occ(Spec['mo_spec']).tobytes())
+  h.update(repr((Spec['calc_ao'],Spec['calc_mo'],Spec['Derivative'],
+                 float(Spec['tol']),Spec['is_regular'],
+                 int(slice_length))).encode())
+  if Spec['dm'] is not None:
+    h.update(numpy.ascontiguousarray(Spec['dm'],dtype=float).tobytes())
+  for i in [grid.x,grid.y,grid.z]:
+    h.update(numpy.ascontiguousarray(i,dtype=float).tobytes())
+  return h.hexdigest()
+
 def rho_compute_no_slice(qc,calc_ao=False,calc_mo=False,drv=None,
                          laplacian=False,return_components=False,
-                         x=None,y=None,z=None,is_vector=None,**kwargs):
+                         x=None,y=None,z=None,is_vector=None,tol=0.,dm=None,
+                         numthreads=1,**kwargs):
   r'''Calculates the density, the molecular orbitals, or the derivatives thereof
   without slicing the grid.
   
@@ -638,6 +1090,16 @@ def rho_compute_no_slice(qc,calc_ao=False,calc_mo=False,drv=None,
     If not None, provides a list of Cartesian coordinates, 
     else the respective coordinates of the module :mod:`orbkit.grid` will 
     be used.
+  tol : float, optional
+    If larger than zero, specifies the tolerance for the screening of 
+    primitives and shells in :func:`ao_creator`.
+  dm : None, bool, or numpy.ndarray, shape=(NAO,NAO), optional
+    Specifies, if the density is computed from the AO density matrix 
+    instead of the molecular orbitals, or provides an arbitrary AO density 
+    matrix. See :func:`prepare_dm` for details. Not applied, if 
+    return_components is True.
+  numthreads : int, optional
+    Specifies the number of OpenMP threads used by the compiled kernels.
 
   **Returns:**
   
@@ -714,16 +1176,21 @@ def rho_compute_no_slice(qc,calc_ao=False,calc_mo=False,drv=None,
   if not is_vector:
     N = (len(x),len(y),len(z))
     d3r = numpy.product([x[1]-x[0],y[1]-y[0],z[1]-z[0]])
-    # Convert regular grid to vector grid
-    x,y,z = cy_grid.grid2vector(x.copy(),y.copy(),z.copy())
-    is_vector = True
-    display('Converting the regular grid to a vector grid containing ' +
-            '%.2e grid points...' % len(grid.x))
   else:
     if len(x) != len(y) or len(x) != len(z):
       raise ValueError('Dimensions of x-, y-, and z- coordinate differ!')
     N = (len(x),)
   
+  def _ao_creator(drv):
+    # For regular grids, the AOs are computed separately on the axes
+    # All requested derivatives are computed in one pass, shape=(NDRV,NAO,NPTS)
+    ao_list = ao_creator(geo_spec,ao_spec,ao_spherical=ao_spherical,drv=drv,
+                         is_vector=was_vector,x=x,y=y,z=z,tol=tol,plan=plan,
+                         numthreads=numthreads)
+    return ao_list.reshape(ao_list.shape[:2] + (-1,))
+  
+  # The basis set information is prepared only once (cached for QCinfo)
+  plan = get_basis_plan(qc)
   if not isinstance(qc,dict):
     qc = qc.todict()
   
@@ -741,9 +1208,9 @@ def rho_compute_no_slice(qc,calc_ao=False,calc_mo=False,drv=None,
   
   display('\nStarting the calculation without slicing the grid...')
   display('\nThere are %d contracted %s AOs' % 
-          ( len(Spec['mo_spec'][0]['coeffs']),
-            'Cartesian' if not Spec['ao_spherical'] else 'spherical' )
-          + ( '' if calc_ao else ' and %d MOs to be calculated.' % len(Spec['mo_spec'])) 
+          ( len(qc['mo_spec'][0]['coeffs']),
+            'Cartesian' if not qc['ao_spherical'] else 'spherical' )
+          + ( '' if calc_ao else ' and %d MOs to be calculated.' % len(qc['mo_spec'])) 
           )
   
   
@@ -752,48 +1219,74 @@ def rho_compute_no_slice(qc,calc_ao=False,calc_mo=False,drv=None,
       drv = list(drv)
     except TypeError: 
       drv = [drv]
-    
+  
+  if not (calc_ao or calc_mo or return_components):
+    dm = prepare_dm(mo_spec,dm)
+    if dm is not None:
+      display('\nCalculating the density from the AO density matrix...')
+      components = [0] if drv is None else get_drv_components(drv)
+      data = rho_from_dm(_ao_creator(drv=components),dm,drv=drv)
+      rho = convert(data if drv is None else data[0],was_vector,N)
+      if not was_vector:
+        # Print the number of electrons 
+        display('We have ' + str(numpy.sum(rho)*d3r) + ' electrons.')
+      if drv is None:
+        return rho
+      delta_rho = convert(data[1],was_vector,N)
+      return ((rho,delta_rho,delta_rho.sum(axis=0)) if laplacian 
+              else (rho,delta_rho))
+  
+  if drv is not None:
     display('\nCalculating the derivatives of the atomic and molecular orbitals...')
-    delta_ao_list = [[] for ii_d in drv]
-    delta_mo_list = [[] for ii_d in drv]
-    for i,ii_d in enumerate(drv):
-      display('\t...with respect to %s' % ii_d)
+    display('\t...with respect to %s' % ', '.join(map(str,drv)))
+    if calc_ao or calc_mo:
       # Calculate the derivatives of the AOs and MOs
-      delta_ao_list[i] = ao_creator(geo_spec,ao_spec,ao_spherical=ao_spherical,
-                                      drv=ii_d,
-                                      is_vector=True,x=x,y=y,z=z)
-      if not calc_ao: delta_mo_list[i] =  mo_creator(delta_ao_list[i],mo_spec)                     
-    delta_ao_list = convert(delta_ao_list,was_vector,N)
-    if calc_ao: 
-      return delta_ao_list
-    delta_mo_list = convert(delta_mo_list,was_vector,N)
-    if calc_mo:  
+      delta_ao_list = _ao_creator(drv=drv)
+      if calc_ao: 
+        return convert(delta_ao_list,was_vector,N)
+      delta_mo_list = numpy.empty((len(drv),len(mo_spec),
+                                   delta_ao_list.shape[-1]))
+      for i,ao in enumerate(delta_ao_list):
+        mo_creator(ao,mo_spec,out=delta_mo_list[i],numthreads=numthreads)
+      delta_ao_list = convert(delta_ao_list,was_vector,N)
+      delta_mo_list = convert(delta_mo_list,was_vector,N)
       return ((delta_ao_list,delta_mo_list) if return_components 
               else delta_mo_list)
     
+    # Calculate the AOs and all required derivatives thereof at once
+    components = get_drv_components(drv)
+    ao_components = _ao_creator(drv=components)
+    mo_components = numpy.empty((len(components),len(mo_spec),
+                                 ao_components.shape[-1]))
+    for i,ao in enumerate(ao_components):
+      mo_creator(ao,mo_spec,out=mo_components[i],numthreads=numthreads)
+    def index(ii_d):
+      return components.index(validate_drv(ii_d))
+    
+    delta_ao_list = convert(ao_components[[index(ii_d) for ii_d in drv]],
+                            was_vector,N)
+    delta_mo_list = convert([mo_components[index(ii_d)] for ii_d in drv],
+                            was_vector,N)
+    
     delta2_mo_list = [None for ii_d in drv]
     for i,ii_d in enumerate(drv):
       if len(ii_d) == 2:
-        display('\t...with respect to %s' % ii_d[0])
-        ao_0 = ao_creator(geo_spec,ao_spec,ao_spherical=ao_spherical,
-                          drv=ii_d[0],
-                          is_vector=True,x=x,y=y,z=z)
         if '2' in ii_d or ii_d == 'xx'  or ii_d == 'yy' or ii_d == 'zz':
-          delta2_mo_list[i] = mo_creator(ao_0,mo_spec)**2
+          delta2_mo_list[i] = mo_components[index(ii_d[0])]**2
         else: 
-          display('\t...with respect to %s' % ii_d[1])
-          ao_1 = ao_creator(geo_spec,ao_spec,ao_spherical=ao_spherical,
-                            drv=ii_d[1],
-                            is_vector=True,x=x,y=y,z=z)
-          delta2_mo_list[i] = (mo_creator(ao_0,mo_spec) *
-                               mo_creator(ao_1,mo_spec))    
+          delta2_mo_list[i] = (mo_components[index(ii_d[0])] *
+                               mo_components[index(ii_d[1])])    
         delta2_mo_list[i] = convert(delta2_mo_list[i],was_vector,N)
+    
+    ao_list = ao_components[0]
+    mo_list = mo_components[0]
+  else:
+    display('\nCalculating the atomic and molecular orbitals...')
+    # Calculate the AOs and MOs 
+    ao_list = _ao_creator(drv=[None])[0]
+    if not calc_ao: mo_list = mo_creator(ao_list,mo_spec,numthreads=numthreads)
   
-  display('\nCalculating the atomic and molecular orbitals...')
-  # Calculate the AOs and MOs 
-  ao_list = ao_creator(geo_spec,ao_spec,ao_spherical=ao_spherical,
-                       is_vector=True,x=x,y=y,z=z)
-  if not calc_ao: mo_list = convert(mo_creator(ao_list,mo_spec),was_vector,N)
+  if not calc_ao: mo_list = convert(mo_list,was_vector,N)
   ao_list = convert(ao_list,was_vector,N)
   if calc_ao: 
     return ao_list
@@ -810,10 +1303,11 @@ def rho_compute_no_slice(qc,calc_ao=False,calc_mo=False,drv=None,
   
   # Initialize a numpy array for the density 
   rho = numpy.zeros(N)
+  occ = create_mo_occ(mo_spec)
   
   display('\nCalculating the density...') 
   for ii_mo in range(len(mo_list)): 
-    rho += numpy.square(numpy.abs(mo_list[ii_mo])) * mo_spec[ii_mo]['occ_num']
+    rho += numpy.square(numpy.abs(mo_list[ii_mo])) * occ[ii_mo]
   
   if not was_vector:
     # Print the number of electrons 
@@ -830,10 +1324,10 @@ def rho_compute_no_slice(qc,calc_ao=False,calc_mo=False,drv=None,
     display('\t...with respect to %s' % ii_d)
     # Calculate the derivative of the density
     for ii_mo in range(len(mo_list)): 
-      delta_rho[i] += (mo_spec[ii_mo]['occ_num'] * 
+      delta_rho[i] += (occ[ii_mo] * 
             2 * delta_mo_list[i,ii_mo]*mo_list[ii_mo])
       if len(ii_d) == 2:
-        delta_rho[i] += mo_spec[ii_mo]['occ_num'] * 2 * delta2_mo_list[i][ii_mo]
+        delta_rho[i] += occ[ii_mo] * 2 * delta2_mo_list[i][ii_mo]
   
   delta = (delta_rho,delta_rho.sum(axis=0)) if laplacian else (delta_rho,)
   
@@ -894,6 +1388,11 @@ exp.append([(4,0,0), (0,4,0), (0,0,4),
             (2,2,0), (2,0,2), (0,2,2),
             (2,1,1), (1,2,1), (1,1,2)]) # g orbitals
 
+# Higher angular momenta (h, i, etc.): descending lx, then descending ly
+for l in range(len(exp),len(orbit)):
+  exp.append([(lx,l-lx-lz,lz) for lx in range(l,-1,-1) for lz in range(l-lx+1)])
+del l
+
 # wfn order of exponents 
 exp_wfn = exp[:3]                           # s,p,d orbitals 
 
@@ -940,8 +1439,8 @@ cart2sph = [ #: Transformation Between Cartesian and (Real) Pure Spherical Harmo
   [[(3,1,0), (1,3,0)], [1.,-1.], sqrt(2) * sqrt(5/8.)],
   [[(0,3,1), (2,1,1)], [-sqrt(5)/4.,3/4.], sqrt(2)],
   [[(1,1,2), (3,1,0), (1,3,0)], [3/sqrt(14), -sqrt(5)/(2*sqrt(14)), -sqrt(5)/(2*sqrt(14))], sqrt(2)],
-  [[(0,3,1), (0,3,1), (2,1,1)], [sqrt(5/7.), -3*sqrt(5)/(4.*sqrt(7)), -3/(4.*sqrt(7))], sqrt(2)],
-  [[(0,0,4), (4,0,0), (0,4,0), (2,0,2), (0,2,2), (2,2,0)], [1., 3/8., 3/8., -3*sqrt(3)/sqrt(35), -3*sqrt(3)/sqrt(35), -1/4.], sqrt(2)],
+  [[(0,1,3), (0,3,1), (2,1,1)], [sqrt(5/7.), -3*sqrt(5)/(4.*sqrt(7)), -3/(4.*sqrt(7))], sqrt(2)],
+  [[(0,0,4), (4,0,0), (0,4,0), (2,0,2), (0,2,2), (2,2,0)], [1., 3/8., 3/8., -3*sqrt(3)/sqrt(35), -3*sqrt(3)/sqrt(35), 3*sqrt(3)/(4*sqrt(35))], 1.],
   [[(1,0,3), (3,0,1), (1,2,1)], [sqrt(5/7.), -3*sqrt(5)/(4.*sqrt(7)), -3/(4.*sqrt(7))], sqrt(2)],
   [[(2,0,2), (0,2,2), (4,0,0), (0,4,0)], [3*sqrt(3)/(2.*sqrt(14)), -3*sqrt(3)/(2.*sqrt(14)), -sqrt(5)/(4.*sqrt(2)), sqrt(5)/(4.*sqrt(2))], sqrt(2)],
   [[(3,0,1), (1,2,1)], [sqrt(5)/4., -3/4.], sqrt(2)],
@@ -974,9 +1473,72 @@ def get_cart2sph(l,m):
   
   ..hint: 
   
-    The conversion is currently only supported up to g atomic orbitals.
+    Up to g atomic orbitals, the tabulated values are used. For higher angular
+    momenta, the coefficients are generated by :func:`get_solid_harmonic`.
+  '''
+  if l < len(cart2sph):
+    return cart2sph[l][l+m]
+  if (l,m) not in _cart2sph_cache:
+    poly = get_solid_harmonic(l,m)
+    exps = [i for i in exp[l] if i in poly]
+    _cart2sph_cache[(l,m)] = [exps,[poly[i] for i in exps],1.]
+  return _cart2sph_cache[(l,m)]
+
+_cart2sph_cache = {}
+
+def get_solid_harmonic(l,m):
+  '''Returns the expansion of a real solid harmonic in terms of normalized 
+  Cartesian Gaussians for an arbitrary angular momentum.
+  
+  The real solid harmonics are obtained by the standard recursion, cf. 
+  T. Helgaker, P. Jorgensen, and J. Olsen, Molecular Electronic-Structure 
+  Theory (Wiley, 2000), Eqs. (6.4.70)-(6.4.72). The conventions (ordering of
+  m and normalization) are identical to those of `core.cart2sph`.
+  
+  **Parameters:**
+  
+  l : int
+    Angular momentum quantum number.
+  m : int
+    Magnetic quantum number.
+  
+  **Returns:**
+  
+  poly : dict
+    Contains the expansion coefficients with the exponents (lx,ly,lz) as keys.
   '''
-  return cart2sph[l][l+m]
+  def add(a,b,f=1.):
+    c = dict(a)
+    for k,v in b.items():
+      c[k] = c.get(k,0.) + f*v
+    return c
+  def mul(a,lx,ly,lz,f=1.):
+    return dict(((k[0]+lx,k[1]+ly,k[2]+lz),f*v) for k,v in a.items())
+  
+  # Unnormalized solid harmonics S_{l,m} (Racah normalization)
+  S = {(0,0): {(0,0,0): 1.}}
+  for j in range(l):
+    f = numpy.sqrt((2. if j == 0 else 1.)*(2*j+1)/(2*j+2))
+    S[(j+1,j+1)] = add(mul(S[(j,j)],1,0,0,f),
+                       mul(S[(j,-j)],0,1,0,-f) if j > 0 else {})
+    S[(j+1,-j-1)] = add(mul(S[(j,j)],0,1,0,f),
+                        mul(S[(j,-j)],1,0,0,f) if j > 0 else {})
+    for k in range(-j,j+1):
+      s = mul(S[(j,k)],0,0,1,2*j+1)
+      if (j-1,k) in S:
+        r2 = S[(j-1,k)]
+        r2 = add(add(mul(r2,2,0,0),mul(r2,0,2,0)),mul(r2,0,0,2))
+        s = add(s,r2,-numpy.sqrt((j+k)*(j-k)))
+      S[(j+1,k)] = mul(s,0,0,0,1/numpy.sqrt((j+k+1)*(j-k+1)))
+  
+  # Convert to normalized Cartesian Gaussians
+  dfact = lambda n: numpy.prod(numpy.arange(n,0,-2,dtype=float))
+  poly = {}
+  for (lx,ly,lz),v in S[(l,m)].items():
+    if abs(v) > 1e-14:
+      poly[(lx,ly,lz)] = v*numpy.sqrt(dfact(2*lx-1)*dfact(2*ly-1)*
+                                      dfact(2*lz-1)/dfact(2*l-1))
+  return poly
 
 def get_lxlylz(ao_spec,get_assign=False,bincount=False,get_label=False):
   '''Extracts the exponents lx, ly, lz for the Cartesian Gaussians.
@@ -1015,6 +1577,194 @@ def get_lxlylz(ao_spec,get_assign=False,bincount=False,get_label=False):
   
   return lxlylz
 
+def get_cutoff_radii(ao_spec,tol,drv=None):
+  r'''Estimates the squared cutoff radius of each primitive Gaussian, i.e., the 
+  squared distance to its atom beyond which its contribution to the 
+  (derivatives of the) contracted atomic orbitals is smaller than TOL.
+  
+  The contribution of a primitive with exponent alpha and contraction 
+  coefficient c is bounded by :math:`A r^{l+d} \exp(-\alpha r^2)`, where 
+  :math:`A = |c| N (l+2)^d \max(1,2\alpha)^d`, N is the largest normalization 
+  constant of the Cartesian components of the shell, and d is the highest 
+  derivative order requested.
+  
+  **Parameters:**
+  
+  ao_spec : list of dictionaries or BasisPlan
+    See :ref:`Central Variables` in the manual for details.
+  tol : float
+    Requested tolerance. If tol <= 0, no cutoff is applied.
+  drv : int or string or list of those, optional
+    Requested derivatives. (cf. :func:`validate_drv`)
+  
+  **Returns:**
+  
+  rcut2 : numpy.ndarray, shape=(NPRIM,)
+    Contains the squared cutoff radii of all primitives in the order of 
+    :func:`prepare_ao_calc`.
+  '''
+  plan = ao_spec if isinstance(ao_spec,BasisPlan) else BasisPlan(None,ao_spec)
+  return plan.get_cutoff_radii(tol,drv=drv)
+
+def get_active_aos(geo_spec,ao_spec,ao_spherical,rcut2,bbox):
+  '''Determines the shells and atomic orbitals, which are not negligible 
+  within a bounding box.
+  
+  **Parameters:**
+  
+  geo_spec,ao_spec,ao_spherical :
+    See :ref:`Central Variables` in the manual for details.
+  rcut2 : numpy.ndarray, shape=(NPRIM,)
+    Contains the squared cutoff radii of all primitives. 
+    (cf. :func:`get_cutoff_radii`)
+  bbox : numpy.ndarray, shape=(3,2)
+    Contains the bounding box, i.e., [[xmin,xmax],[ymin,ymax],[zmin,zmax]].
+  
+  **Returns:**
+  
+  shells : numpy.ndarray, dtype=int
+    Contains the indices of the active shells in ao_spec.
+  ao_index : numpy.ndarray, dtype=int
+    Contains the indices of the active atomic orbitals, i.e., of the 
+    Cartesian or, if ao_spherical is not None, of the spherical AOs.
+  '''
+  return BasisPlan(geo_spec,ao_spec,ao_spherical).get_active(rcut2,bbox)
+
+def get_spatial_order(x,y,z,bits=10):
+  '''Returns the permutation, which sorts the points of a vector grid along 
+  a Z-order (Morton) curve, i.e., consecutive points are close in space.
+  
+  **Parameters:**
+  
+  x,y,z : numpy.ndarray, shape=(N,)
+    Contains the coordinates of the grid points.
+  bits : int, optional
+    Specifies the number of bits of the cell index along each axis, i.e., 
+    the bounding box of the grid is divided into 2**(3*bits) cells.
+  
+  **Returns:**
+  
+  order : numpy.ndarray, shape=(N,), dtype=int
+    Contains the indices of the grid points in the order of the curve.
+  '''
+  code = numpy.zeros(len(x),dtype=numpy.uint64)
+  for k,c in enumerate([x,y,z]):
+    c = numpy.asarray(c,dtype=float)
+    width = c.max() - c.min() if len(c) else 0.
+    if width <= 0:
+      continue
+    cell = ((c - c.min())*((2**bits - 1)/width)).astype(numpy.uint64)
+    for b in range(bits):
+      # Interleave the bits of the cell indices of the three axes
+      bit = (cell >> numpy.uint64(b)) & numpy.uint64(1)
+      code |= bit << numpy.uint64(3*b + k)
+  return numpy.argsort(code,kind='mergesort')
+
+def get_density_matrix(mo_spec):
+  r'''Computes the atomic orbital density matrix 
+  :math:`P = C^T \mathrm{diag}(occ) C`.
+  
+  **Parameters:**
+  
+  mo_spec : List of dictionaries
+    See :ref:`Central Variables` for details.
+  
+  **Returns:**
+  
+  dm : numpy.ndarray, shape=(NAO,NAO)
+    Contains the AO density matrix.
+  '''
+  mo_coeff = create_mo_coeff(mo_spec,name='The argument `mo_spec`')
+  occ = create_mo_occ(mo_spec)
+  return numpy.dot(mo_coeff.T * occ,mo_coeff)
+
+def prepare_dm(mo_spec,dm=None):
+  '''Selects and validates the AO density matrix for the density calculation.
+  
+  **Parameters:**
+  
+  mo_spec : List of dictionaries
+    See :ref:`Central Variables` for details.
+  dm : None, bool, or numpy.ndarray, shape=(NAO,NAO), optional
+    If None, the density matrix route is chosen, if the number of molecular 
+    orbitals exceeds :data:`dm_fraction` times the number of atomic orbitals.
+    (The molecular orbital route contracts all NMO=len(mo_spec) orbitals, 
+    including the unoccupied ones, i.e., it requires NMO*NAO operations per 
+    grid point, while the density matrix route requires NAO**2 operations in 
+    a single matrix product for the complete slice.)
+    If True, the density matrix is computed from mo_spec. 
+    Note that the norm of the molecular orbitals is not available for the 
+    density matrix route.
+    If a numpy.ndarray, it is used as density matrix, e.g., the one-particle
+    density matrix of a CI calculation in the AO basis.
+  
+  **Returns:**
+  
+  dm : None or numpy.ndarray, shape=(NAO,NAO)
+    Contains the symmetrized AO density matrix. None, if the molecular 
+    orbitals shall be used.
+  '''
+  nao = len(mo_spec[0]['coeffs'])
+  if dm is None:
+    dm = len(mo_spec) > dm_fraction*nao
+  if isinstance(dm,bool):
+    return get_density_matrix(mo_spec) if dm else None
+  dm = numpy.asarray(dm,dtype=float)
+  if dm.shape != (nao,nao):
+    raise ValueError('The density matrix has to be of shape (NAO,NAO)=(%d,%d).' 
+                     % (nao,nao))
+  # Only the symmetric part contributes to the density
+  return require(0.5*(dm + dm.T),dtype='f')
+
+def rho_from_dm(ao_list,dm,drv=None):
+  r'''Calculates the density and its derivatives from the AO density matrix, 
+  i.e., :math:`\rho = \sum_{\mu} \chi_\mu (P \chi)_\mu`.
+  
+  **Parameters:**
+  
+  ao_list : numpy.ndarray, shape=((NCOMP,NAO) + N)
+    Contains the atomic orbitals and the derivatives thereof as 
+    returned by :func:`ao_creator` for ``drv=get_drv_components(drv)``.
+  dm : numpy.ndarray, shape=(NAO,NAO)
+    Contains the symmetric AO density matrix.
+  drv : None or list of strings, optional
+    Contains the requested derivatives of the density.
+  
+  **Returns:**
+  
+  :if drv is None: rho
+  :else: rho, delta_rho
+  
+  rho : numpy.ndarray, shape=(N)
+  delta_rho : numpy.ndarray, shape=((NDRV,) + N)
+  '''
+  components = [0] if drv is None else get_drv_components(drv)
+  N = ao_list.shape[2:]
+  ao_list = require(ao_list,dtype='f').reshape(ao_list.shape[:2] + (-1,))
+  dm = require(dm,dtype='f')
+  
+  # The products P chi are computed only once and only if needed
+  p_ao = {}
+  def get_p_ao(ii_d):
+    ii_d = validate_drv(ii_d)
+    if ii_d not in p_ao:
+      p_ao[ii_d] = cy_core.mocreator(ao_list[components.index(ii_d)],dm)
+    return p_ao[ii_d]
+  def get_ao(ii_d):
+    return ao_list[components.index(validate_drv(ii_d))]
+  
+  rho = numpy.einsum('ij,ij->j',ao_list[0],get_p_ao(None))
+  if drv is None:
+    return rho.reshape(N)
+  
+  delta_rho = numpy.zeros((len(drv),rho.shape[0]))
+  for i,ii_d in enumerate(drv):
+    delta_rho[i] = 2*numpy.einsum('ij,ij->j',get_ao(ii_d),get_p_ao(None))
+    if len(ii_d) == 2:
+      ii_d1 = ii_d[0] if ('2' in ii_d or ii_d[0] == ii_d[1]) else ii_d[1]
+      delta_rho[i] += 2*numpy.einsum('ij,ij->j',get_ao(ii_d[0]),get_p_ao(ii_d1))
+  return rho.reshape(N), delta_rho.reshape((len(drv),) + N)
+
 def validate_drv(drv):
   if drv is None or drv == 'None' or drv == '': return 0
   elif drv == 'x': return 1
@@ -1043,18 +1793,263 @@ def each_ao_is_normalized(ao_spec):
 def prepare_ao_calc(ao_spec):    
   pnum_list = []
   atom_indices = []
-  ao_coeffs = numpy.zeros((0,2))  
+  ao_coeffs = [numpy.zeros((0,2))]
   for sel_ao in range(len(ao_spec)):
     atom_indices.append(ao_spec[sel_ao]['atom'])
     c = ao_spec[sel_ao]['coeffs']
-    ao_coeffs = numpy.append(ao_coeffs,c,axis=0)
+    ao_coeffs.append(numpy.reshape(c,(-1,2)))
     pnum_list.append(len(c))
+  ao_coeffs = numpy.concatenate(ao_coeffs,axis=0)
       
   pnum_list = require(pnum_list, dtype='i')
   atom_indices = require(atom_indices, dtype='i')
   ao_coeffs = require(ao_coeffs, dtype='f')
   return ao_coeffs,pnum_list,atom_indices
 
+class BasisPlan:
+  '''Contains the basis set information required for the calculation of the 
+  atomic orbitals, i.e., it is derived once from geo_spec, ao_spec, and 
+  ao_spherical and can be reused for an arbitrary number of grids or slices.
+  
+  For :class:`orbkit.qcinfo.QCinfo` instances, use 
+  :meth:`orbkit.qcinfo.QCinfo.get_basis_plan` to obtain a cached instance.
+  
+  **Parameters:**
+  
+  geo_spec,ao_spec,ao_spherical :
+    See :ref:`Central Variables` in the manual for details.
+  
+  **Attributes:**
+  
+  lxlylz : numpy.ndarray, dtype=numpy.intc, shape=(NCART,3)
+    Contains the exponents of the Cartesian Gaussians.
+  assign : numpy.ndarray, dtype=numpy.intc, shape=(NSHELL,)
+    Contains the number of Cartesian Gaussians of each shell.
+  cart_assign : numpy.ndarray, dtype=numpy.intc, shape=(NCART,)
+    Contains the index of the shell of each Cartesian Gaussian.
+  ao_coeffs : numpy.ndarray, shape=(NPRIM,2)
+    Contains the exponents and contraction coefficients of all primitives.
+  pnum_list,atom_indices : numpy.ndarray, dtype=numpy.intc, shape=(NSHELL,)
+    Contain the number of primitives and the atom index of each shell.
+  prim_norm : numpy.ndarray, shape=(NPRIM,)
+    Contains the largest normalization constant (cf. cy_core.aonorm) of the 
+    Cartesian components of each primitive. (Computed on first use)
+  is_normalized : bool
+    If True, the contraction coefficients include the normalization.
+  renorm : None or numpy.ndarray, shape=(NCART,1)
+    Contains the renormalization of the Cartesian AOs (ao_spec[0]['N']).
+  cart2sph : None or scipy.sparse.csr_matrix, shape=(NSPH,NCART)
+    Contains the sparse Cartesian-to-spherical transformation matrix T, i.e.,
+    ao_list_sph = T . ao_list and ao_overlap_matrix_sph = T . S . T^T.
+  sph_assign : None or numpy.ndarray, shape=(NSPH,)
+    Contains the index of the shell of each spherical AO.
+  key : None or str
+    Fingerprint of the input (cf. :func:`get_basis_key`), if set by the owner 
+    of the cached instance.
+  '''
+  def __init__(self,geo_spec,ao_spec,ao_spherical=None):
+    self.key = None
+    self.geo_spec = None if geo_spec is None else require(geo_spec,dtype='f')
+    lxlylz,cart_assign = get_lxlylz(ao_spec,get_assign=True)
+    self.lxlylz = require(lxlylz,dtype='i')
+    self.cart_assign = require(cart_assign,dtype='i')
+    self.assign = require(numpy.bincount(cart_assign,minlength=len(ao_spec)),
+                          dtype='i')
+    self.ao_coeffs,self.pnum_list,self.atom_indices = prepare_ao_calc(ao_spec)
+    self.is_normalized = each_ao_is_normalized(ao_spec) if ao_spec else False
+    self.renorm = (None if not ao_spec or 'N' not in ao_spec[0] 
+                   else numpy.asarray(ao_spec[0]['N'],dtype=float))
+    self._prim_norm = None
+    
+    self.cart2sph = None
+    self.sph_assign = None
+    if not (ao_spherical is None or ao_spherical == []):
+      from scipy import sparse
+      # Sparse Cartesian-to-spherical transformation matrix
+      cart_offset = self.cart_offset
+      shell_index = {}
+      sph_index,cart_index,coeffs = [],[],[]
+      for i0,(j0,k0) in enumerate(ao_spherical):
+        if j0 not in shell_index:
+          c_ao = cart_offset[j0]
+          shell_index[j0] = dict((tuple(e),c_ao+i) for i,e in 
+                                 enumerate(lxlylz[c_ao:c_ao+self.assign[j0]]))
+        exps,c,factor = get_cart2sph(*k0)
+        for e0,c0 in zip(exps,c):
+          if e0 in shell_index[j0]:
+            sph_index.append(i0)
+            cart_index.append(shell_index[j0][e0])
+            coeffs.append(c0*factor)
+      self.cart2sph = sparse.csr_matrix((coeffs,(sph_index,cart_index)),
+                                        shape=(len(ao_spherical),len(lxlylz)))
+      self.sph_assign = numpy.array([j0 for j0,k0 in ao_spherical],dtype=int)
+  
+  @property
+  def cart_offset(self):
+    '''Index of the first Cartesian Gaussian of each shell.'''
+    return numpy.cumsum(self.assign) - self.assign
+  
+  @property
+  def prim_norm(self):
+    '''Largest normalization constant of the Cartesian components of each 
+    primitive. (Computed on first use)'''
+    if self._prim_norm is None:
+      prim_norm = []
+      for i,(c_ao,n_ao) in enumerate(zip(self.cart_offset,self.assign)):
+        exps = self.lxlylz[c_ao:c_ao+n_ao]
+        for alpha in self.ao_coeffs[self.prim_offset[i]:
+                                    self.prim_offset[i]+self.pnum_list[i],0]:
+          prim_norm.append(max([cy_core.aonorm(lx,ly,lz,alpha,
+                                               self.is_normalized) 
+                                for lx,ly,lz in exps] + [0.]))
+      self._prim_norm = numpy.array(prim_norm,dtype=float)
+    return self._prim_norm
+  
+  @property
+  def prim_offset(self):
+    '''Index of the first primitive of each shell.'''
+    return numpy.cumsum(self.pnum_list) - self.pnum_list
+  
+  @property
+  def nao(self):
+    '''Number of (Cartesian or spherical) atomic orbitals.'''
+    return len(self.lxlylz) if self.cart2sph is None else len(self.sph_assign)
+  
+  @property
+  def ao_assign(self):
+    '''Index of the shell of each (Cartesian or spherical) atomic orbital.'''
+    return self.cart_assign if self.cart2sph is None else self.sph_assign
+  
+  def cartesian2spherical(self,ao_list):
+    '''Transforms the Cartesian AOs, shape=((NCART,) + N), to the spherical AOs.
+    '''
+    ao_list = numpy.asarray(ao_list)
+    ao_list_sph = self.cart2sph.dot(ao_list.reshape(len(ao_list),-1))
+    return ao_list_sph.reshape((len(self.sph_assign),) + ao_list.shape[1:])
+  
+  def cartesian_mo_coeff(self,mo_coeff):
+    '''Transforms the MO coefficients, shape=(NMO,NAO), to the unnormalized 
+    Cartesian Gaussians computed by the compiled kernels, i.e., the 
+    renormalization and the Cartesian-to-spherical transformation are included.
+    '''
+    mo_coeff = numpy.asarray(mo_coeff,dtype=float)
+    if self.cart2sph is not None:
+      mo_coeff = self.cart2sph.T.dot(mo_coeff.T).T
+    if self.renorm is not None:
+      mo_coeff = mo_coeff * self.renorm.reshape(-1)
+    return require(mo_coeff,dtype='f')
+  
+  def cartesian2spherical_matrix(self,matrix):
+    '''Transforms a matrix in the Cartesian AO basis, shape=(NCART,NCART), 
+    e.g., the AO overlap matrix S, to the spherical AO basis, i.e., T . S . T^T.
+    '''
+    T = self.cart2sph
+    return T.dot(T.dot(numpy.asarray(matrix)).T).T
+  
+  def get_cutoff_radii(self,tol,drv=None):
+    '''See :func:`get_cutoff_radii`.'''
+    if not isinstance(drv,(list,tuple,numpy.ndarray)): drv = [drv]
+    d = max([0 if i == 0 else (1 if i < 4 else 2) 
+             for i in map(validate_drv,drv)])
+    prim_shell = numpy.repeat(numpy.arange(len(self.pnum_list)),self.pnum_list)
+    if tol <= 0 or len(prim_shell) == 0:
+      return numpy.ones(len(prim_shell))*numpy.inf
+    
+    renorm = 1. if self.renorm is None else numpy.abs(self.renorm).max()
+    alpha = self.ao_coeffs[:,0]
+    l = numpy.zeros(len(self.assign),dtype=int)
+    l[self.assign > 0] = self.lxlylz[self.cart_offset[self.assign > 0]].sum(axis=1)
+    l = l[prim_shell]
+    A = (numpy.abs(self.ao_coeffs[:,1]) * self.prim_norm * renorm * 
+         (l + 2.)**d * numpy.maximum(1.,2*alpha)**d)
+    L = l + d
+    with numpy.errstate(divide='ignore',invalid='ignore',over='ignore'):
+      # Maximum of r^L exp(-alpha r^2)
+      r = numpy.sqrt(L/(2*alpha))
+      fmax = A * r**L * numpy.exp(-alpha*r**2)
+      # Solve A r^L exp(-alpha r^2) = tol for r > r_max by fixed-point iteration
+      log_a = numpy.log(A/tol)
+      r = numpy.maximum(r,numpy.sqrt(numpy.maximum(log_a,0.)/alpha))
+      for i in range(50):
+        r = numpy.sqrt(numpy.maximum(log_a + L*numpy.log(numpy.maximum(r,1e-300)),
+                                     0.)/alpha)
+    rcut2 = r**2
+    rcut2[(fmax < tol) | (self.assign[prim_shell] == 0)] = 0.
+    return require(rcut2,dtype='f')
+  
+  def get_active(self,rcut2,bbox):
+    '''See :func:`get_active_aos`.'''
+    bbox = numpy.asarray(bbox,dtype=float)
+    # Maximal squared cutoff radius of each shell
+    shell_rcut2 = -numpy.ones(len(self.pnum_list))
+    prim_shell = numpy.repeat(numpy.arange(len(self.pnum_list)),self.pnum_list)
+    numpy.maximum.at(shell_rcut2,prim_shell,rcut2)
+    # Squared distance of the atoms to the bounding box
+    at_pos = self.geo_spec[self.atom_indices]
+    d = numpy.maximum(0.,numpy.maximum(bbox[:,0] - at_pos, at_pos - bbox[:,1]))
+    is_active = (d**2).sum(axis=1) <= shell_rcut2
+    return numpy.flatnonzero(is_active),numpy.flatnonzero(is_active[self.ao_assign])
+  
+  def select(self,shells,rcut2=None):
+    '''Returns a BasisPlan restricted to a subset of shells and, if requested,
+    the corresponding squared cutoff radii of the primitives.
+    '''
+    shells = numpy.asarray(shells,dtype=int)
+    new_index = -numpy.ones(len(self.pnum_list),dtype=int)
+    new_index[shells] = numpy.arange(len(shells))
+    cart_mask = new_index[self.cart_assign] >= 0
+    prim_mask = numpy.repeat(new_index >= 0,self.pnum_list)
+    
+    sel = BasisPlan.__new__(BasisPlan)
+    sel.key = None
+    sel.geo_spec = self.geo_spec
+    sel.lxlylz = require(self.lxlylz[cart_mask],dtype='i')
+    sel.cart_assign = require(new_index[self.cart_assign[cart_mask]],dtype='i')
+    sel.assign = require(self.assign[shells],dtype='i')
+    sel.ao_coeffs = require(self.ao_coeffs[prim_mask],dtype='f')
+    sel.pnum_list = require(self.pnum_list[shells],dtype='i')
+    sel.atom_indices = require(self.atom_indices[shells],dtype='i')
+    sel._prim_norm = (None if self._prim_norm is None 
+                      else self._prim_norm[prim_mask])
+    sel.is_normalized = self.is_normalized
+    sel.renorm = None if self.renorm is None else self.renorm[cart_mask]
+    sel.cart2sph = None
+    sel.sph_assign = None
+    if self.cart2sph is not None:
+      sph_mask = new_index[self.sph_assign] >= 0
+      sel.cart2sph = self.cart2sph[numpy.flatnonzero(sph_mask)][:,
+                                   numpy.flatnonzero(cart_mask)].tocsr()
+      sel.sph_assign = new_index[self.sph_assign[sph_mask]]
+    if rcut2 is not None:
+      return sel,rcut2[prim_mask]
+    return sel
+
+def get_basis_key(geo_spec,ao_spec,ao_spherical=None):
+  '''Returns a fingerprint of geo_spec, ao_spec, and ao_spherical, which is used
+  to detect changes of the basis set (cf. :class:`BasisPlan`).
+  '''
+  import hashlib
+  h = hashlib.sha1()
+  h.update(numpy.ascontiguousarray(geo_spec,dtype=float).tobytes() 
+           if geo_spec is not None else b'')
+  for ao in ao_spec:
+    h.update(repr((ao['atom'],ao.get('type'),ao.get('pnum'),
+                   ao.get('exp_list'))).encode())
+    h.update(numpy.ascontiguousarray(ao['coeffs'],dtype=float).tobytes())
+  if ao_spec and 'N' in ao_spec[0]:
+    h.update(numpy.ascontiguousarray(ao_spec[0]['N'],dtype=float).tobytes())
+  h.update(repr(ao_spherical).encode())
+  return h.hexdigest()
+
+def get_basis_plan(qc):
+  '''Returns the :class:`BasisPlan` of a QCinfo instance or dictionary.
+  '''
+  if hasattr(qc,'get_basis_plan'):
+    return qc.get_basis_plan()
+  if isinstance(qc,dict):
+    return BasisPlan(qc['geo_spec'],qc['ao_spec'],qc['ao_spherical'])
+  raise ValueError('qc has to be a QCinfo instance or a dictionary.')
+
 def create_mo_coeff(mo,name='mo'):
   '''Converts the input variable to an :literal:`mo_coeff` numpy.ndarray.
   
@@ -1070,7 +2065,9 @@ def create_mo_coeff(mo,name='mo'):
   mo : numpy.ndarray, shape = (NMO,NAO)
     Contains the molecular orbital coefficients of all orbitals.
   '''
-  if (not is_mo_spec(mo)):
+  if isinstance(mo,MOSpec):
+    mo = mo.coeffs if len(mo) else []
+  elif (not is_mo_spec(mo)):
     if (not isinstance(mo,(list,numpy.ndarray))):
       raise ValueError('%s has to be mo_spec or an numpy coefficient array.'%name)
   else:
@@ -1083,9 +2080,28 @@ def create_mo_coeff(mo,name='mo'):
     raise ValueError('%s has to be 2-dimensional.'%name)  
   return mo
 
+def create_mo_occ(mo_spec):
+  '''Returns the occupation numbers of :literal:`mo_spec` as numpy.ndarray.
+  
+  **Parameters:**
+  
+  mo_spec : List of dictionaries or :class:`orbkit.qcinfo.MOSpec`
+    See :ref:`Central Variables` for details.
+  
+  **Returns:**
+  
+  occ : numpy.ndarray, shape = (NMO,)
+    Contains the occupation numbers of all orbitals.
+  '''
+  if isinstance(mo_spec,MOSpec):
+    return numpy.array(mo_spec.occ_num,dtype=float)
+  return numpy.array([i['occ_num'] for i in mo_spec],dtype=float)
+
 def is_mo_spec(mo):
   '''Checks if :literal:`mo` is of :literal:`mo_spec` type. 
   (See :ref:`Central Variables` for details.)'''
+  if isinstance(mo,MOSpec):
+    return True
   if not isinstance(mo,list):
     return False
   return_val = True
@@ -3,6 +3,8 @@ import cython
 # import both numpy and the Cython declarations for numpy
 import numpy as np
 cimport numpy as np
+from cython.parallel cimport prange, threadid
+from scipy.linalg.cython_blas cimport dgemm
 
 cdef extern from "math.h":
     double sqrt(double x)
@@ -11,7 +13,18 @@ cdef extern from "math.h":
 cdef extern from "c_grid-based.h":
   void c_lcreator(double* ao_list, int* lxlylz, double* coeff_list,
                     double* at_pos, double* x, double* y, double* z, 
-                    int npts, int ao_num, int pnum, int drv, int is_normalized)
+                    Py_ssize_t npts, int ao_num, int pnum, int drv, 
+                    int is_normalized)
+  void c_lcreator_fused(double* ao_list, int* lxlylz, double* coeff_list,
+                    double* at_pos, double* x, double* y, double* z, 
+                    Py_ssize_t npts, int ao_num, int pnum, int* drv, int ndrv, 
+                    Py_ssize_t ao_stride, Py_ssize_t ao_ld, double* rcut2, 
+                    int is_normalized) nogil
+  void c_lcreator_reg(double* ao_list, int* lxlylz, double* coeff_list,
+                    double* at_pos, double* x, double* y, double* z, 
+                    int nx, int ny, int nz, int ao_num, int pnum, 
+                    int* drv, int ndrv, Py_ssize_t ao_stride, 
+                    Py_ssize_t ao_ld, double* rcut2, int is_normalized) nogil
 
 cdef extern from "c_support.h":
   double ao_norm(int l,int m,int n,double alpha, int is_normalized)
@@ -39,7 +52,7 @@ def lcreator(np.ndarray[double, ndim=2, mode="c"] ao_list       not None,
   """
   lcreator(ao_list,lxlylz,coeff_list,at_pos,x,y,z,ao_num,pnum,drv,is_normalized)
   """
-  cdef int npts = x.shape[0]
+  cdef Py_ssize_t npts = x.shape[0]
   
   c_lcreator(&ao_list[0,0],&lxlylz[0,0],&coeff_list[0,0],
                          &at_pos[0],&x[0],&y[0],&z[0],npts,ao_num,pnum,
@@ -75,13 +88,244 @@ def aocreator(np.ndarray[int,    ndim=2, mode="c"] lxlylz       not None,
     c_ao += assign[i]
     c_p += pnum_list[i]
   return ao_list
+
+def shell_is_negligible(at_pos,bbox,rcut2):
+  """
+  shell_is_negligible(at_pos,bbox,rcut2)
+  
+  Returns True, if the squared distance of at_pos to the bounding box 
+  bbox=[[xmin,xmax],[ymin,ymax],[zmin,zmax]] exceeds all squared cutoff radii 
+  rcut2 of the primitives of a shell.
+  """
+  d = np.maximum(0.,np.maximum(bbox[:,0] - at_pos, at_pos - bbox[:,1]))
+  return len(rcut2) == 0 or (d**2).sum() > rcut2.max()
+
+def get_active_shells(np.ndarray[int,    ndim=1, mode="c"] assign,
+                      np.ndarray[int,    ndim=1, mode="c"] pnum_list,
+                      np.ndarray[double, ndim=2, mode="c"] geo_spec,
+                      np.ndarray[int,    ndim=1, mode="c"] atom_indices,
+                      bbox,rcut2):
+  """
+  get_active_shells(assign,pnum_list,geo_spec,atom_indices,bbox,rcut2)
+  
+  Returns an array of shape (NACTIVE,3) containing the index of the first AO,
+  the index of the first primitive, and the index of all shells, which are not
+  negligible within the bounding box bbox (cf. shell_is_negligible). If rcut2
+  is None, all shells are returned.
+  """
+  cdef int i
+  cdef int c_ao = 0 # counter for aos
+  cdef int c_p = 0  # counter for primitves 
+  tasks = []
+  for i in range(assign.shape[0]):
+    if (rcut2 is None or 
+        not shell_is_negligible(geo_spec[atom_indices[i],:],bbox,
+                                rcut2[c_p:c_p+pnum_list[i]])):
+      tasks.append((c_ao,c_p,i))
+    c_ao += assign[i]
+    c_p += pnum_list[i]
+  return np.array(tasks,dtype=np.intc).reshape((-1,3))
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def aocreator_fused(np.ndarray[int,    ndim=2, mode="c"] lxlylz       not None,
+                    np.ndarray[int,    ndim=1, mode="c"] assign       not None,
+                    np.ndarray[double, ndim=2, mode="c"] ao_coeffs    not None, 
+                    np.ndarray[int,    ndim=1, mode="c"] pnum_list    not None,
+                    np.ndarray[double, ndim=2, mode="c"] geo_spec     not None, 
+                    np.ndarray[int,    ndim=1, mode="c"] atom_indices not None,
+                    np.ndarray[double, ndim=1, mode="c"] x            not None,
+                    np.ndarray[double, ndim=1, mode="c"] y            not None,
+                    np.ndarray[double, ndim=1, mode="c"] z            not None,
+                    np.ndarray[int,    ndim=1, mode="c"] drv          not None,
+                    int is_normalized,
+                    np.ndarray[double, ndim=1, mode="c"] rcut2=None,
+                    int numthreads=1):  
+  """
+  aocreator_fused(lxlylz,assign,ao_coeffs,pnum_list,geo_spec,atom_indices,x,y,z,drv,is_normalized,rcut2=None,numthreads=1)
+  
+  Computes the AOs and/or their derivatives for all entries of drv in one pass 
+  over the (vector) grid. Returns ao_list with shape (NDRV, NAO, npts).
+  
+  If rcut2 (squared cutoff radius of each primitive) is given, shells whose 
+  atom is too far from the bounding box of the grid are skipped, and 
+  primitives are skipped point by point.
+  
+  The shells and blocks of grid points are distributed to NUMTHREADS OpenMP 
+  threads without holding the GIL.
+  """
+  cdef Py_ssize_t npts = x.shape[0]
+  cdef int ao_num = lxlylz.shape[0]
+  cdef int ndrv = drv.shape[0]
+  cdef np.ndarray[double, ndim=3, mode="c"] ao_list = np.zeros([ndrv,ao_num,npts],
+                                                               dtype=np.float64)
+  cdef np.ndarray[int, ndim=2, mode="c"] tasks
+  cdef int t,k,c_ao,c_p,i
+  cdef Py_ssize_t i0,n
+  cdef int nblock = 1
+  cdef Py_ssize_t block = npts
+  cdef double* p_rcut2 = NULL
+  cdef double* rc = NULL
+  if npts == 0 or ndrv == 0:
+    return ao_list
+  bbox = None
+  if rcut2 is not None:
+    bbox = np.array([[x.min(),x.max()],[y.min(),y.max()],[z.min(),z.max()]])
+    if rcut2.shape[0] > 0:
+      rc = &rcut2[0]
+  tasks = get_active_shells(assign,pnum_list,geo_spec,atom_indices,bbox,rcut2)
+  if numthreads > 1:
+    # Split the grid into blocks, which are computed independently
+    nblock = max(1,min(npts // 1024,numthreads))
+    block = (npts + nblock - 1) // nblock
+  for t in prange(tasks.shape[0]*nblock, nogil=True, num_threads=numthreads,
+                  schedule='dynamic'):
+    k = t // nblock
+    i0 = (t % nblock) * block
+    n = min(block,npts-i0)
+    if n <= 0:
+      continue
+    c_ao = tasks[k,0]
+    c_p = tasks[k,1]
+    i = tasks[k,2]
+    p_rcut2 = NULL if rc == NULL else rc + c_p
+    c_lcreator_fused(&ao_list[0,c_ao,i0],&lxlylz[c_ao,0],&ao_coeffs[c_p,0],
+                     &geo_spec[atom_indices[i],0],&x[i0],&y[i0],&z[i0],n,
+                     assign[i],pnum_list[i],&drv[0],ndrv,
+                     <Py_ssize_t> ao_num*npts,npts,
+                     p_rcut2,is_normalized)
+  return ao_list
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def aocreator_regular(np.ndarray[int,    ndim=2, mode="c"] lxlylz       not None,
+                      np.ndarray[int,    ndim=1, mode="c"] assign       not None,
+                      np.ndarray[double, ndim=2, mode="c"] ao_coeffs    not None, 
+                      np.ndarray[int,    ndim=1, mode="c"] pnum_list    not None,
+                      np.ndarray[double, ndim=2, mode="c"] geo_spec     not None, 
+                      np.ndarray[int,    ndim=1, mode="c"] atom_indices not None,
+                      np.ndarray[double, ndim=1, mode="c"] x            not None,
+                      np.ndarray[double, ndim=1, mode="c"] y            not None,
+                      np.ndarray[double, ndim=1, mode="c"] z            not None,
+                      np.ndarray[int,    ndim=1, mode="c"] drv          not None,
+                      int is_normalized,
+                      np.ndarray[double, ndim=1, mode="c"] rcut2=None,
+                      int numthreads=1):  
+  """
+  aocreator_regular(lxlylz,assign,ao_coeffs,pnum_list,geo_spec,atom_indices,x,y,z,drv,is_normalized,rcut2=None,numthreads=1)
+  
+  Regular grid version of aocreator_fused, i.e., x, y, and z are the axes of 
+  the grid. Returns ao_list with shape (NDRV, NAO, Nx*Ny*Nz), where z runs 
+  fastest.
+  
+  The shells and blocks of the x-axis are distributed to NUMTHREADS OpenMP 
+  threads without holding the GIL.
+  """
+  cdef int nx = x.shape[0]
+  cdef int ny = y.shape[0]
+  cdef int nz = z.shape[0]
+  cdef Py_ssize_t npts = <Py_ssize_t> nx * ny * nz
+  cdef int ao_num = lxlylz.shape[0]
+  cdef int ndrv = drv.shape[0]
+  cdef np.ndarray[double, ndim=3, mode="c"] ao_list = np.zeros([ndrv,ao_num,npts],
+                                                               dtype=np.float64)
+  cdef np.ndarray[int, ndim=2, mode="c"] tasks
+  cdef int t,k,i0,n,c_ao,c_p,i
+  cdef int nblock = 1
+  cdef int block = nx
+  cdef double* p_rcut2 = NULL
+  cdef double* rc = NULL
+  if npts == 0 or ndrv == 0:
+    return ao_list
+  bbox = None
+  if rcut2 is not None:
+    bbox = np.array([[x.min(),x.max()],[y.min(),y.max()],[z.min(),z.max()]])
+    if rcut2.shape[0] > 0:
+      rc = &rcut2[0]
+  tasks = get_active_shells(assign,pnum_list,geo_spec,atom_indices,bbox,rcut2)
+  if numthreads > 1:
+    # Split the x-axis into blocks, which are computed independently
+    nblock = max(1,min(nx,numthreads))
+    block = (nx + nblock - 1) // nblock
+  for t in prange(tasks.shape[0]*nblock, nogil=True, num_threads=numthreads,
+                  schedule='dynamic'):
+    k = t // nblock
+    i0 = (t % nblock) * block
+    n = min(block,nx-i0)
+    if n <= 0:
+      continue
+    c_ao = tasks[k,0]
+    c_p = tasks[k,1]
+    i = tasks[k,2]
+    p_rcut2 = NULL if rc == NULL else rc + c_p
+    c_lcreator_reg(&ao_list[0,c_ao,<Py_ssize_t> i0*ny*nz],&lxlylz[c_ao,0],&ao_coeffs[c_p,0],
+                   &geo_spec[atom_indices[i],0],&x[i0],&y[0],&z[0],n,ny,nz,
+                   assign[i],pnum_list[i],&drv[0],ndrv,
+                   <Py_ssize_t> ao_num*npts,npts,
+                   p_rcut2,is_normalized)
+  return ao_list
   
 @cython.boundscheck(False)
 @cython.wraparound(False)
 def mocreator(np.ndarray[double, ndim=2, mode="c"] ao_list      not None,
-              np.ndarray[double, ndim=2, mode="c"] mo_coeffs    not None,):  
+              np.ndarray[double, ndim=2, mode="c"] mo_coeffs    not None,
+              np.ndarray[double, ndim=2] out=None, int block=4096,
+              int numthreads=1):
   """
-  mocreator(ao_list,mo_coeffs)
+  mocreator(ao_list,mo_coeffs,out=None,block=4096,numthreads=1)
+  
+  Computes mo_list = mo_coeffs . ao_list with BLAS (dgemm). The grid is 
+  processed in blocks of BLOCK points, i.e., the AO panel of each block stays 
+  in cache. If OUT is given, the result is written directly to OUT, which may
+  be a view with non-unit row stride, e.g., mo_list[:,i:j].
+  
+  The blocks are distributed to NUMTHREADS OpenMP threads.
+  """
+  cdef int ao_num = ao_list.shape[0]
+  cdef int npts   = ao_list.shape[1]
+  cdef int mo_num = mo_coeffs.shape[0]
+  if mo_coeffs.shape[1] != ao_num:
+    raise ValueError('Shapes of mo_coeffs and ao_list are not aligned.')
+  if out is None:
+    out = np.empty([mo_num,npts],dtype=np.float64)
+  elif out.shape[0] != mo_num or out.shape[1] != npts:
+    raise ValueError('The argument `out` has the wrong shape.')
+  elif out.strides[1] != sizeof(double) or out.strides[0] % sizeof(double):
+    raise ValueError('The argument `out` has to be C-contiguous along its last axis.')
+  if mo_num == 0 or npts == 0:
+    return out
+  if ao_num == 0:
+    out[...] = 0.
+    return out
+  
+  cdef double alpha = 1.0, beta = 0.0
+  cdef char* transa = 'N'
+  cdef char* transb = 'N'
+  cdef int lda = ao_list.strides[0] // sizeof(double)
+  cdef int ldb = ao_num
+  cdef int ldc = out.strides[0] // sizeof(double)
+  cdef double* a = <double*> ao_list.data
+  cdef double* b = <double*> mo_coeffs.data
+  cdef double* c = <double*> out.data
+  cdef int i, k, n
+  if block <= 0: block = npts
+  cdef int nblock = (npts + block - 1) // block
+  # Row-major C = B A is computed as column-major C^T = A^T B^T
+  for k in prange(nblock, nogil=True, num_threads=numthreads, 
+                  schedule='static'):
+    i = k * block
+    n = min(block,npts-i)
+    dgemm(transa,transb,&n,&mo_num,&ao_num,&alpha,&a[i],&lda,
+          b,&ldb,&beta,&c[i],&ldc)
+  
+  return out
+
+def mocreator_naive(np.ndarray[double, ndim=2, mode="c"] ao_list      not None,
+                    np.ndarray[double, ndim=2, mode="c"] mo_coeffs    not None,):  
+  """
+  mocreator_naive(ao_list,mo_coeffs)
+  
+  Reference implementation of mocreator without BLAS.
   """
   cdef int ao_num = ao_list.shape[0]
   cdef int npts   = ao_list.shape[1]
@@ -98,3 +342,187 @@ def mocreator(np.ndarray[double, ndim=2, mode="c"] ao_list      not None,
       mo_list[i,j] = value
   
   return mo_list
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _rho_tile(double* mo, int ld, int cs, int m, int n, double* occ,
+                    int* drv_index, int nrho_drv, double* rho, 
+                    double* delta_rho, Py_ssize_t ld_rho, 
+                    double* mo_norm) noexcept nogil:
+  # mo[c*cs + k*ld + p] contains the derivative c of the MO k at the point p
+  cdef int i,k,p,d1,d2a,d2b
+  cdef double o,v,w,s
+  for k in range(m):
+    o = occ[k]
+    s = 0.
+    for p in range(n):
+      v = mo[k*ld+p]
+      s = s + v*v
+      rho[p] += o*v*v
+    mo_norm[k] += s
+    for i in range(nrho_drv):
+      d1 = drv_index[3*i]
+      d2a = drv_index[3*i+1]
+      d2b = drv_index[3*i+2]
+      for p in range(n):
+        w = mo[d1*cs+k*ld+p] * mo[k*ld+p]
+        if d2a >= 0:
+          w = w + mo[d2a*cs+k*ld+p] * mo[d2b*cs+k*ld+p]
+        delta_rho[i*ld_rho+p] += 2*o*w
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def rhocreator(np.ndarray[int,    ndim=2, mode="c"] lxlylz       not None,
+               np.ndarray[int,    ndim=1, mode="c"] assign       not None,
+               np.ndarray[double, ndim=2, mode="c"] ao_coeffs    not None, 
+               np.ndarray[int,    ndim=1, mode="c"] pnum_list    not None,
+               np.ndarray[double, ndim=2, mode="c"] geo_spec     not None, 
+               np.ndarray[int,    ndim=1, mode="c"] atom_indices not None,
+               np.ndarray[double, ndim=1, mode="c"] x            not None,
+               np.ndarray[double, ndim=1, mode="c"] y            not None,
+               np.ndarray[double, ndim=1, mode="c"] z            not None,
+               np.ndarray[int,    ndim=1, mode="c"] drv          not None,
+               int is_normalized,
+               np.ndarray[double, ndim=2, mode="c"] mo_coeffs    not None,
+               np.ndarray[double, ndim=1, mode="c"] occ          not None,
+               np.ndarray[int,    ndim=2, mode="c"] drv_index    not None,
+               np.ndarray[double, ndim=1, mode="c"] rcut2=None,
+               int is_regular=0, int block=128, int mo_block=64, 
+               int numthreads=1):
+  """
+  rhocreator(lxlylz,assign,ao_coeffs,pnum_list,geo_spec,atom_indices,x,y,z,drv,is_normalized,mo_coeffs,occ,drv_index,rcut2=None,is_regular=0,block=128,mo_block=64,numthreads=1)
+  
+  Computes the electron density rho = sum_k occ[k] mo_k**2, the norm of the 
+  MOs mo_norm[k] = sum_p mo_k[p]**2, and the derivatives of the density without
+  storing the AOs or MOs of the complete grid. 
+  
+  The grid is processed in tiles of about BLOCK points (complete z-rows for 
+  regular grids). For each tile, the AOs with respect to all derivatives in 
+  drv (drv[0] = 0) are computed, contracted with the Cartesian MO coefficients
+  (mo_coeffs, shape=(NMO,NCART)) in chunks of MO_BLOCK orbitals with BLAS 
+  (dgemm), and accumulated immediately. 
+  
+  Each row (d1,d2a,d2b) of drv_index defines one derivative of the density
+  delta_rho = sum_k 2 occ[k] (mo_k^(d1) mo_k + mo_k^(d2a) mo_k^(d2b)), where 
+  the entries are indices of drv and the second term is omitted if d2a < 0.
+  
+  The tiles are distributed to NUMTHREADS OpenMP threads without holding the 
+  GIL. Returns rho with shape (npts,), mo_norm with shape (NMO,), and 
+  delta_rho with shape (NRHODRV,npts). For regular grids, z runs fastest.
+  """
+  cdef int nx = x.shape[0]
+  cdef int ny = y.shape[0]
+  cdef int nz = z.shape[0]
+  cdef Py_ssize_t npts = <Py_ssize_t> nx * ny * nz if is_regular else nx
+  cdef int ncart = lxlylz.shape[0]
+  cdef int ncomp = drv.shape[0]
+  cdef int mo_num = mo_coeffs.shape[0]
+  cdef int nrho_drv = drv_index.shape[0]
+  if mo_coeffs.shape[1] != ncart:
+    raise ValueError('Shapes of mo_coeffs and lxlylz are not aligned.')
+  if occ.shape[0] != mo_num:
+    raise ValueError('Shapes of mo_coeffs and occ are not aligned.')
+  if ncomp == 0 or drv[0] != 0:
+    raise ValueError('The first entry of drv has to be 0.')
+  if nrho_drv > 0 and (drv_index.shape[1] != 3 or drv_index.min() < -1 or 
+                       drv_index.max() >= ncomp or drv_index[:,0].min() < 0):
+    raise ValueError('drv_index has to contain valid indices of drv.')
+  if numthreads < 1: numthreads = 1
+  if block < 1: block = 1
+  if mo_block < 1: mo_block = 1
+  
+  cdef np.ndarray[double, ndim=1, mode="c"] rho = np.zeros([npts],
+                                                           dtype=np.float64)
+  cdef np.ndarray[double, ndim=2, mode="c"] delta_rho = np.zeros([nrho_drv,npts],
+                                                           dtype=np.float64)
+  cdef np.ndarray[double, ndim=2, mode="c"] mo_norm = np.zeros([numthreads,mo_num],
+                                                           dtype=np.float64)
+  if npts == 0 or ncart == 0 or mo_num == 0:
+    return rho, mo_norm.sum(axis=0), delta_rho
+  
+  cdef double* p_rcut2 = NULL
+  cdef double* rc = NULL
+  bbox = None
+  if rcut2 is not None:
+    bbox = np.array([[x.min(),x.max()],[y.min(),y.max()],[z.min(),z.max()]])
+    if rcut2.shape[0] > 0:
+      rc = &rcut2[0]
+  cdef np.ndarray[int, ndim=2, mode="c"] tasks = get_active_shells(assign,
+                                pnum_list,geo_spec,atom_indices,bbox,rcut2)
+  cdef int ntasks = tasks.shape[0]
+  
+  # Tiles of the grid
+  cdef int rows = 1, nrow_tiles = 1, tile
+  cdef Py_ssize_t ntiles
+  if is_regular:
+    rows = max(1,min(ny,block // nz))
+    nrow_tiles = (ny + rows - 1) // rows
+    tile = rows * nz
+    ntiles = nx * nrow_tiles
+  else:
+    tile = min(block,npts)
+    ntiles = (npts + tile - 1) // tile
+  cdef int mb = min(mo_block,mo_num)
+  cdef int nmb = (mo_num + mb - 1) // mb
+  
+  # Private buffers of each thread (the AOs of inactive shells remain zero)
+  cdef np.ndarray[double, ndim=2, mode="c"] ao_buf = np.zeros(
+                                      [numthreads,ncomp*ncart*tile],dtype=np.float64)
+  cdef np.ndarray[double, ndim=2, mode="c"] mo_buf = np.zeros(
+                                      [numthreads,ncomp*mb*tile],dtype=np.float64)
+  cdef double* p_rho = <double*> rho.data
+  cdef double* p_delta = <double*> delta_rho.data
+  cdef double* p_norm = <double*> mo_norm.data
+  cdef int* p_drv_index = <int*> drv_index.data
+  
+  cdef double alpha = 1.0, beta = 0.0
+  cdef char* transa = 'N'
+  cdef char* transb = 'N'
+  cdef int tid,ix,j0,n,k,q,m0,m,c,c_ao,c_p,s
+  cdef Py_ssize_t t,p0
+  cdef double* ao
+  cdef double* mo
+  for t in prange(ntiles, nogil=True, num_threads=numthreads, 
+                  schedule='dynamic'):
+    tid = threadid()
+    ao = &ao_buf[tid,0]
+    mo = &mo_buf[tid,0]
+    if is_regular:
+      ix = t // nrow_tiles
+      j0 = (t % nrow_tiles) * rows
+      n = min(rows,ny-j0) * nz
+      p0 = (<Py_ssize_t> ix*ny + j0) * nz
+    else:
+      p0 = t * tile
+      n = min(tile,npts-p0)
+    
+    # Compute the AOs for this tile
+    for k in range(ntasks):
+      c_ao = tasks[k,0]
+      c_p = tasks[k,1]
+      s = tasks[k,2]
+      p_rcut2 = NULL if rc == NULL else rc + c_p
+      if is_regular:
+        c_lcreator_reg(&ao[c_ao*tile],&lxlylz[c_ao,0],&ao_coeffs[c_p,0],
+                       &geo_spec[atom_indices[s],0],&x[ix],&y[j0],&z[0],
+                       1,n // nz,nz,assign[s],pnum_list[s],&drv[0],ncomp,
+                       ncart*tile,tile,p_rcut2,is_normalized)
+      else:
+        c_lcreator_fused(&ao[c_ao*tile],&lxlylz[c_ao,0],&ao_coeffs[c_p,0],
+                         &geo_spec[atom_indices[s],0],&x[p0],&y[p0],&z[p0],
+                         n,assign[s],pnum_list[s],&drv[0],ncomp,
+                         ncart*tile,tile,p_rcut2,is_normalized)
+    
+    # Contract to the MOs chunk by chunk and accumulate the density
+    for q in range(nmb):
+      m0 = q * mb
+      m = min(mb,mo_num-m0)
+      for c in range(ncomp):
+        # Row-major MO = C AO is computed as column-major MO^T = AO^T C^T
+        dgemm(transa,transb,&n,&m,&ncart,&alpha,&ao[c*ncart*tile],&tile,
+              &mo_coeffs[m0,0],&ncart,&beta,&mo[c*mb*tile],&tile)
+      _rho_tile(mo,tile,mb*tile,m,n,&occ[m0],p_drv_index,nrho_drv,
+                p_rho + p0,p_delta + p0,npts,p_norm + tid*mo_num + m0)
+  
+  return rho, mo_norm.sum(axis=0), delta_rho
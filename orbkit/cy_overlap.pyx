@@ -3,6 +3,7 @@ import cython
 # import both numpy and the Cython declarations for numpy
 import numpy as np
 cimport numpy as np
+from cython.parallel cimport prange
 
 cdef extern from "math.h":
     double sqrt(double x)
@@ -128,28 +129,46 @@ def mooverlap(np.ndarray[double, ndim=1, mode="c"] mo_a           not None,
   
   return overlap
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _mooverlap_row(double* mo_a, double* mo_b, double* aoom, double* moom,
+                         int nmo_b, int nao, int mao) noexcept nogil:
+  cdef double tmpsum
+  cdef int j,k,l
+  for j in range(nmo_b):
+    tmpsum = 0.0
+    for k in range(nao):
+      for l in range(mao):
+        tmpsum += mo_a[k] * mo_b[j*mao+l] * aoom[k*mao+l]
+    moom[j] = tmpsum
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 def mooverlapmatrix(np.ndarray[double, ndim=2, mode="c"] mo_a     not None,
                     np.ndarray[double, ndim=2, mode="c"] mo_b     not None,
                     np.ndarray[double, ndim=2, mode="c"] aoom     not None,
                     int i_start,
-                    int i_end):
+                    int i_end,
+                    int numthreads=1):
+  """
+  mooverlapmatrix(mo_a,mo_b,aoom,i_start,i_end,numthreads=1)
+  
+  Computes the rows i_start to i_end of the MO overlap matrix. The rows are 
+  distributed to NUMTHREADS OpenMP threads without holding the GIL.
+  """
   cdef int nao = aoom.shape[0]
   cdef int mao = aoom.shape[1]
   cdef int nmo_a = mo_a.shape[0]
   cdef int nmo_b = mo_b.shape[0]
   cdef np.ndarray[double, ndim=2, mode="c"] moom = np.zeros([i_end-i_start,nmo_b],
                                                                dtype=np.float64)
-  cdef double tmpsum
-  cdef int i,j,k,l
-
-  for i in range(i_start,i_end):
-    for j in range(nmo_b):
-      tmpsum = 0.0
-      for k in range(nao):
-        for l in range(mao):
-          tmpsum += mo_a[i,k] * mo_b[j,l] * aoom[k,l]
-      moom[i-i_start,j] = tmpsum
+  cdef int i
+  if i_end <= i_start or nmo_b == 0 or nao == 0 or mao == 0:
+    return moom
+  
+  for i in prange(i_start,i_end,nogil=True,num_threads=numthreads,
+                  schedule='dynamic'):
+    _mooverlap_row(&mo_a[i,0],&mo_b[0,0],&aoom[0,0],&moom[i-i_start,0],
+                   nmo_b,nao,mao)
   
   return moom
@@ -82,12 +82,17 @@ def enum(zero,sing,moom):
   return cy_ci.get_enum(zero,sing,moom)
 
 
+def initializer(gargs):
+  global multici
+  multici = gargs
+
 def slice_rho(ij):  
   '''Computes the electron (transition) density on a grid for a single slice.
   '''
-  return cy_ci.get_rho(ij[0],ij[1],multici['zero'],multici['sing'],multici['molist'])
+  return cy_ci.get_rho(ij[0],ij[1],multici['zero'],multici['sing'],multici['molist'],
+                       numthreads=multici['numthreads'])
 
-def rho(zero,sing,molist,slice_length=1e4,numproc=1):
+def rho(zero,sing,molist,slice_length=1e4,numproc=1,numthreads=1):
   '''Computes the electron (transition) density on a grid.
   
   **Parameters:**
@@ -106,6 +111,8 @@ def rho(zero,sing,molist,slice_length=1e4,numproc=1):
       Specifies the number of points per subprocess.
     numproc : int, optional
       Specifies the number of subprocesses for multiprocessing.
+    numthreads : int, optional
+      Specifies the number of OpenMP threads within each subprocess.
   
   **Returns:**
   
@@ -120,14 +127,16 @@ def rho(zero,sing,molist,slice_length=1e4,numproc=1):
   molist.shape = (shape[0],-1)
   
   # Set the global array
-  multici = {'zero': zero, 'sing': sing, 'molist':molist}
+  multici = {'zero': zero, 'sing': sing, 'molist':molist, 
+             'numthreads': numthreads}
   
   slice_length = min(molist.shape[1],slice_length)
   ij = numpy.arange(0,molist.shape[1]+1,abs(int(slice_length)),dtype=numpy.intc)
   ij = list(zip(ij[:-1],ij[1:]))
   
   data = numpy.zeros(molist.shape[1])
-  return_val = omp_functions.run(slice_rho,x=ij,numproc=min(len(ij),numproc),display=display)
+  return_val = omp_functions.run(slice_rho,x=ij,numproc=min(len(ij),numproc),display=display,
+                               initializer=initializer,global_args=multici)
   for k,(i,j) in enumerate(ij):
     data[i:j] = return_val[k]
   
@@ -138,10 +147,11 @@ def rho(zero,sing,molist,slice_length=1e4,numproc=1):
 def slice_jab(ij):   
   '''Computes the electronic (transition) flux density on a grid for a single slice.
   '''  
-  return cy_ci.get_jab(ij[0],ij[1],multici['zero'],multici['sing'],multici['molist'],multici['molistdrv'])
+  return cy_ci.get_jab(ij[0],ij[1],multici['zero'],multici['sing'],multici['molist'],multici['molistdrv'],
+                       numthreads=multici['numthreads'])
 
 
-def jab(zero,sing,molist,molistdrv,slice_length=1e4,numproc=1):
+def jab(zero,sing,molist,molistdrv,slice_length=1e4,numproc=1,numthreads=1):
   r'''Computes the imaginary part of the electronic transition flux density on a grid.
 
   .. math::
@@ -167,6 +177,8 @@ def jab(zero,sing,molist,molistdrv,slice_length=1e4,numproc=1):
       Specifies the number of points per subprocess.
     numproc : int, optional
       Specifies the number of subprocesses for multiprocessing.
+    numthreads : int, optional
+      Specifies the number of OpenMP threads within each subprocess.
   
   **Returns:**
   
@@ -187,14 +199,16 @@ def jab(zero,sing,molist,molistdrv,slice_length=1e4,numproc=1):
   molistdrv.shape = (3,shape[0],-1)
   
   # Set the global array
-  multici = {'zero': zero, 'sing': sing, 'molist':molist, 'molistdrv':molistdrv}
+  multici = {'zero': zero, 'sing': sing, 'molist':molist, 'molistdrv':molistdrv,
+             'numthreads': numthreads}
     
   slice_length = min(molist.shape[1],slice_length)
   ij = numpy.arange(0,molist.shape[1]+1,abs(int(slice_length)),dtype=numpy.intc)
   ij = list(zip(ij[:-1],ij[1:]))
   
   data = numpy.zeros((3,molist.shape[1]))
-  return_val = omp_functions.run(slice_jab,x=ij,numproc=min(len(ij),numproc),display=display)
+  return_val = omp_functions.run(slice_jab,x=ij,numproc=min(len(ij),numproc),display=display,
+                               initializer=initializer,global_args=multici)
   for k,(i,j) in enumerate(ij):
     data[:,i:j] = return_val[k]
 
@@ -206,10 +220,11 @@ def jab(zero,sing,molist,molistdrv,slice_length=1e4,numproc=1):
 def slice_a_nabla_b(ij): 
   '''Computes the \psi_a \nabla \psi_b on a grid for a single slice.
   '''    
-  return cy_ci.get_a_nabla_b(ij[0],ij[1],multici['zero'],multici['sing'],multici['molist'],multici['molistdrv'])
+  return cy_ci.get_a_nabla_b(ij[0],ij[1],multici['zero'],multici['sing'],multici['molist'],multici['molistdrv'],
+                             numthreads=multici['numthreads'])
 
 
-def a_nabla_b(zero,sing,molist,molistdrv,slice_length=1e4,numproc=1):
+def a_nabla_b(zero,sing,molist,molistdrv,slice_length=1e4,numproc=1,numthreads=1):
   r'''Computes the following quantity (`a_nabla_b`) on a grid:
 
   .. math::
@@ -234,6 +249,8 @@ def a_nabla_b(zero,sing,molist,molistdrv,slice_length=1e4,numproc=1):
       Specifies the number of points per subprocess.
     numproc : int, optional
       Specifies the number of subprocesses for multiprocessing.
+    numthreads : int, optional
+      Specifies the number of OpenMP threads within each subprocess.
   
   **Returns:**
   
@@ -250,14 +267,16 @@ def a_nabla_b(zero,sing,molist,molistdrv,slice_length=1e4,numproc=1):
   molistdrv.shape = (3,shape[0],-1)
   
   # Set the global array
-  multici = {'zero': zero, 'sing': sing, 'molist':molist, 'molistdrv':molistdrv}
+  multici = {'zero': zero, 'sing': sing, 'molist':molist, 'molistdrv':molistdrv,
+             'numthreads': numthreads}
     
   slice_length = min(molist.shape[1],slice_length)
   ij = numpy.arange(0,molist.shape[1]+1,abs(int(slice_length)),dtype=numpy.intc)
   ij = list(zip(ij[:-1],ij[1:]))
   
   data = numpy.zeros((3,molist.shape[1]))
-  return_val = omp_functions.run(slice_a_nabla_b,x=ij,numproc=min(len(ij),numproc),display=display)
+  return_val = omp_functions.run(slice_a_nabla_b,x=ij,numproc=min(len(ij),numproc),display=display,
+                               initializer=initializer,global_args=multici)
   for k,(i,j) in enumerate(ij):
     data[:,i:j] = return_val[k]
 
@@ -1,7 +1,7 @@
 from ..display import display
 import numpy
 from copy import copy
-from ..qcinfo import QCinfo,CIinfo
+from ..qcinfo import QCinfo,CIinfo,MOSpec
 
 # Conversion factors
 eV = 27.211384
@@ -81,7 +81,7 @@ def main_ci_read(qc,filename,itype='psi4_detci',threshold=0.0,
                                                 qc.mo_spec,
                                                 irreps=irreps
                                                 )
-    qc.mo_spec = closed+active+external
+    qc.mo_spec = MOSpec(closed+active+external)
     moocc = numpy.zeros(len(closed),dtype=numpy.intc) + 2
   
   # Add moocc to CI class instances
@@ -3,6 +3,7 @@ import cython
 # import both numpy and the Cython declarations for numpy
 import numpy as np
 cimport numpy as np
+from cython.parallel cimport prange
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
@@ -63,34 +64,77 @@ def get_mu(list zero,
 
   return mur,muv
 
+def get_terms(list zero, list sing):
+  """
+  get_terms(zero,sing)
+  
+  Converts the lists zero and sing to contiguous arrays, i.e., the prefactors
+  and the (pairs of) molecular orbital indices of all terms.
+  """
+  zc = [np.ravel(c) for c in zero[0]]
+  zi = [np.ravel(i) for i in zero[1]]
+  zc = np.concatenate(zc) if zc else np.zeros(0)
+  zi = np.concatenate(zi) if zi else np.zeros(0)
+  sc = np.ravel(sing[0]) if len(sing[0]) else np.zeros(0)
+  si = np.reshape(sing[1],(-1,2)) if len(sing[1]) else np.zeros((0,2))
+  return (np.require(zc,dtype=np.float64,requirements='C'),
+          np.require(zi,dtype=np.intc,requirements='C'),
+          np.require(sc,dtype=np.float64,requirements='C'),
+          np.require(si,dtype=np.intc,requirements='C'))
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _rho_block(Py_ssize_t x0, Py_ssize_t x1, Py_ssize_t i, double* rho, 
+                     double* molist, Py_ssize_t ld, double* zc, int* zi, int nz, 
+                     double* sc, int* si, int ns) noexcept nogil:
+  # The offsets exceed the range of int for NMO*Npts > 2**31
+  cdef int k
+  cdef Py_ssize_t x,sta,stb
+  for k in range(nz):
+    sta = <Py_ssize_t> zi[k]
+    for x in range(x0,x1):
+      rho[x] += zc[k]*molist[sta*ld+x+i]*molist[sta*ld+x+i]
+  for k in range(ns):
+    sta = <Py_ssize_t> si[2*k]
+    stb = <Py_ssize_t> si[2*k+1]
+    for x in range(x0,x1):
+      rho[x] += sc[k]*molist[sta*ld+x+i]*molist[stb*ld+x+i]
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 def get_rho(int i,int j, 
            list zero,
            list sing,
-           np.ndarray[double, ndim=2, mode="c"] molist not None):
-
+           np.ndarray[double, ndim=2, mode="c"] molist not None,
+           int numthreads=1):
+  """
+  get_rho(i,j,zero,sing,molist,numthreads=1)
+  
+  Computes the (transition) density for the points i to j. Blocks of points 
+  are distributed to NUMTHREADS OpenMP threads without holding the GIL.
+  """
   # Initialize the variables
-  cdef int slen = j-i
+  cdef Py_ssize_t slen = j-i
   cdef np.ndarray[double, ndim=1, mode="c"] rho = np.zeros([slen],dtype=np.float64)
-  cdef int sta,stb
-  cdef int iz,jz,ks,x
-  cdef double citmp = 0.0
-  cdef int nz = len(zero[0])
-  cdef int ns = len(sing[0])
-
-  for iz in range(nz):
-    for jz in range(len(zero[0][iz])):
-      sta = zero[1][iz][jz]
-      citmp = zero[0][iz][jz]   
-      for x in range(slen):
-        rho[x] += citmp*molist[sta,(x+i)]*molist[sta,(x+i)]
-  for ks in range(ns):
-    sta = sing[1][ks][0]
-    stb = sing[1][ks][1]
-    citmp = sing[0][ks]
-    for x in range(slen):
-      rho[x] += citmp*molist[sta,(x+i)]*molist[stb,(x+i)]
+  cdef np.ndarray[double, ndim=1, mode="c"] zc,sc
+  cdef np.ndarray[int, ndim=1, mode="c"] zi
+  cdef np.ndarray[int, ndim=2, mode="c"] si
+  zc,zi,sc,si = get_terms(zero,sing)
+  cdef int nz = zc.shape[0]
+  cdef int ns = sc.shape[0]
+  cdef Py_ssize_t ld = molist.shape[1]
+  cdef Py_ssize_t b,x0,x1
+  cdef Py_ssize_t block = 1024
+  cdef Py_ssize_t nblock = (slen + block - 1) // block
+  if slen <= 0 or (nz == 0 and ns == 0):
+    return rho
+  
+  for b in prange(nblock,nogil=True,num_threads=numthreads,schedule='static'):
+    x0 = b*block
+    x1 = min(x0+block,slen)
+    _rho_block(x0,x1,i,&rho[0],&molist[0,0],ld,
+               &zc[0] if nz else NULL,&zi[0] if nz else NULL,nz,
+               &sc[0] if ns else NULL,&si[0,0] if ns else NULL,ns)
   
   return rho 
 
@@ -166,33 +210,71 @@ def get_j_full(np.ndarray[double, ndim=3, mode="c"] ImS not None,
 
   return tdj
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _jab_block(Py_ssize_t x0, Py_ssize_t x1, Py_ssize_t i, 
+                     Py_ssize_t slen, double* jab, double* molist, 
+                     double* molistdrv, Py_ssize_t ld, Py_ssize_t nmo,
+                     double* sc, int* si, int ns, double f, int antisym) noexcept nogil:
+  # jab[d,x] += f*c*(a*nabla_d b - antisym * b*nabla_d a)
+  # The offsets exceed the range of int for 3*NMO*Npts > 2**31
+  cdef int k
+  cdef Py_ssize_t x,d,sta,stb
+  for k in range(ns):
+    sta = <Py_ssize_t> si[2*k]
+    stb = <Py_ssize_t> si[2*k+1]
+    for d in range(3):
+      for x in range(x0,x1):
+        if antisym:
+          jab[d*slen+x] += f*(sc[k]*(molist[sta*ld+x+i]*
+                               molistdrv[(d*nmo+stb)*ld+x+i] - 
+                               molist[stb*ld+x+i]*
+                               molistdrv[(d*nmo+sta)*ld+x+i]))
+        else:
+          jab[d*slen+x] += f*sc[k]*(molist[sta*ld+x+i]*
+                                    molistdrv[(d*nmo+stb)*ld+x+i])
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 def get_jab(int i,int j, 
         list zero,
         list sing,
         np.ndarray[double, ndim=2, mode="c"] molist not None,
-        np.ndarray[double, ndim=3, mode="c"] molistdrv not None):
+        np.ndarray[double, ndim=3, mode="c"] molistdrv not None,
+        int numthreads=1):
   r'''Computes the imaginary part of the electronic flux density
   j_ab = -hbar/2me \sum_k ci[a_k,b_k] ( psi(a_k) \nabla psi(b_k) - psi(b_k) \nabla psi(a_k) )
+  
+  Blocks of points are distributed to NUMTHREADS OpenMP threads without 
+  holding the GIL.
   '''
+  return _get_jab(i,j,sing,molist,molistdrv,-0.5,1,numthreads)
+
+def _get_jab(int i,int j,
+             list sing,
+             np.ndarray[double, ndim=2, mode="c"] molist,
+             np.ndarray[double, ndim=3, mode="c"] molistdrv,
+             double f, int antisym, int numthreads):
   # Initialize the variables
-  cdef int slen = abs(j-i)
+  cdef Py_ssize_t slen = abs(j-i)
   cdef np.ndarray[double, ndim=2, mode="c"] jab = np.zeros(([3,slen]),dtype=np.float64)
-  cdef int sta,stb
-  cdef int ks,x,d
-  cdef double citmp = 0.0
-  cdef int nz = len(zero[0])
-  cdef int ns = len(sing[0])
-
-  for ks in range(ns):
-    sta = sing[1][ks][0]
-    stb = sing[1][ks][1]
-    citmp = sing[0][ks]
-    for d in range(3):
-      for x in range(slen):
-        jab[d,x] -= 0.5*(citmp*(molist[sta,(x+i)]*molistdrv[d,stb,(x+i)] 
-                  - molist[stb,(x+i)]*molistdrv[d,sta,(x+i)]))
+  cdef np.ndarray[double, ndim=1, mode="c"] sc
+  cdef np.ndarray[int, ndim=2, mode="c"] si
+  zc,zi,sc,si = get_terms([[],[]],sing)
+  cdef int ns = sc.shape[0]
+  cdef Py_ssize_t ld = molist.shape[1]
+  cdef Py_ssize_t nmo = molistdrv.shape[1]
+  cdef Py_ssize_t b,x0,x1
+  cdef Py_ssize_t block = 1024
+  cdef Py_ssize_t nblock = (slen + block - 1) // block
+  if slen == 0 or ns == 0:
+    return jab
+  
+  for b in prange(nblock,nogil=True,num_threads=numthreads,schedule='static'):
+    x0 = b*block
+    x1 = min(x0+block,slen)
+    _jab_block(x0,x1,i,slen,&jab[0,0],&molist[0,0],&molistdrv[0,0,0],ld,nmo,
+               &sc[0],&si[0,0],ns,f,antisym)
 
   return jab
 
@@ -216,29 +298,16 @@ def get_jab_full(np.ndarray[double, ndim=2, mode="c"] ImS not None,
       j[c,r] = tmp
   return j
 
-@cython.boundscheck(False)
-@cython.wraparound(False)
 def get_a_nabla_b(int i,int j, 
         list zero,
         list sing,
         np.ndarray[double, ndim=2, mode="c"] molist not None,
-        np.ndarray[double, ndim=3, mode="c"] molistdrv not None):
-
-  # Initialize the variables
-  cdef int slen = abs(j-i)
-  cdef np.ndarray[double, ndim=2, mode="c"] jab = np.zeros(([3,slen]),dtype=np.float64)
-  cdef int sta,stb
-  cdef int ks,x,d
-  cdef double citmp = 0.0
-  cdef int nz = len(zero[0])
-  cdef int ns = len(sing[0])
-
-  for ks in range(ns):
-    sta = sing[1][ks][0]
-    stb = sing[1][ks][1]
-    citmp = sing[0][ks]
-    for d in range(3):
-      for x in range(slen):
-        jab[d,x] += citmp*(molist[sta,(x+i)]*molistdrv[d,stb,(x+i)] )
-
-  return jab
+        np.ndarray[double, ndim=3, mode="c"] molistdrv not None,
+        int numthreads=1):
+  r"""
+  get_a_nabla_b(i,j,zero,sing,molist,molistdrv,numthreads=1)
+  
+  Computes \sum_k ci[a_k,b_k] psi(a_k) \nabla psi(b_k). Blocks of points are
+  distributed to NUMTHREADS OpenMP threads without holding the GIL.
+  """
+  return _get_jab(i,j,sing,molist,molistdrv,1.,0,numthreads)
@@ -3,6 +3,10 @@ from .. import omp_functions
 from ..display import display
 import numpy
 
+def initializer(gargs):
+  global multici
+  multici = gargs
+
 def slice_occ(ij):
   '''Compares a slice of occupation patterns.
   '''
@@ -64,7 +68,8 @@ def compare(cia,cib,moocc=None,numproc=1):
   ij = list(zip(ij[:-1],ij[1:]))
   
   display('\nComparing the occupation patterns \nof the determinants of the two states...')
-  return_value = omp_functions.run(slice_occ,x=ij,numproc=numproc,display=display)
+  return_value = omp_functions.run(slice_occ,x=ij,numproc=numproc,display=display,
+                                   initializer=initializer,global_args=multici)
   
   zero = [[],[]] 
   sing = [[],[]]
@@ -83,7 +83,9 @@ def calc_mo(qc, fid_mo_list, drv=None, otype=None, ofid=None,
                              calc_mo=True,
                              drv=drv,
                              slice_length=slice_length,
-                             numproc=numproc)
+                             numproc=numproc,
+                             tol=options.ao_tol,
+                             numthreads=options.numthreads)
   
   if otype is None:
     return mo_list, mo_info
@@ -195,25 +197,30 @@ def mo_set(qc, fid_mo_list, drv=None, laplacian=None,
   datasets = []
   delta_datasets = []
   cube_files = []
+  mo_ii = dict((j,i) for i,j in enumerate(mo_info['mo_ii']))
   for i_file,j_file in enumerate(mo_info['mo_in_file']):
     display('Starting with the %d. element of the molecular orbital list (%s)...\n\t' % 
                 (i_file+1,fid_mo_list) + str(j_file) + 
                 '\n\t(Only regarding existing and occupied mos.)\n')
     
-    qc_select['mo_spec'] = []
+    index = []
     for i_mo,j_mo in enumerate(mo_info['mo']):
       if j_mo in j_file:
         if mo_info['sym_select']: 
-          ii_mo = numpy.argwhere(mo_info['mo_ii'] == j_mo)
+          ii_mo = mo_ii[j_mo]
         else: 
           ii_mo = i_mo
-        qc_select['mo_spec'].append(mo_info['mo_spec'][int(ii_mo)])
+        index.append(ii_mo)
+    # Index view of the selected molecular orbitals
+    qc_select['mo_spec'] = mo_info['mo_spec'][index]
     
     data = core.rho_compute(qc_select,
                             drv=drv,
                             laplacian=laplacian,
                             slice_length=slice_length,
-                            numproc=numproc)
+                            numproc=numproc,
+                            tol=options.ao_tol,
+                            numthreads=options.numthreads)
     datasets.append(data)
     if drv is None:
       rho = data
@@ -342,7 +349,9 @@ def calc_ao(qc, drv=None, otype=None, ofid=None,
                              calc_ao=True,
                              drv=drv,
                              slice_length=options.slice_length,
-                             numproc=options.numproc)
+                             numproc=options.numproc,
+                             tol=options.ao_tol,
+                             numthreads=options.numthreads)
   
   if otype is None:
     return ao_list
@@ -224,14 +224,18 @@ def run_orbkit(use_qc=None,check_options=True,standalone=False):
     data = core.rho_compute_no_slice(qc,
                                      drv=options.drv,
                                      laplacian=options.laplacian,
-                                     return_components = False)
+                                     return_components = False,
+                                     tol=options.ao_tol,
+                                     numthreads=options.numthreads)
   
   else:
     data = core.rho_compute(qc,
                             drv=options.drv,
                             slice_length=options.slice_length,
                             laplacian=options.laplacian,
-                            numproc=options.numproc)
+                            numproc=options.numproc,
+                            tol=options.ao_tol,
+                            numthreads=options.numthreads)
   if options.drv is None:
     rho = data
   elif options.laplacian:
@@ -25,11 +25,12 @@ Example for the Execution::
   order_using_analytical_overlap(fid_list,itype='molden')
 '''
 
-from copy import deepcopy
+import hashlib
 import numpy
 from time import time
 
-from orbkit.read import main_read
+from orbkit.read import main_read, get_molden_index
+from orbkit.omp_functions import executor
 from orbkit.display import display,init_display
 from orbkit.analytical_integrals import get_ao_overlap, get_mo_overlap_matrix
 
@@ -48,15 +49,27 @@ mo_coeff_tck  = []
 mo_energy_tck = []
 mo_occ_tck    = []
 
-def read(fid_list,itype='molden',all_mo=True,nosym=False,**kwargs_all):
+def read(fid_list,itype='molden',all_mo=True,nosym=False,numproc=1,
+         **kwargs_all):
   '''Reads a list of input files.
   
+  The input files are parsed in parallel and the molecular orbital data of 
+  each file is stored straight away in the preallocated arrays of all files, 
+  i.e., only a few files are held in memory at a time. The basis set of each 
+  file is compared to the first file by a hash of its shell table 
+  (cf. :func:`get_ao_hash`).
+  
   **Parameters:**
   
-    fid_list : list of str
-      List of input file names.
+    fid_list : list of str or str
+      List of input file names. If `itype` is 'molden', a single file name
+      selects all `[Molden Format]` sections of this file 
+      (cf. :func:`orbkit.read.get_molden_index`).
     itype : str, choices={'molden', 'gamess', 'gaussian.log', 'gaussian.fchk'}
         Specifies the type of the input files.
+    numproc : int, optional
+      Specifies number of subprocesses for reading the input files or the 
+      sections of a single molden file.
   
   **Global Variables:**
   
@@ -64,79 +77,103 @@ def read(fid_list,itype='molden',all_mo=True,nosym=False,**kwargs_all):
   '''
   global geo_spec_all, geo_info, ao_spec, ao_spherical, mo_coeff_all, mo_energy_all, mo_occ_all, sym
   
-  geo_spec_all = []
-  MO_Spec = []
+  if isinstance(fid_list,str) and itype == 'molden':
+    i_md = kwargs_all.pop('i_md',None)
+    if i_md is None:
+      i_md = range(len(get_molden_index(fid_list)['sections']))
+    x = [(fid_list,itype,dict(kwargs_all,all_mo=all_mo,i_md=i)) for i in i_md]
+  else:
+    x = [(filename,itype,dict(kwargs_all['kwargs'][i] if 'kwargs' in kwargs_all 
+                              else kwargs_all,all_mo=all_mo))
+         for i,filename in enumerate(fid_list)]
+  
+  n_r = len(x)
+  if numproc > 1 and n_r > 1:
+    qc_list = executor.iter(_read_i,x,min(numproc,n_r))
+  else:
+    qc_list = ((i,_read_i(args)) for i,args in enumerate(x))
+  
+  sym = {}
   mo_coeff_all = []
   mo_energy_all = []
   mo_occ_all = []
-  # geo_info and ao_info have to stay unchanged
-  geo_old = []
-  ao_old = []
-  
-  sym_list = {}
-  n_ao = {}
-  n_r = len(fid_list)
-  
-  for i,filename in enumerate(fid_list):
-    kwargs = kwargs_all['kwargs'][i] if 'kwargs' in kwargs_all.keys() else kwargs_all
-    qc = main_read(filename, itype=itype, all_mo=all_mo,interactive=False,**kwargs)
+  for i,qc in qc_list:
     # Geo Section
-    if i > 0 and (geo_old != qc.geo_info).sum():
+    if i == 0:
+      geo_info = qc.geo_info
+      geo_spec_all = numpy.zeros((n_r,) + numpy.shape(qc.geo_spec))
+    elif (geo_info != qc.geo_info).sum():
       raise IOError('qc.geo_info has changed!')
-    else:
-      geo_old = deepcopy(qc.geo_info)
-    geo_spec_all.append(qc.geo_spec)
+    geo_spec_all[i] = qc.geo_spec
     # AO Section
-    if (i > 0 and not
-        numpy.alltrue([numpy.allclose(ao_old[j]['coeffs'],qc.ao_spec[j]['coeffs'])
-                      for j in range(len(ao_old))]
-                      )):
+    ao_hash = get_ao_hash(qc.ao_spec)
+    if i == 0:
+      ao_ref = (ao_hash,qc.ao_spec)
+    elif ao_hash != ao_ref[0] and not all(
+            [numpy.allclose(ao_ref[1][j]['coeffs'],qc.ao_spec[j]['coeffs'])
+             for j in range(len(ao_ref[1]))]):
       raise IOError('qc.ao_spec has changed!')
-    else:
-      ao_old = deepcopy(qc.ao_spec)
     # MO Section
-    sym = {}    
-    MO_Spec.append(qc.mo_spec)
-    
-    for i,mo in enumerate(qc.mo_spec):
-      if nosym:
-        qc.mo_spec[i]['sym'] = '%d.1' % (i+1)
-      key = mo['sym'].split('.')
-      if key[1] not in sym.keys():
-        sym[key[1]] = 0
-        n_ao[key[1]] = len(qc.mo_spec[0]['coeffs'])
-      sym[key[1]] += 1
+    qc.format_mo()
+    if nosym:
+      qc.mo_spec.sym = ['%d.1' % (j+1) for j in range(len(qc.mo_spec))]
+    mo_coeffs = qc.mo_spec.coeffs
+    mo_index = {}
+    for j,label in enumerate(qc.mo_spec.sym):
+      index,k = label.split('.')
+      if k not in mo_index:
+        mo_index[k] = ([],[])
+      mo_index[k][0].append(j)
+      mo_index[k][1].append(int(index)-1)
     
-    for k,it in sym.items():
-      if k in sym_list:
-        sym_list[k] = max(sym_list[k],it)
-      else:
-        sym_list[k] = it
+    for k,(j,index) in mo_index.items():
+      if k not in sym:
+        # A new symmetry: Allocate the arrays for all files
+        sym[k] = len(sym)
+        n_ao = mo_coeffs.shape[1]
+        mo_coeff_all.append(numpy.zeros((n_r,len(j),n_ao)))
+        mo_energy_all.append(numpy.zeros((n_r,len(j))))
+        mo_occ_all.append(numpy.zeros((n_r,len(j))))
+      s = sym[k]
+      n_mo = mo_coeff_all[s].shape[1]
+      if len(j) > n_mo:
+        # More molecular orbitals of this symmetry than in the previous files
+        pad = [(0,0),(0,len(j)-n_mo)]
+        mo_coeff_all[s] = numpy.pad(mo_coeff_all[s],pad + [(0,0)],'constant')
+        mo_energy_all[s] = numpy.pad(mo_energy_all[s],pad,'constant')
+        mo_occ_all[s] = numpy.pad(mo_occ_all[s],pad,'constant')
+      mo_coeff_all[s][i,index,:] = mo_coeffs[j]
+      mo_energy_all[s][i,index] = qc.mo_spec.energy[j]
+      mo_occ_all[s][i,index] = qc.mo_spec.occ_num[j]
   
-  geo_spec_all = numpy.array(geo_spec_all)
   geo_info = qc.geo_info
   ao_spec = qc.ao_spec
   ao_spherical = qc.ao_spherical
-  # Presorting of the MOs according to their symmetry
+
+def _read_i(args):
+  '''Reads a single input file or a single section of a molden file 
+  (cf. :func:`read`).'''
+  filename,itype,kwargs = args
+  return main_read(filename,itype=itype,interactive=False,**kwargs)
+
+def get_ao_hash(ao_spec):
+  '''Returns a hash of the shell table, i.e., of the atoms, the types, and 
+  the contraction coefficients of all atomic orbitals.
   
-  sym = []
-  for k,it in sym_list.items():
-    sym.append((k,len(sym)))
-    mo_coeff_all.append(numpy.zeros((n_r,it,n_ao[k])))
-    mo_energy_all.append(numpy.zeros((n_r,it)))
-    mo_occ_all.append(numpy.zeros((n_r,it)))
+  **Parameters:**
   
-  sym = dict(sym)
+    ao_spec : 
+      See :ref:`Central Variables` for details.
   
-  for i,spec in enumerate(MO_Spec):
-    for j,mo in enumerate(spec):
-      index,k = mo['sym'].split('.')
-      
-      index = int(index)-1
-      
-      mo_coeff_all[sym[k]][i,index,:] = mo['coeffs']
-      mo_energy_all[sym[k]][i,index] = mo['energy']
-      mo_occ_all[sym[k]][i,index] = mo['occ_num']
+  **Returns:**
+  
+    ao_hash : str
+  '''
+  sha = hashlib.sha1()
+  for ao in ao_spec:
+    sha.update(('%d,%s,%d;' % (ao['atom'],ao['type'],ao['pnum'])).encode())
+    sha.update(numpy.ascontiguousarray(ao['coeffs'],dtype=float).tobytes())
+  return sha.hexdigest()
 
 def get_extrapolation(r1,r2,mo_coeff,deg=1,grid1d=None):
   '''Extrapolates the molecular orbital coefficients :literal:`mo_coeff` 
@@ -611,7 +648,7 @@ def save_hdf5(fid,variables=['geo_info',
   additional :literal:`kwargs` to an HDF5 file. 
   '''
   
-  from orbkit.output import hdf5_open,hdf5_append
+  from orbkit.output import hdf5_open,hdf5_append,hdf5_write_qc,qc_variables
   
   # Save HDF5 File
   display('Saving Hierarchical Data Format file (HDF5) to %s...' % fid)
@@ -620,10 +657,13 @@ def save_hdf5(fid,variables=['geo_info',
     for i in variables:
       if i in globals():
         data = globals()[i]
-        if not (data == [] or data is None):          
+        if not (data is None or len(data) == 0):
           if i == 'sym':
             data = numpy.array([[k,l] for k,l in data.items()])
-          hdf5_append(data,HDF5_file,name=i)
+          if i in qc_variables:
+            hdf5_write_qc(HDF5_file,**{i: data})
+          else:
+            hdf5_append(data,HDF5_file,name=i)
           data_stored.append(i)
       elif i not in kwargs:
         raise ValueError('Variable `%s` is not in globals() or in **kwargs' % i)
@@ -648,7 +688,7 @@ def read_hdf5(fid,variables=['geo_info',
   this module. 
   '''
   
-  from orbkit.output import hdf5_open,hdf52dict
+  from orbkit.output import hdf5_open,hdf52dict,hdf5_read_qc,qc_variables
   
   # Read HDF5 File
   display('Reading Hierarchical Data Format file (HDF5) File from %s' % fid)
@@ -656,13 +696,16 @@ def read_hdf5(fid,variables=['geo_info',
   for HDF5_file in hdf5_open(fid,mode='r'):
     for i in variables:
       try:
-        globals()[i] = hdf52dict(i,HDF5_file)
+        if i in qc_variables:
+          globals()[i] = hdf5_read_qc(HDF5_file,variables=[i])[i]
+        else:
+          globals()[i] = hdf52dict(i,HDF5_file)
         data_stored.append(i)
         if i == 'sym':
           s = dict(globals()[i])
           globals()[i] = {}
           for k,l in s.items():
-            globals()[i][k] = int(l)
+            globals()[i][k.decode() if isinstance(k,bytes) else k] = int(l)
       except KeyError:
         pass
   
@@ -690,6 +733,7 @@ def construct_qc():
                                'energy' : mo_energy_all[ii_s][rr,i],
                                'occ_num' : mo_occ_all[ii_s][rr,i],
                                'sym': '%d.%s' % (i+1,s)})
+    QC[rr].format_mo()
   
   return QC
 
@@ -22,7 +22,13 @@ GNU Lesser General Public License for more details.
 You should have received a copy of the GNU Lesser General Public 
 License along with orbkit.  If not, see <http://www.gnu.org/licenses/>.
 '''
+import os
 import sys
+import atexit
+import shutil
+import hashlib
+import pickle
+import tempfile
 import numpy
 from time import time
 from multiprocessing import Pool
@@ -55,12 +61,38 @@ def display(string):
   print(string)
 
 def run(f,x=numpy.arange(10).reshape((-1,1)),numproc=1,display=display,
-        initializer=lambda x: x, global_args=None):
+        initializer=None, global_args=None):
+  '''Applies the function `f` to all elements of `x` using the persistent 
+  worker processes of :data:`executor`.
+  
+  **Parameters:**
+  
+    f : function
+      Function (defined at module level) which is applied to each element of x.
+    x : list
+      Contains the tasks.
+    numproc : int
+      Specifies number of subprocesses for multiprocessing.
+    display : function or None
+      Function used to print out the progress of the computation.
+    initializer : function or None
+      Function (defined at module level) which is called with `global_args` 
+      before the tasks are processed, i.e., it sets the global variables 
+      required by `f`. In the worker processes, it is only called if 
+      `global_args` have changed since the last call.
+    global_args : any
+      Static data passed to `initializer`.
+  
+  **Returns:**
+  
+    return_val : list
+      Contains the results of f for each element of x.
+  '''
   #--- Start the worker processes --
   if numproc > 1:
-    pool = Pool(processes=numproc, initializer=initializer, initargs=(global_args,))
-    it = pool.imap(f, x)
-  else:
+    it = executor.imap(f, x, numproc, initializer=initializer, 
+                       global_args=global_args)
+  elif initializer is not None:
     initializer(global_args)
   
   #--- Initialize some additional user information ---
@@ -70,7 +102,7 @@ def run(f,x=numpy.arange(10).reshape((-1,1)),numproc=1,display=display,
   return_val = [None for i in x]
   try:
     for l,ifid in enumerate(x):
-      return_val[l] = it.next() if numproc > 1 else f(ifid)  
+      return_val[l] = next(it) if numproc > 1 else f(ifid)  
       #--- Print out the progress of the computation ---
       status = numpy.floor(l*10/float(len(x)))*10
       if not quiet and display is not None and not status % 10 and status != status_old:
@@ -82,14 +114,393 @@ def run(f,x=numpy.arange(10).reshape((-1,1)),numproc=1,display=display,
         status_old = status
         s_old = l + 1
   
-  finally:
-    if numproc > 1:
-      pool.close()
-      pool.join()
-      pool.terminate()
+  except KeyboardInterrupt:
+    # Do not leave the worker processes with pending tasks behind
+    executor.shutdown()
+    raise
   
   if not quiet and display is not None:
     display("\t" + 40*"-")
     display("\tComputation required %(t).3fs" % {'t': t[-1]-t[0]})
   
-  return return_val
\ No newline at end of file
+  return return_val
+
+#: Minimum size (in bytes) of arrays in `global_args`, which are stored in 
+#: separate files and memory-mapped by the worker processes.
+array_threshold = 2**20
+
+class _Pickler(pickle.Pickler):
+  '''Pickler storing large numpy arrays in separate .npy files.'''
+  def __init__(self,fid,tmpdir,files):
+    pickle.Pickler.__init__(self,fid,pickle.HIGHEST_PROTOCOL)
+    self.tmpdir = tmpdir
+    self.files = files
+  def persistent_id(self,obj):
+    if (type(obj) is not numpy.ndarray or obj.dtype.hasobject or 
+        obj.nbytes < array_threshold):
+      return None
+    obj = numpy.ascontiguousarray(obj)
+    sha = hashlib.sha1(str((obj.dtype.str,obj.shape)).encode())
+    sha.update(obj.data)
+    filename = os.path.join(self.tmpdir,'array_%s.npy' % sha.hexdigest())
+    if not os.path.exists(filename):
+      # Unchanged arrays are written only once
+      numpy.save(filename,obj)
+    self.files.add(filename)
+    return filename
+
+class _Unpickler(pickle.Unpickler):
+  '''Unpickler memory-mapping the arrays stored by :class:`_Pickler`.'''
+  def persistent_load(self,pid):
+    # Copy-on-write: the data is shared between all worker processes
+    return numpy.load(pid,mmap_mode='c')
+
+_static = {}
+def _call(args):
+  '''Calls a task in a worker process and updates the static data of the 
+  corresponding initializer first, if it has changed.'''
+  static,f,x = args
+  if static is not None:
+    key,token,filename = static
+    if _static.get(key) != token:
+      _static.pop(key,None)
+      with open(filename,'rb') as fid:
+        initializer,global_args = _Unpickler(fid).load()
+      initializer(global_args)
+      _static[key] = token
+  return f(x)
+
+class Executor(object):
+  '''Persistent pool of worker processes, which is reused by all parallel 
+  functions of orbkit, e.g., :func:`orbkit.core.rho_compute`, 
+  :func:`orbkit.analytical_integrals.get_mo_overlap_matrix`, and 
+  :mod:`orbkit.detci`.
+  
+  The worker processes are started on first use and kept alive until 
+  :meth:`shutdown` is called or the interpreter exits. The static data of a 
+  computation (the `global_args` of its `initializer`) is broadcast via a 
+  temporary file, which is only rewritten if the data has changed. Large 
+  arrays are stored separately and memory-mapped by the worker processes.
+  Files of a previous broadcast are kept, until all iterators using them 
+  (cf. :meth:`iter`) are exhausted or closed.
+  
+  The executor can be used as a context manager, e.g.::
+  
+    with omp_functions.executor:
+      rho = core.rho_compute(qc,numproc=4)
+      mo_list = core.rho_compute(qc,calc_mo=True,numproc=4)
+  '''
+  def __init__(self):
+    self.pool = None
+    self.numproc = 0
+    self.tmpdir = None
+    self.disk_tmpdir = None
+    self.broadcasts = {}
+    # Broadcast files in use by active iterators (cf. :meth:`iter`)
+    self.users = {}
+    self.stale = {}
+    # Number of iterators with pending tasks
+    self.active = 0
+  
+  def get_tmpdir(self):
+    '''Returns the temporary directory of the executor (in memory, if possible).'''
+    if self.tmpdir is None:
+      shm = '/dev/shm'
+      self.tmpdir = tempfile.mkdtemp(prefix='orbkit_',
+                      dir=shm if os.access(shm,os.W_OK) else None)
+    return self.tmpdir
+  
+  def get_shared_dirs(self,nbytes):
+    '''Returns the candidate directories for a shared array of `nbytes` bytes.
+    
+    As in :class:`multiprocessing.heap.Arena`, the in-memory directory is only
+    used if its file system has enough free space, since writing beyond the 
+    capacity of a tmpfs (e.g. the 64 MB /dev/shm of Docker) kills the 
+    processes with SIGBUS. Otherwise, a directory in 
+    :func:`tempfile.gettempdir` is used.
+    '''
+    tmpdir = self.get_tmpdir()
+    if os.path.dirname(tmpdir) == tempfile.gettempdir():
+      return [tmpdir]
+    dirs = []
+    st = os.statvfs(tmpdir) if hasattr(os,'statvfs') else None
+    if st is None or st.f_bavail*st.f_frsize > nbytes:
+      dirs.append(tmpdir)
+    if self.disk_tmpdir is None:
+      self.disk_tmpdir = tempfile.mkdtemp(prefix='orbkit_')
+    dirs.append(self.disk_tmpdir)
+    return dirs
+  
+  def get_pool(self,numproc):
+    '''Returns the pool of worker processes. A new pool is only started if 
+    more processes are requested and no iterator (cf. :meth:`iter`) has 
+    pending tasks, i.e., an existing pool is never terminated underneath 
+    them. Otherwise, the existing pool is reused.'''
+    if (self.pool is not None and numproc > self.numproc and 
+        not self.active):
+      self.close_pool()
+    if self.pool is None:
+      self.pool = Pool(processes=numproc)
+      self.numproc = numproc
+    return self.pool
+  
+  def close_pool(self):
+    if self.pool is not None:
+      self.pool.terminate()
+      self.pool.join()
+    self.pool = None
+    self.numproc = 0
+  
+  def broadcast(self,initializer,global_args):
+    '''Stores the static data for the worker processes, if it has changed.
+    
+    **Returns:**
+    
+      static : tuple
+        Contains the key of the initializer, the token of its data, and the 
+        file name.
+    '''
+    key = '%s.%s' % (initializer.__module__,initializer.__name__)
+    tmpdir = self.get_tmpdir()
+    files = set()
+    filename = os.path.join(tmpdir,'tmp_%s.pkl' % key)
+    with open(filename,'wb') as fid:
+      _Pickler(fid,tmpdir,files).dump((initializer,global_args))
+    sha = hashlib.sha1()
+    with open(filename,'rb') as fid:
+      sha.update(fid.read())
+    token = sha.hexdigest()
+    if key in self.broadcasts and self.broadcasts[key][0] == token:
+      os.remove(filename)
+    else:
+      static = os.path.join(tmpdir,'static_%s_%s.pkl' % (key,token))
+      os.rename(filename,static)
+      self.stale.pop(static,None)
+      if key in self.broadcasts:
+        old = self.broadcasts[key]
+        if self.users.get(old[1]):
+          # Still required by the pending tasks of an iterator
+          self.stale[old[1]] = old[2]
+        else:
+          os.remove(old[1])
+      self.broadcasts[key] = (token,static,files)
+      self.remove_unused_arrays()
+    return (key,) + self.broadcasts[key][:2]
+  
+  def remove_unused_arrays(self):
+    '''Removes the arrays, which are not required by any broadcast anymore.'''
+    used = set()
+    for i in list(self.broadcasts.values()) + [(None,None,i) for i in 
+                                               self.stale.values()]:
+      used.update(i[2])
+    for i in os.listdir(self.tmpdir):
+      i = os.path.join(self.tmpdir,i)
+      if i.endswith('.npy') and i not in used:
+        os.remove(i)
+  
+  def acquire(self,static):
+    '''Marks the broadcast file `static` as in use by an iterator.'''
+    if static is not None:
+      self.users[static[2]] = self.users.get(static[2],0) + 1
+  
+  def release(self,static):
+    '''Releases the broadcast file `static` and removes it, if it has been 
+    replaced in the meantime and is not used by any other iterator.'''
+    if static is None or static[2] not in self.users:
+      return
+    self.users[static[2]] -= 1
+    if self.users[static[2]] > 0:
+      return
+    del self.users[static[2]]
+    if static[2] in self.stale:
+      del self.stale[static[2]]
+      try:
+        os.remove(static[2])
+      except OSError:
+        # Removed by shutdown
+        pass
+      if self.tmpdir is not None:
+        self.remove_unused_arrays()
+  
+  def imap(self,f,x,numproc,initializer=None,global_args=None):
+    '''Applies `f` to all elements of `x` in the worker processes.
+    
+    **Parameters:**
+    
+      f : function
+        Function (defined at module level) which is applied to each element of x.
+      x : list
+        Contains the tasks.
+      numproc : int
+        Specifies number of subprocesses for multiprocessing.
+      initializer : function or None
+        Function (defined at module level) which is called with `global_args` 
+        in each worker process, if the data has changed.
+      global_args : any
+        Static data passed to `initializer`.
+    
+    **Returns:**
+    
+      it : iterator
+        Yields the results in the order of `x`.
+    '''
+    static = None
+    if initializer is not None:
+      static = self.broadcast(initializer,global_args)
+    pool = self.get_pool(numproc)
+    return pool.imap(_call,[(static,f,i) for i in x])
+  
+  def iter(self,f,x,numproc,initializer=None,global_args=None,ordered=True,
+           max_pending=None):
+    '''Applies `f` to all elements of `x` in the worker processes, where at 
+    most `max_pending` tasks are submitted in advance, i.e., the memory 
+    required for the results is bounded, even if they are consumed slowly.
+    
+    **Parameters:**
+    
+      f,x,numproc,initializer,global_args :
+        See :meth:`imap` for details.
+      ordered : bool
+        If True, the results are yielded in the order of `x`, else in the 
+        order of completion.
+      max_pending : None or int
+        Specifies the maximum number of pending tasks. If None, 2*numproc 
+        tasks are used.
+    
+    **Yields:**
+    
+      index : int
+        Contains the index of the task in `x`.
+      result : any
+        Contains the result of `f`.
+    '''
+    static = None
+    if initializer is not None:
+      static = self.broadcast(initializer,global_args)
+    pool = self.get_pool(numproc)
+    if max_pending is None or max_pending < 1:
+      max_pending = 2*numproc
+    tasks = iter(enumerate(x))
+    pending = []
+    # The broadcast file and the pool are kept until this iterator is 
+    # exhausted or closed
+    self.acquire(static)
+    self.active += 1
+    try:
+      while True:
+        for index,i in tasks:
+          pending.append((index,pool.apply_async(_call,((static,f,i),))))
+          if len(pending) >= max_pending:
+            break
+        if not pending:
+          return
+        k = 0
+        if not ordered:
+          # Wait for any of the pending tasks
+          while not any(r.ready() for index,r in pending):
+            pending[0][1].wait(0.01)
+          k = [r.ready() for index,r in pending].index(True)
+        index,r = pending.pop(k)
+        yield index, r.get()
+    finally:
+      self.active -= 1
+      self.release(static)
+  
+  def shared_zeros(self,shape):
+    '''Returns a zero-initialized array of doubles, which is memory-mapped
+    from a temporary file, i.e., the worker processes can write their results 
+    directly to it (cf. :func:`open_shared`).
+    
+    **Returns:**
+    
+      filename : str or None
+        Contains the name of the file.
+      data : numpy.ndarray, shape=SHAPE
+        Contains the memory-mapped array.
+    '''
+    nbytes = int(numpy.prod(shape))*numpy.dtype(numpy.float64).itemsize
+    if nbytes == 0:
+      return None, numpy.zeros(shape)
+    error = None
+    for tmpdir in self.get_shared_dirs(nbytes):
+      fid,filename = tempfile.mkstemp(suffix='.dat',dir=tmpdir)
+      try:
+        # Reserve the space, i.e., a full file system raises an error here 
+        # instead of a SIGBUS, when the array is written
+        if hasattr(os,'posix_fallocate'):
+          os.posix_fallocate(fid,0,nbytes)
+        else:
+          os.ftruncate(fid,nbytes)
+      except OSError as e:
+        error = e
+        os.close(fid)
+        os.remove(filename)
+        continue
+      os.close(fid)
+      return filename, numpy.memmap(filename,dtype=numpy.float64,mode='r+',
+                                    shape=shape)
+    raise IOError('Not enough space for a shared array of %d bytes (%s).' 
+                  % (nbytes,error))
+  
+  def release_shared(self,filename,data):
+    '''Removes the file of an array created by :meth:`shared_zeros`, i.e., 
+    the result does not occupy the temporary file system beyond its lifetime.
+    
+    On POSIX systems, the mapping stays valid after the file has been 
+    unlinked, i.e., the memory-mapped data is returned without copying (as 
+    numpy.ndarray view, which keeps the mapping alive). The
+    data is only copied to the memory of the process, if the file of a 
+    mapped array cannot be removed (e.g. on Windows).
+    
+    **Returns:**
+    
+      data : numpy.ndarray
+        Contains the data of the array.
+    '''
+    if filename is None:
+      return data
+    try:
+      os.remove(filename)
+    except OSError:
+      if not os.path.exists(filename):
+        # Removed by shutdown
+        return data.view(numpy.ndarray)
+      result = numpy.array(data)
+      del data
+      try:
+        os.remove(filename)
+      except OSError:
+        pass
+      return result
+    return data.view(numpy.ndarray)
+  
+  def shutdown(self):
+    '''Terminates the worker processes and removes all temporary files.'''
+    self.close_pool()
+    for tmpdir in [self.tmpdir,self.disk_tmpdir]:
+      if tmpdir is not None:
+        shutil.rmtree(tmpdir,ignore_errors=True)
+    self.tmpdir = None
+    self.disk_tmpdir = None
+    self.broadcasts = {}
+    self.users = {}
+    self.stale = {}
+  
+  def __enter__(self):
+    return self
+  
+  def __exit__(self,*args):
+    self.shutdown()
+
+def open_shared(filename,shape):
+  '''Opens an array created by :meth:`Executor.shared_zeros` in a worker 
+  process.'''
+  return numpy.memmap(filename,dtype=numpy.float64,mode='r+',shape=shape)
+
+#: The persistent pool of worker processes used by orbkit.
+executor = Executor()
+atexit.register(executor.shutdown)
+
+def shutdown():
+  '''Terminates the persistent worker processes (cf. :class:`Executor`).'''
+  executor.shutdown()
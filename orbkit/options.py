@@ -38,7 +38,8 @@ from orbkit import grid
 
 available = [
   'filename','itype','cclib_parser','outputname','otype',
-  'numproc','mo_set','calc_ao','all_mo','calc_mo','spin','drv','laplacian',
+  'numproc','numthreads','mo_set','calc_ao','all_mo','calc_mo','spin','drv','laplacian',
+  'ao_tol',
   'slice_length','is_vector','grid_file','adjust_grid','center_grid','random_grid',
   'z_reduced_density','gross_atomic_density','mo_tefd',
   'quiet','no_log','no_output','no_slice','interactive'
@@ -129,6 +130,10 @@ def init_parser():
                       default=1, type="int",
                       help='''number of subprocesses to be started 
                       during the execution [default: %default]''')
+  group.add_option("--numthreads",dest="numthreads",
+                      default=1, type="int",
+                      help='''number of OpenMP threads used by the compiled 
+                      kernels within each process [default: %default]''')
   group.add_option("--mo_set",dest="mo_set",
                       default=[], type="string",action="append",
                       help='''read the plain text file MO_SET containing row 
@@ -166,6 +171,12 @@ def init_parser():
                       help='''compute the analytical laplacian of the density
                       or the specified mo_set, respectively.
                       ''')
+  group.add_option("--ao_tol",dest="ao_tol",
+                      default=0., type="float",
+                      help=('''skip primitive Gaussians and shells whose 
+                      contribution to the atomic orbitals is smaller than AO_TOL, 
+                      e.g., 1e-10 (0 disables the screening) [default: %default]'''
+                      ).replace('  ','').replace('\n',''))
   parser.add_option_group(group)
   
   group = optparse.OptionGroup(parser, "Grid-Related Options")
@@ -345,6 +356,12 @@ def check_options(error=raise_error,display=print_message,
   if not isinstance(numproc,int):
     error('The number of processes (--numproc) has to be an integer value.\n')
   
+  if not isinstance(numthreads,int) or numthreads < 1:
+    error('The number of threads (--numthreads) has to be a positive integer value.\n')
+  
+  if not isinstance(ao_tol,(int,float)) or ao_tol < 0:
+    error('The screening tolerance (--ao_tol) has to be a non-negative float.\n')
+  
   # Check the files specified by --calc_mo or --mo_set for existance
   def check_mo(attr):
     data = getattr(thismodule,attr)
@@ -484,6 +501,7 @@ outputname      = None          #: Specifies output file (base) name. (str)
 otype           = 'h5'          #: Specifies output file type. See :data:`otypes` for details. (str or list of str or None)
 #--- Computational Options ---
 numproc         = 1             #: Specifies number of subprocesses for multiprocessing. (int)
+numthreads      = 1             #: Specifies number of OpenMP threads for the compiled kernels. (int)
 mo_set          = False         #: Specifies molecular orbitals used for density calculation. (filename or list of indices)
 calc_ao         = False         #: If True, all atomic orbitals will be computed and saved.
 calc_mo         = False         #: Specifies which molecular orbitals will be calculated. (filename or list of indices)
@@ -491,6 +509,7 @@ all_mo          = False         #: If True, all molecular orbitals will be compu
 spin            = None          #: If not None, exclusively 'alpha' or 'beta' molecular orbitals are taken into account. (None,'alpha', or 'beta')
 drv             = None          #: Specifies derivative variables. (list of str)
 laplacian       = False         #: If True, computes the laplacian of the density or of the mo_set. (bool)
+ao_tol          = 0.            #: If larger than zero, primitives and shells with a contribution smaller than AO_TOL are skipped. (float)
 #--- Grid-Related Options ---
 slice_length    = 1e4           #: Specifies the number of points per subprocess. (int)
 vector          = None          #  This option is only present because of backward compatibility
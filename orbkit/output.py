@@ -26,10 +26,12 @@ License along with orbkit.  If not, see <http://www.gnu.org/licenses/>.
 # Import general modules
 import numpy
 import h5py
+from gzip import GzipFile
 
 # Import orbkit modules
-from orbkit import grid, options
+from orbkit import grid, options, omp_functions
 from orbkit.display import display
+from orbkit.qcinfo import MOSpec
 
 def main_output(data,geo_info,geo_spec,outputname='new',otype='h5',
                 drv=None,omit=[],**kwargs):
@@ -52,6 +54,9 @@ def main_output(data,geo_info,geo_spec,outputname='new',otype='h5',
     with NDRV = len(drv).
   omit : list of str, optional
     If not empty, the input file types specified here are omitted.
+  amira_binary : None or bool, optional
+    If True, binary ZIBAmira mesh files are written. If None, binary files 
+    are written if a ZIBAmira network file ('hx') is requested. 
   
   **Note:**
   
@@ -59,6 +64,7 @@ def main_output(data,geo_info,geo_spec,outputname='new',otype='h5',
   '''
   print_waring = False
   output_written = []
+  amira_binary = kwargs.pop('amira_binary',None)
   if isinstance(otype,str):
     otype = [otype]
   
@@ -66,6 +72,9 @@ def main_output(data,geo_info,geo_spec,outputname='new',otype='h5',
     otype.append('cb')
   
   otype = [i for i in otype if i not in omit]
+  if amira_binary is None:
+    # The ZIBAmira network file references the binary mesh file
+    amira_binary = 'hx' in otype
   
   if otype is None or otype == []:
     return output_written 
@@ -104,22 +113,22 @@ def main_output(data,geo_info,geo_spec,outputname='new',otype='h5',
       else: 
         display('\nSaving to ZIBAmiraMesh file...' +
                      '\n\t%(o)s.am' % {'o': fid % f})
-        amira_creator(d,(fid % f))
-        output_written.append('%s.am' % (fid % f))
+        output_written.append(amira_creator(d,(fid % f),binary=amira_binary,
+                                            **kwargs))
     if 'hx' in otype and not print_waring:
       if output_not_possible: print_waring = True
       else: 
         # Create Amira network incl. Alphamap
         display('\nCreating ZIBAmira network file...')
-        hx_network_creator(data,(fid % f))
+        hx_network_creator(d,(fid % f))
         output_written.append('%s.hx' % (fid % f))
     if 'cb' in otype or 'vmd' in otype and not print_waring:
       if output_not_possible: print_waring = True
       else: 
         display('\nSaving to .cb file...' +
                       '\n\t%(o)s.cb' % {'o': fid % f})
-        cube_creator(d,(fid % f),geo_info,geo_spec,**kwargs)
-        output_written.append('%s.cb' % (fid % f))
+        output_written.append(cube_creator(d,(fid % f),geo_info,geo_spec,
+                                           **kwargs))
        #else: output_creator(d,(fid % f),geo_info,geo_spec)  # Axel's cube files
     if 'vmd' in otype and not print_waring:
       if output_not_possible: print_waring = True
@@ -141,23 +150,41 @@ def main_output(data,geo_info,geo_spec,outputname='new',otype='h5',
   
   return output_written
 
-def cube_creator(rho,filename,geo_info,geo_spec,comments='',**kwargs):
+def cube_creator(rho,filename,geo_info,geo_spec,comments='',gzip=False,
+                 numproc=1,block_size=2**16,**kwargs):
   '''Creates a plain text Gaussian cube file. 
   
+  The data is formatted in blocks of complete z-rows (six values per line) 
+  and written block by block, i.e., the data may also be provided slice by 
+  slice, e.g., by :func:`orbkit.core.rho_iter`.
+  
   **Parameters:**
   
-  rho : numpy.ndarray, shape=N
-    Contains the output data.
+  rho : numpy.ndarray, shape=N, or iterable
+    Contains the output data. Alternatively, an iterable yielding 
+    consecutive parts of the flattened data (z runs fastest), or the 
+    tuples ``(index_range, rho_slice, delta_slice)`` of :func:`orbkit.core.rho_iter`.
   filename : str
     Contains the base name of the output file.
   geo_info, geo_spec : 
     See :ref:`Central Variables` for details.
   comments : str, optional
     Specifies the second (comment) line of the cube file.  
+  gzip : bool, optional
+    If True, a gzip-compressed cube file (.cb.gz) is written.
+  numproc : int, optional
+    Specifies number of subprocesses for formatting the data.
+  block_size : int, optional
+    Specifies the approximate number of values formatted and written at once.
+  
+  **Returns:**
+  
+  filename : str
+    Contains the name of the file written.
   '''
-  AssertionError (rho.shape != tuple(grid.N_)), 'The grid does not fit the data.'
-  # Open an empty file 
-  fid = open('%(f)s.cb' % {'f': filename}, 'w')
+  N = tuple(len(i) for i in (grid.x,grid.y,grid.z))
+  if isinstance(rho,numpy.ndarray) and rho.size != numpy.prod(N):
+    raise ValueError('The grid does not fit the data.')
   
   # Write the type and the position of the atoms in the header 
   string = 'orbkit calculation\n'
@@ -184,19 +211,65 @@ def cube_creator(rho,filename,geo_info,geo_spec,comments='',**kwargs):
     for jj in range(3):
       string += ('%(r)0.6f' % {'r': geo_spec[ii][jj]}).rjust(12)
   string += '\n'
-  for rr in range(len(grid.x)):
-    for ss in range(len(grid.y)):
-      for tt in range(len(grid.z)):
-        string += ('%(rho).5E' % {'rho': rho[rr,ss,tt]}).rjust(13)
-        if (tt % 6 == 5): 
-          string += '\n'
-      string += '\n'
   
+  # Format the data in blocks of complete z-rows
+  blocks = cube_blocks(rho,N[2],max(1,int(block_size)//max(1,N[2])))
+  if numproc > 1:
+    it = (s for i,s in omp_functions.executor.iter(cube_format,blocks,numproc))
+  else:
+    it = (cube_format(i) for i in blocks)
   
-  fid.write(string)
+  filename = '%(f)s.cb%(gz)s' % {'f': filename, 'gz': '.gz' if gzip else ''}
+  with (GzipFile(filename,'wb') if gzip else open(filename,'wb')) as fid:
+    fid.write(string.encode('ascii'))
+    for s in it:
+      fid.write(s.encode('ascii'))
   
-  # Close the file 
-  fid.close()
+  return filename
+
+def cube_blocks(rho,nz,nrows):
+  '''Splits the data of a cube file into blocks of NROWS complete z-rows.
+  
+  **Parameters:**
+  
+  rho : numpy.ndarray or iterable
+    See :func:`cube_creator` for details.
+  nz : int
+    Contains the number of grid points in z-direction.
+  nrows : int
+    Specifies the number of z-rows per block.
+  
+  **Yields:**
+  
+  data : numpy.ndarray, shape=(NROWS,nz)
+  '''
+  if isinstance(rho,numpy.ndarray):
+    rho = [rho]
+  rest = numpy.zeros(0)
+  for data in rho:
+    if isinstance(data,tuple):
+      # Output of orbkit.core.rho_iter
+      data = data[1]
+    data = numpy.ravel(data)
+    if len(rest):
+      data = numpy.concatenate((rest,data))
+    n = (len(data) // (nrows*nz)) * nrows*nz
+    for i in range(0,n,nrows*nz):
+      yield data[i:i+nrows*nz].reshape((-1,nz))
+    rest = data[n:]
+  n = (len(rest) // nz) * nz
+  if n:
+    yield rest[:n].reshape((-1,nz))
+  if n != len(rest):
+    raise ValueError('The grid does not fit the data.')
+
+def cube_format(data):
+  '''Formats a block of complete z-rows, shape=(NROWS,Nz), of a cube file, 
+  i.e., six values per line and a line break after each z-row.
+  '''
+  nrows,nz = data.shape
+  row = ('%13.5E'*6 + '\n')*(nz // 6) + '%13.5E'*(nz % 6) + '\n'
+  return (row*nrows) % tuple(data.ravel().tolist())
 
 def vmd_network_creator(filename,cube_files=None,render=False,iso=(-0.01,0.01),
                         abspath=False,**kwargs):
@@ -296,6 +369,9 @@ def hdf5_append(x,group,name='data'):
     if x.dtype.type is numpy.unicode_:
       x = numpy.asarray(x,dtype=numpy.string_)
     h5_dset = group.create_dataset(name,numpy.shape(x),data=x)
+  elif (isinstance(x,list) and x != [] and all(isinstance(i,dict) for i in x)
+        ) or isinstance(x,MOSpec):
+    hdf5_append_table(x,group,name=name)
   elif isinstance(x,list):
     if name != '':
       subgroup = group.create_group(name)
@@ -318,6 +394,185 @@ def hdf5_append(x,group,name='data'):
     group.attrs[name] = x
   
 
+hdf5_schema_version = 1 #: Version of the columnar HDF5 layout written by orbkit.
+qc_variables = ['geo_info','geo_spec','ao_spec','ao_spherical','mo_spec']
+
+def hdf5_check_schema(group):
+  '''Returns the name of the orbkit schema of an HDF5 group ('table', 'qcinfo', 
+  'ciinfo'), or None for groups written without schema.
+  '''
+  schema = group.attrs.get('orbkit:schema')
+  if schema is None:
+    return None
+  if group.attrs['orbkit:schema_version'] > hdf5_schema_version:
+    raise IOError('The HDF5 group `%s` has been written with a newer version ' 
+                  % group.name + '(%d) of the orbkit schema.' 
+                  % group.attrs['orbkit:schema_version'])
+  return schema.decode() if isinstance(schema,bytes) else str(schema)
+
+def hdf5_set_schema(group,schema):
+  group.attrs['orbkit:schema'] = schema
+  group.attrs['orbkit:schema_version'] = hdf5_schema_version
+
+def hdf5_append_table(x,group,name='data'):
+  '''Appends a list of dictionaries, e.g., ao_spec or mo_spec, column by 
+  column to an open HDF5 file/group.
+  
+  Each key is stored as a single dataset. Arrays of the same shape are stacked, 
+  e.g., the MO coefficients are stored as matrix, shape=(NMO,NAO). Arrays of 
+  different length are concatenated along the first axis, and their offsets 
+  are stored in '<key>:offset'. If a key is missing (or None) for some 
+  entries, the indices of the entries containing it are stored in '<key>:index'.
+  
+  **Parameters:**
+  
+  x : list of dict or :class:`orbkit.qcinfo.MOSpec`
+    Input data.
+  group : h5py.File or h5py.Group
+    The HDF5 file/group where the data will be appended.
+  name : string, optional
+    Specifies the group name in the HDF5 file/group. If empty,
+    root directory of HDF5 file/group is chosen.  
+  '''
+  subgroup = group.create_group(name) if name != '' else group
+  hdf5_set_schema(subgroup,'table')
+  subgroup.attrs['num'] = len(x)
+  # The numeric columns of a MOSpec are written directly
+  columns = x.todict() if isinstance(x,MOSpec) else {}
+  keys = list(columns.keys())
+  for i in ([] if columns else x):
+    keys.extend(k for k in i.keys() if k not in keys)
+  for key in keys:
+    if key in columns and columns[key].dtype != object:
+      subgroup.create_dataset(key,data=columns[key])
+      continue
+    index = [k for k,i in enumerate(x) if i.get(key) is not None]
+    values = [numpy.asarray(x[k][key]) for k in index]
+    if len(index) != len(x):
+      subgroup.create_dataset('%s:index' % key,
+                              data=numpy.array(index,dtype=numpy.int64))
+    if len(set(i.shape for i in values)) > 1:
+      subgroup.create_dataset('%s:offset' % key,
+                              data=numpy.cumsum([0] + [len(i) for i in values]))
+      data = numpy.concatenate(values)
+    else:
+      data = numpy.array(values)
+    if data.dtype.type is numpy.unicode_:
+      data = numpy.asarray(data,dtype=numpy.string_)
+    subgroup.create_dataset(key,data=data)
+
+def hdf52table(group,HDF5_file,index=None,keys=None):
+  '''Reads a list of dictionaries stored with :func:`hdf5_append_table`.
+  
+  Only the requested entries and keys are read from the file.
+  
+  **Parameters:**
+  
+  group : str
+    Specifies the group name in the HDF5 file/group.
+  HDF5_file : h5py.File or h5py.Group
+    The source HDF5 file/group.
+  index : None, slice, or list of int, optional
+    If not None, only these entries are read, e.g., selected MOs.
+  keys : None or list of str, optional
+    If not None, only these keys are read.
+  
+  **Returns:**
+  
+  x : list of dict
+  '''
+  g = HDF5_file[group]
+  hdf5_check_schema(g)
+  num = int(g.attrs['num'])
+  rows = numpy.arange(num)
+  if index is not None:
+    rows = rows[index]
+  x = [{} for i in rows]
+  for key in g.keys():
+    if ':' in key or (keys is not None and key not in keys):
+      continue
+    # Positions of the requested entries in this column
+    kindex = (g['%s:index' % key][()] if '%s:index' % key in g 
+              else numpy.arange(num))
+    pos = numpy.minimum(numpy.searchsorted(kindex,rows),max(len(kindex)-1,0))
+    valid = numpy.nonzero(kindex[pos] == rows)[0] if len(kindex) else []
+    pos = pos[valid]
+    if len(pos) == 0:
+      continue
+    dset = g[key]
+    if '%s:offset' % key in g:
+      offset = g['%s:offset' % key][()]
+      if len(pos) == len(kindex):
+        data = dset[()]
+        values = [data[offset[i]:offset[i+1]] for i in pos]
+      else:
+        values = [dset[offset[i]:offset[i+1]] for i in pos]
+    else:
+      unique,inverse = numpy.unique(pos,return_inverse=True)
+      if len(unique) == dset.shape[0]:
+        values = dset[()][inverse]
+      else:
+        values = dset[unique.tolist()][inverse]
+    for i,v in zip(valid,values):
+      if numpy.ndim(v) == 0:
+        v = v.decode() if isinstance(v,bytes) else v.item()
+      x[i][key] = v
+  return x
+
+def hdf5_write_qc(group,geo_info=None,geo_spec=None,ao_spec=None,
+                  ao_spherical=None,mo_spec=None):
+  '''Writes the central variables of a :class:`orbkit.qcinfo.QCinfo` instance 
+  to an open HDF5 file/group using a columnar layout (cf. :func:`hdf5_append_table`).
+  Variables, which are None, are omitted.
+  '''
+  hdf5_set_schema(group,'qcinfo')
+  if geo_info is not None:
+    group.create_dataset('geo_info',data=numpy.array(geo_info,dtype='S'))
+  if geo_spec is not None:
+    group.create_dataset('geo_spec',data=numpy.array(geo_spec,dtype=float))
+  if ao_spherical is not None:
+    data = numpy.array([[i,l,m] for i,(l,m) in ao_spherical],dtype=numpy.int64)
+    group.create_dataset('ao_spherical',data=data.reshape((-1,3)))
+  for key,x in [('ao_spec',ao_spec),('mo_spec',mo_spec)]:
+    if x is not None:
+      hdf5_append_table(x,group,name=key)
+
+def hdf5_read_qc(group,variables=qc_variables,mo_index=None):
+  '''Reads the central variables written by :func:`hdf5_write_qc`. 
+  Groups written by :func:`hdf5_append` (previous versions) are supported.
+  
+  **Parameters:**
+  
+  group : h5py.File or h5py.Group
+    The source HDF5 file/group.
+  variables : list of str, optional
+    Specifies the variables to be read.
+  mo_index : None, slice, or list of int, optional
+    If not None, only these molecular orbitals are read.
+  
+  **Returns:**
+  
+  qc : dict
+    Contains the variables found.
+  '''
+  qc = {}
+  for key in variables:
+    if key not in group:
+      continue
+    if hdf5_check_schema(group[key]) == 'table':
+      qc[key] = hdf52table(key,group,index=mo_index if key == 'mo_spec' else None)
+    elif key == 'ao_spherical' and isinstance(group[key],h5py.Dataset):
+      qc[key] = [[i,(l,m)] for i,l,m in group[key][()].tolist()]
+    else:
+      qc[key] = hdf52dict(key,group)
+      if key == 'mo_spec' and mo_index is not None:
+        qc[key] = list(numpy.array(qc[key])[mo_index])
+  if 'geo_info' in qc:
+    qc['geo_info'] = numpy.asarray(qc['geo_info']).astype(str)
+  if 'mo_spec' in qc:
+    qc['mo_spec'] = MOSpec(qc['mo_spec'])
+  return qc
+
 def hdf52dict(group,HDF5_file):
   '''Automatically convert the data stored in an HDF5 file/group 
   to a python dictionary.
@@ -329,6 +584,9 @@ def hdf52dict(group,HDF5_file):
   HDF5_file : h5py.File or h5py.Group
     The source HDF5 file/group.
   '''
+  if not isinstance(HDF5_file[group],h5py.Dataset) and \
+      hdf5_check_schema(HDF5_file[group]) == 'table':
+    return hdf52table(group,HDF5_file)
   try:
     # The selected group is a dataset 
     x = HDF5_file['%s' % group][()]
@@ -395,7 +653,8 @@ def HDF5_creator(data,filename,geo_info,geo_spec,mode='w',data_id='rho',group=No
   data_only : bool
     Specifies if only the dataset `data` should be saved.
   ao_spec, mo_spec : optional
-    If not None, these data sets will be saved additionally.
+    If not None, these data sets will be saved additionally 
+    (cf. :func:`hdf5_write_qc`).
     (cf. :ref:`Central Variables` for details)
     If mo_spec is not None, some information about the molecular orbitals 
     will be saved additionally. 
@@ -443,10 +702,8 @@ def HDF5_creator(data,filename,geo_info,geo_spec,mode='w',data_id='rho',group=No
     dset = f.create_dataset('y',(1,len(y)),data=y)
     dset = f.create_dataset('z',(1,len(z)),data=z)
   
-  if ao_spec is not None:
-    hdf5_append(ao_spec,f,name='ao_spec')
-    if mo_spec is not None:
-      hdf5_append(mo_spec,f,name='mo_spec')
+  hdf5_write_qc(f,geo_info=geo_info,geo_spec=geo_spec,ao_spec=ao_spec,
+                mo_spec=mo_spec if ao_spec is not None else None)
   if mo_spec is not None:
     MO_info = f.create_group('MO_info')
     occ_num=[]
@@ -460,14 +717,14 @@ def HDF5_creator(data,filename,geo_info,geo_spec,mode='w',data_id='rho',group=No
     dset = MO_info.create_dataset('energy',((1,len(mo_spec))),data=energy)
     dset = MO_info.create_dataset('sym',((1,len(mo_spec))),data=sym)
   
-  dset = f.create_dataset('geo_info',(numpy.shape(geo_info)),data=numpy.array(geo_info,dtype='S'))
-  dset = f.create_dataset('geo_spec',(numpy.shape(geo_spec)),data=geo_spec)
-  
   HDF5_file.close()
 
 def hx_network_creator(rho,filename):
   '''Creates a ZIBAmira hx-network file including a colormap file (.cmap)
   adjusted to the density for the easy depiction of the density.
+  
+  The network loads the ZIBAmira mesh file FILENAME.am, which is written 
+  in binary format by :func:`main_output` (cf. :func:`amira_creator`).
   '''
   from orbkit.hx_network_draft import hx_network
   # Create a .cmap colormap file using the default values 
@@ -491,8 +748,12 @@ def hx_network_creator(rho,filename):
   # Close the file 
   fid.close()  
 
-def amira_creator(data,filename):
-  '''Creates a ZIBAmira mesh file. (plain text)
+def amira_creator(data,filename,binary=False,numproc=1,block_size=2**16,
+                  **kwargs):
+  '''Creates a ZIBAmira mesh file. 
+  
+  The data is written in Fortran order (x runs fastest) block by block of
+  complete xy-planes, either in plain text or in binary (little endian) format.
   
   **Parameters:**
   
@@ -500,43 +761,74 @@ def amira_creator(data,filename):
     Contains the output data.
   filename : str
     Contains the base name of the output file.
+  binary : bool, optional
+    If True, a binary AmiraMesh file (BINARY-LITTLE-ENDIAN) is written.
+  numproc : int, optional
+    Specifies number of subprocesses for formatting the plain text data.
+  block_size : int, optional
+    Specifies the approximate number of grid points written at once.
+  
+  **Returns:**
+  
+  filename : str
+    Contains the name of the file written.
   '''
+  data = numpy.asarray(data)
   if data.ndim == 3:
     typename = 'double'
-    formatter = '{0:.15e}\n'
-    data = numpy.swapaxes(data,0,2).reshape((-1,1)) #ravel(order='F')[:,numpy.newaxis]
+    ncomp = 1
   elif data.ndim == 4:
     typename = 'double[3]'
-    data = numpy.array([j.ravel(order='F') for j in data])
-    formatter = '{0:.15e} {1:.15e} {2:.15e}\n'
+    ncomp = 3
   else:
     raise IOError("amira_creator only supports 3D or 4D data.")
   
   N = tuple(grid.N_)
   
-  # Open an empty file 
-  fid = open('%s.am' % filename,'w')
   # Write Header 
-  fid.write('# AmiraMesh 3D ASCII 2.0\n\n\n')
-  fid.write('define Lattice %d %d %d\n' % N)
-  fid.write('Parameters {\n')
-  fid.write('    Content "%dx%dx%d %s, uniform coordinates",\n' % 
-            (N + (typename,)))
-  fid.write('    BoundingBox %(xmin)f %(xmax)f %(ymin)f %(ymax)f %(zmin)f %(zmax)f,\n' %
-            {'xmin': grid.min_[0],'xmax': grid.max_[0],
-             'ymin': grid.min_[1],'ymax': grid.max_[1],
-             'zmin': grid.min_[2],'zmax': grid.max_[2]})
-  fid.write('    CoordType "uniform"\n}\n\n')
-  fid.write('Lattice { %s Data } @1\n'%typename)
-  fid.write('# Data section follows\n@1\n')
-  for i in data:
-    fid.write(formatter.format(*i))
-  #for tt in range(len(grid.z)):
-    #for ss in range(len(grid.y)):
-      #for rr in range(len(grid.x)): 
-        #string += '%g\n' % rho[rr,ss,tt]
-  fid.close()
+  string = '# AmiraMesh %s\n\n\n' % ('BINARY-LITTLE-ENDIAN 2.1' if binary 
+                                      else '3D ASCII 2.0')
+  string += 'define Lattice %d %d %d\n' % N
+  string += 'Parameters {\n'
+  string += '    Content "%dx%dx%d %s, uniform coordinates",\n' % (N + (typename,))
+  string += ('    BoundingBox %(xmin)f %(xmax)f %(ymin)f %(ymax)f %(zmin)f %(zmax)f,\n' %
+             {'xmin': grid.min_[0],'xmax': grid.max_[0],
+              'ymin': grid.min_[1],'ymax': grid.max_[1],
+              'zmin': grid.min_[2],'zmax': grid.max_[2]})
+  string += '    CoordType "uniform"\n}\n\n'
+  string += 'Lattice { %s Data } @1\n' % typename
+  string += '# Data section follows\n@1\n'
+  
+  # Blocks of complete xy-planes in Fortran order, 
+  # i.e., shape=(NPLANES,Ny,Nx) or (NPLANES,Ny,Nx,3)
+  nz = data.shape[-1]
+  nplanes = max(1,int(block_size)//max(1,data[...,0].size//ncomp))
+  blocks = (data[...,k:k+nplanes].T for k in range(0,nz,nplanes))
+  if binary:
+    it = (numpy.ascontiguousarray(i,dtype='<f8').tobytes() for i in blocks)
+  elif numproc > 1:
+    it = (s.encode('ascii') for i,s in 
+          omp_functions.executor.iter(amira_format,blocks,numproc))
+  else:
+    it = (amira_format(i).encode('ascii') for i in blocks)
+  
+  filename = '%s.am' % filename
+  with open(filename,'wb') as fid:
+    fid.write(string.encode('ascii'))
+    for s in it:
+      fid.write(s)
+    if binary:
+      fid.write(b'\n')
   
+  return filename
+
+def amira_format(data):
+  '''Formats a block of a plain text ZIBAmira mesh file, i.e., one grid point 
+  per line. For 4D blocks, the last axis contains the vector components.
+  '''
+  ncomp = data.shape[-1] if data.ndim == 4 else 1
+  line = ' '.join(['%.15e']*ncomp) + '\n'
+  return (line*(data.size//ncomp)) % tuple(numpy.ravel(data).tolist())
   
 def amira_creator_old(rho,filename):
   '''Creates a ZIBAmira mesh file. (plain text)
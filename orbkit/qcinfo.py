@@ -25,6 +25,11 @@ License along with orbkit.  If not, see <http://www.gnu.org/licenses/>.
 #from scipy.constants import value as physical_constants
 import numpy
 from os import path
+from collections import OrderedDict
+try:
+  from collections.abc import MutableMapping, MutableSequence
+except ImportError:
+  from collections import MutableMapping, MutableSequence
 
 
 u_to_me = 1822.88839 # Contains the mass conversion factor to atomic units
@@ -71,24 +76,30 @@ class QCinfo:
     self.geo_info = numpy.array(self.geo_info)
     self.geo_spec = numpy.array(self.geo_spec,dtype=float)
   
+  def format_mo(self):
+    '''Converts mo_spec to a :class:`MOSpec` instance.
+    '''
+    if not isinstance(self.mo_spec,MOSpec):
+      self.mo_spec = MOSpec(self.mo_spec)
+  
   def sort_mo_sym(self):
     '''Sorts mo_spec by symmetry.
     '''
-    keys = []
-    for i_mo in self.mo_spec:
-      keys.append(i_mo['sym'].split('.'))
-    keys = numpy.array(keys,dtype=int)
-    self.mo_spec = list(numpy.array(self.mo_spec)[numpy.lexsort(keys.T)])
+    self.format_mo()
+    keys = numpy.array([i.split('.') for i in self.mo_spec.sym],dtype=int)
+    self.mo_spec = self.mo_spec[numpy.lexsort(keys.T)]
   
   def get_mo_labels(self):
     return ['MO %(sym)s, Occ=%(occ_num).2f, E=%(energy)+.4f E_h' % 
                   i for i in self.mo_spec]
   
   def get_mo_energies(self):
-    return numpy.array([i['energy'] for i in self.mo_spec])
+    self.format_mo()
+    return numpy.array(self.mo_spec.energy)
   
   def get_mo_occ(self):
-    return numpy.array([i['occ_num'] for i in self.mo_spec],dtype=numpy.intc)
+    self.format_mo()
+    return numpy.array(self.mo_spec.occ_num,dtype=numpy.intc)
   
   def get_nmoocc(self):
     return sum(self.get_mo_occ())
@@ -150,20 +161,50 @@ class QCinfo:
     spin : {None, 'alpha', or 'beta'}, optional
       If not None, returns exclusively 'alpha' or 'beta' molecular orbitals.
     '''
+    self.format_mo()
     # Only molecular orbitals of one spin requested?
     if spin is not None:
-      for i in range(len(self.mo_spec))[::-1]:
-        if self.mo_spec[i]['spin'] != spin:
-          del self.mo_spec[i]
+      self.mo_spec = self.mo_spec[self.mo_spec.spin == spin]
     
     if restricted:
       # Closed shell calculation
-      for mo in self.mo_spec:
-        del mo['spin']
+      self.mo_spec.spin = [None]*len(self.mo_spec)
     else:
       # Rename MOs according to spin
-      for mo in self.mo_spec:      
-        mo['sym'] += '_%s' % mo['spin'][0]
+      self.mo_spec.sym = ['%s_%s' % (i,j[0]) for i,j in 
+                          zip(self.mo_spec.sym,self.mo_spec.spin)]
+  
+  def get_basis_plan(self):
+    '''Returns the :class:`orbkit.core.BasisPlan` for the current basis set.
+    
+    The plan is cached and rebuilt only if geo_spec, ao_spec, or ao_spherical 
+    have changed.
+    '''
+    from orbkit.core import BasisPlan, get_basis_key
+    key = get_basis_key(self.geo_spec,self.ao_spec,self.ao_spherical)
+    plan = getattr(self,'_basis_plan',None)
+    if plan is None or plan.key != key:
+      plan = BasisPlan(self.geo_spec,self.ao_spec,self.ao_spherical)
+      plan.key = key
+      self._basis_plan = plan
+    return plan
+  
+  def hdf5_save(self,fid='out.h5',group='/qc',mode='w'):
+    '''Saves all essential variables to an HDF5 file 
+    (cf. :func:`orbkit.output.hdf5_write_qc`).
+    '''
+    from orbkit.output import hdf5_open,hdf5_write_qc
+    for hdf5_file in hdf5_open(fid,mode=mode):
+      hdf5_write_qc(hdf5_file.require_group(group),**self.todict())
+  
+  def hdf5_read(self,fid='out.h5',group='/qc',mo_index=None):
+    '''Reads all essential variables from an HDF5 file. If mo_index is not 
+    None, only the selected molecular orbitals are read.
+    '''
+    from orbkit.output import hdf5_open,hdf5_read_qc
+    for hdf5_file in hdf5_open(fid,mode='r'):
+      for key,value in hdf5_read_qc(hdf5_file[group],mo_index=mo_index).items():
+        setattr(self,key,value)
   
   def todict(self):
     '''Converts all essential variables into a dictionary.
@@ -293,21 +334,403 @@ class CIinfo:
     assert (moocc.dtype == numpy.intc), 'moocc has to be numpy.intc'
     self.moocc = moocc
   def hdf5_save(self,fid='out.h5',group='/ci:0',mode='w'):
-    from orbkit.output import hdf5_open,hdf5_append
-    from copy import copy
+    '''Saves the CI coefficients and occupations as datasets and the 
+    information about the state (``self.info``) as a group.
+    '''
+    from orbkit.output import hdf5_open,hdf5_append,hdf5_set_schema
     for hdf5_file in hdf5_open(fid,mode=mode):
-      dct = copy(self.todict())
-      dct['info'] = numpy.array(dct['info'].items(),dtype=str)
-      hdf5_append(dct,hdf5_file,name=group)
+      g = hdf5_file.require_group(group)
+      hdf5_set_schema(g,'ciinfo')
+      g.attrs['method'] = self.method
+      for key in ['coeffs','occ','moocc']:
+        if self.__dict__[key] is not None:
+          g.create_dataset(key,data=numpy.asarray(self.__dict__[key]))
+      if self.info:
+        info = {}
+        for k,v in self.info.items():
+          if isinstance(v,list):
+            # Only lists of strings are stored as byte strings
+            v = numpy.asarray(v)
+            if v.dtype.kind in 'SU':
+              v = v.astype('S')
+          if v is not None:
+            info[k] = v
+        hdf5_append(info,g,name='info')
+        for name,keys in [('none',[k for k,v in self.info.items() if v is None]),
+                          ('list',[k for k,v in self.info.items() 
+                                   if isinstance(v,list)])]:
+          if keys:
+            g.create_dataset('info:%s' % name,data=numpy.array(keys,dtype='S'))
   def hdf5_read(self,fid='out.h5',group='/ci:0'):
-    from orbkit.output import hdf5_open,hdf52dict
+    from orbkit.output import hdf5_open,hdf52dict,hdf5_check_schema
     for hdf5_file in hdf5_open(fid,mode='r'):
-      for key in self.__dict__.keys():
-        try:
-          self.__dict__[key] = hdf52dict('%s/%s' % (group,key),hdf5_file)
-        except KeyError:
-          self.__dict__[key] = hdf5_file['%s' % group].attrs[key]
-      self.__dict__['info'] = dict(self.__dict__['info'])
+      g = hdf5_file[group]
+      if hdf5_check_schema(g) != 'ciinfo':
+        # Layout of previous versions
+        for key in self.__dict__.keys():
+          try:
+            self.__dict__[key] = hdf52dict('%s/%s' % (group,key),hdf5_file)
+          except KeyError:
+            self.__dict__[key] = hdf5_file['%s' % group].attrs[key]
+        self.__dict__['info'] = dict(self.__dict__['info'])
+        return
+      self.method = g.attrs['method']
+      for key in ['coeffs','occ','moocc']:
+        self.__dict__[key] = g[key][()] if key in g else None
+      self.info = None
+      if 'info' in g:
+        self.info = hdf52dict('info',g)
+        if 'info:none' in g:
+          self.info.update((k,None) for k in g['info:none'][()].astype(str))
+        if 'info:list' in g:
+          lists = g['info:list'][()].astype(str)
+        else:
+          # Files of previous versions stored all lists as byte strings
+          lists = [k for k,v in self.info.items() 
+                   if isinstance(v,numpy.ndarray) and v.dtype.kind == 'S']
+        for k in lists:
+          v = self.info[k]
+          self.info[k] = (v.astype(str) if v.dtype.kind == 'S' else v).tolist()
+
+class MOView(MutableMapping):
+  '''Dictionary-like view of a single molecular orbital of a :class:`MOSpec` 
+  instance, i.e., an element of ``qc.mo_spec``.
+  
+  Reading ``mo['coeffs']`` returns a view of the respective row of the 
+  coefficient matrix. Assignments are written to the arrays of the MOSpec.
+  '''
+  def __init__(self,data,row):
+    self._data = data
+    self._row = row
+  def __getitem__(self,key):
+    col = self._data.columns[key]
+    value = col[self._row]
+    if col.dtype == object:
+      if value is None:
+        raise KeyError(key)
+      return value
+    return value if col.ndim > 1 else value.item()
+  def __setitem__(self,key,value):
+    self._data.set(key,[self._row],[value])
+  def __delitem__(self,key):
+    self[key]
+    self._data.set(key,[self._row],[None])
+  def __iter__(self):
+    for key,col in list(self._data.columns.items()):
+      if col.dtype != object or col[self._row] is not None:
+        yield key
+  def __len__(self):
+    return sum(1 for key in self)
+  def __eq__(self,other):
+    if isinstance(other,MOView) and other._data is self._data and \
+        other._row == self._row:
+      return True
+    return MutableMapping.__eq__(self,other)
+  def __ne__(self,other):
+    return not self == other
+  __hash__ = None
+  def __repr__(self):
+    return repr(dict(self))
+  def __reduce__(self):
+    return (dict,(dict(self),))
+  def copy(self):
+    return dict(self)
+
+class _MOData(object):
+  '''Column-wise storage of the molecular orbitals shared by a :class:`MOSpec`
+  and all its index views. Missing entries are None in object columns.'''
+  def __init__(self,columns=None):
+    self.columns = OrderedDict()
+    self.size = 0
+    for key,values in (columns or {}).items():
+      self.columns[key] = make_column(values)
+      self.size = len(self.columns[key])
+  
+  def reserve(self,size):
+    '''Enlarges the capacity of all columns to at least `size` rows.'''
+    capacity = min([len(col) for col in self.columns.values()] or [0])
+    if size <= capacity:
+      return
+    capacity = max(size,2*capacity,16)
+    for key,col in self.columns.items():
+      new = numpy.zeros((capacity,) + col.shape[1:],dtype=col.dtype)
+      if col.dtype == object:
+        new.fill(None)
+      new[:self.size] = col[:self.size]
+      self.columns[key] = new
+  
+  def retype(self,key,dtype):
+    '''Converts a column to another data type.'''
+    col = self.columns[key]
+    if dtype == object:
+      new = numpy.empty(len(col),dtype=object)
+      for i in range(self.size):
+        new[i] = col[i] if col.ndim > 1 else col[i].item()
+    else:
+      new = col.astype(dtype)
+    self.columns[key] = new
+    return new
+  
+  def set(self,key,rows,values):
+    '''Assigns a sequence of values to the rows of a column.'''
+    col = self.columns.get(key)
+    if col is None:
+      if sorted(rows) == list(range(self.size)):
+        # The values of all rows are given
+        full = [None]*self.size
+        for i,v in zip(rows,values):
+          full[i] = v
+        self.columns[key] = make_column(full)
+        return
+      self.reserve(self.size)
+      capacity = max([len(c) for c in self.columns.values()] or [self.size])
+      col = self.columns[key] = numpy.empty(capacity,dtype=object)
+    if col.dtype != object:
+      try:
+        v = numpy.asarray(values)
+      except ValueError:
+        v = numpy.empty(0,dtype=object)
+      if v.dtype.kind in 'biufc' and v.shape == (len(rows),) + col.shape[1:]:
+        if not numpy.can_cast(v.dtype,col.dtype):
+          col = self.retype(key,numpy.result_type(col.dtype,v.dtype))
+        col[rows] = v
+        return
+      col = self.retype(key,object)
+    for i,v in zip(rows,values):
+      col[i] = v
+  
+  def extend(self,mo_spec):
+    '''Appends a list of dictionaries and returns the indices of the new rows.'''
+    mo_spec = list(mo_spec)
+    rows = list(range(self.size,self.size+len(mo_spec)))
+    if not rows:
+      return numpy.array(rows,dtype=numpy.intp)
+    if self.size == 0:
+      self.columns = OrderedDict()
+    self.reserve(self.size+len(rows))
+    keys = list(self.columns.keys())
+    for mo in mo_spec:
+      keys.extend(k for k in mo.keys() if k not in keys)
+    self.size += len(rows)
+    for key in keys:
+      self.set(key,rows,[mo.get(key) for mo in mo_spec])
+    return numpy.array(rows,dtype=numpy.intp)
+
+def make_column(values):
+  '''Converts a list of values to a numeric numpy.ndarray, if possible, or to 
+  an array of objects otherwise.'''
+  if isinstance(values,numpy.ndarray) and values.dtype.kind in 'biufc':
+    return values
+  values = list(values)
+  if not any(v is None for v in values):
+    try:
+      col = numpy.array(values)
+    except ValueError:
+      col = None
+    if col is not None and col.dtype.kind in 'biufc' and col.ndim > 0:
+      return col
+  col = numpy.empty(len(values),dtype=object)
+  for i,v in enumerate(values):
+    col[i] = v
+  return col
+
+class MOSpec(MutableSequence):
+  '''Class managing the molecular orbitals (``qc.mo_spec``) as contiguous 
+  arrays, i.e., a coefficient matrix (shape=(NMO,NAO)) and arrays for the 
+  energies, occupation numbers, symmetry labels, and spins.
+  
+  For backward compatibility, the class behaves like a list of dictionaries, 
+  e.g., ``qc.mo_spec[i]['coeffs']`` returns a view of the coefficient matrix
+  (cf. :class:`MOView`). Slices, lists of indices, and boolean masks return
+  MOSpec instances, which share the arrays with the original instance 
+  (index views).
+  
+  **Parameters:**
+  
+  mo_spec : list of dict or MOSpec, optional
+    Contains the molecular orbitals. Elements of other MOSpec instances are 
+    copied, if they are not views of the same arrays.
+  
+  **Attributes:**
+  
+  coeffs, energy, occ_num, sym, spin : numpy.ndarray
+    Contain the respective values of all molecular orbitals. Views are 
+    returned, if the selected molecular orbitals are stored contiguously; 
+    assignments are written to the molecular orbitals.
+  '''
+  def __init__(self,mo_spec=None):
+    if isinstance(mo_spec,MOSpec):
+      self._data = mo_spec._data
+      self._index = mo_spec._index.copy()
+      return
+    mo_spec = [] if mo_spec is None else list(mo_spec)
+    if mo_spec and all(isinstance(i,MOView) for i in mo_spec) and \
+        all(i._data is mo_spec[0]._data for i in mo_spec):
+      self._data = mo_spec[0]._data
+      self._index = numpy.array([i._row for i in mo_spec],dtype=numpy.intp)
+    else:
+      self._data = _MOData()
+      self._index = self._data.extend(mo_spec)
+  
+  @classmethod
+  def fromdict(cls,dct):
+    '''Creates a MOSpec instance from a dictionary of arrays 
+    (cf. :meth:`todict`). Numeric arrays are used without copying.'''
+    mo_spec = cls()
+    mo_spec._data = _MOData(dct)
+    mo_spec._index = numpy.arange(mo_spec._data.size,dtype=numpy.intp)
+    return mo_spec
+  
+  def todict(self):
+    '''Returns the compact arrays of the selected molecular orbitals, e.g., 
+    ``{'coeffs': ..., 'energy': ..., 'occ_num': ..., 'sym': ...}``.'''
+    dct = OrderedDict()
+    for key,col in self._data.columns.items():
+      col = col[self._index]
+      if col.dtype != object or any(i is not None for i in col):
+        dct[key] = col
+    return dct
+  
+  def _view(self,index):
+    mo_spec = self.__class__.__new__(self.__class__)
+    mo_spec._data = self._data
+    mo_spec._index = index
+    return mo_spec
+  
+  def _rows(self,values):
+    '''Returns the row indices of molecular orbitals, which are appended to 
+    the arrays if they are not views of them.'''
+    if isinstance(values,MOSpec) and values._data is self._data:
+      return values._index.copy()
+    if isinstance(values,(dict,MOView)):
+      values = [values]
+    values = list(values)
+    if all(isinstance(i,MOView) and i._data is self._data for i in values):
+      return numpy.array([i._row for i in values],dtype=numpy.intp)
+    return self._data.extend(dict(i) for i in values)
+  
+  def __len__(self):
+    return len(self._index)
+  
+  def __getitem__(self,i):
+    if isinstance(i,(int,numpy.integer)):
+      return MOView(self._data,int(self._index[i]))
+    return self._view(self._index[i])
+  
+  def __setitem__(self,i,value):
+    if isinstance(i,(int,numpy.integer)):
+      self._index[i] = self._rows(value)[0]
+    elif isinstance(i,slice):
+      index = self._index.tolist()
+      index[i] = self._rows(value).tolist()
+      self._index = numpy.array(index,dtype=numpy.intp)
+    else:
+      self._index[i] = self._rows(value)
+  
+  def __delitem__(self,i):
+    self._index = numpy.delete(self._index,numpy.arange(len(self))[i])
+  
+  def __iter__(self):
+    for row in self._index.tolist():
+      yield MOView(self._data,row)
+  
+  def insert(self,i,value):
+    i = min(max(i + len(self) if i < 0 else i,0),len(self))
+    self._index = numpy.insert(self._index,i,self._rows(value))
+  
+  def append(self,value):
+    self._index = numpy.append(self._index,self._rows(value))
+  
+  def extend(self,values):
+    self._index = numpy.append(self._index,self._rows(values))
+  
+  def __add__(self,other):
+    mo_spec = self._view(self._index.copy())
+    mo_spec.extend(other)
+    return mo_spec
+  
+  def __radd__(self,other):
+    mo_spec = self._view(self._index[:0])
+    mo_spec.extend(other)
+    mo_spec.extend(self)
+    return mo_spec
+  
+  def __eq__(self,other):
+    if not isinstance(other,(list,MOSpec)):
+      return NotImplemented
+    return len(self) == len(other) and all(i == j for i,j in zip(self,other))
+  
+  def __ne__(self,other):
+    equal = self.__eq__(other)
+    return equal if equal is NotImplemented else not equal
+  
+  __hash__ = None
+  
+  def __repr__(self):
+    return repr(self.tolist())
+  
+  def tolist(self):
+    '''Converts the MOSpec to a list of dictionaries.'''
+    return [dict(i) for i in self]
+  
+  def copy(self):
+    '''Returns a MOSpec containing copies of the selected molecular orbitals.'''
+    return self.fromdict(self.todict())
+  
+  def __copy__(self):
+    return self._view(self._index.copy())
+  
+  def __deepcopy__(self,memo):
+    from copy import deepcopy
+    return self.fromdict(deepcopy(self.todict(),memo))
+  
+  def __getstate__(self):
+    return {'columns': self.todict()}
+  
+  def __setstate__(self,state):
+    self._data = _MOData(state['columns'])
+    self._index = numpy.arange(self._data.size,dtype=numpy.intp)
+  
+  def get_array(self,key):
+    '''Returns the values of `key` for all molecular orbitals as numpy.ndarray.
+    Missing values are None.
+    '''
+    index = self._index
+    n = len(index)
+    if key not in self._data.columns and n == 0:
+      return numpy.array([])
+    col = self._data.columns[key]
+    if n and index[-1] - index[0] == n - 1 and \
+        (n == 1 or (numpy.diff(index) == 1).all()):
+      col = col[index[0]:index[0]+n]
+    else:
+      col = col[index]
+    if col.dtype == object:
+      if n and all(i is None for i in col):
+        raise KeyError(key)
+      if not any(i is None for i in col):
+        array = make_column(col)
+        if array.dtype != object:
+          return array
+    return col
+  
+  def set_array(self,key,values):
+    '''Assigns the values of `key` for all molecular orbitals.'''
+    if len(values) != len(self):
+      raise ValueError('%d values have been given for %d molecular orbitals.' 
+                       % (len(values),len(self)))
+    self._data.set(key,self._index.tolist(),values)
+  
+  coeffs = property(lambda self: self.get_array('coeffs'),
+                    lambda self,value: self.set_array('coeffs',value))
+  energy = property(lambda self: self.get_array('energy'),
+                    lambda self,value: self.set_array('energy',value))
+  occ_num = property(lambda self: self.get_array('occ_num'),
+                     lambda self,value: self.set_array('occ_num',value))
+  sym = property(lambda self: self.get_array('sym'),
+                 lambda self,value: self.set_array('sym',value))
+  spin = property(lambda self: self.get_array('spin'),
+                  lambda self,value: self.set_array('spin',value))
 
 def read_nist():
   '''Reads and converts the atomic masses from the "Linearized ASCII Output", 
@@ -384,12 +807,18 @@ def get_atom_symbol(atom):
     return atom.upper()
 
 def dump(data,fid):
-  import cPickle
+  try:
+    import cPickle as pickle
+  except ImportError:
+    import pickle
   with open(fid, "wb") as output:
-    cPickle.dump(data,output,cPickle.HIGHEST_PROTOCOL)
+    pickle.dump(data,output,pickle.HIGHEST_PROTOCOL)
 
 def load(fid,**kwargs):
-  import cPickle
+  try:
+    import cPickle as pickle
+  except ImportError:
+    import pickle
   with open(fid, "rb") as input:       
-    data = cPickle.load(input)
+    data = pickle.load(input)
   return data
@@ -24,14 +24,16 @@ License along with orbkit.  If not, see <http://www.gnu.org/licenses/>.
 '''
 import os
 import copy
+import warnings
 import numpy
+from collections import OrderedDict
 
 from orbkit.core import l_deg, lquant, orbit, exp, exp_wfn,create_mo_coeff
 from orbkit.display import display
-from orbkit.qcinfo import QCinfo, get_atom_symbol, load
+from orbkit.qcinfo import QCinfo, MOSpec, get_atom_symbol, load
 
 def main_read(filename,itype='molden',all_mo=False,spin=None,cclib_parser=None,
-              **kwargs):
+              cache=False,**kwargs):
   '''Calls the requested read function.
   
   **Parameters:**
@@ -46,6 +48,10 @@ def main_read(filename,itype='molden',all_mo=False,spin=None,cclib_parser=None,
       If not None, returns exclusively 'alpha' or 'beta' molecular orbitals.
     cclib_parser : str
       If itype is 'cclib', specifies the cclib.parser.
+    cache : bool or str, optional
+      If True or a directory name, the parsed data is stored in a binary cache 
+      and reused as long as the input file and the reading options are 
+      unchanged (cf. :func:`cache_load`). If True, :data:`cache_dir` is used.
   
   **Returns:**
   
@@ -73,10 +79,124 @@ def main_read(filename,itype='molden',all_mo=False,spin=None,cclib_parser=None,
   if itype not in reader.keys():
     display('Available reader (`itype`) are:\n  ' + ', '.join(reader.keys()))
     raise NotImplementedError("itype='%s' not implemented!"%itype)
+  
+  if cache and itype != 'orbkit.dump':
+    directory = cache_dir if cache is True else cache
+    key = get_cache_key(filename,itype=itype,all_mo=all_mo,spin=spin,
+                        cclib_parser=cclib_parser,**kwargs)
+    qc = cache_load(filename,directory,key)
+    if qc is not None:
+      return qc
+  
   # Return required data
-  return reader[itype](filename, all_mo=all_mo, spin=spin, 
-                       cclib_parser=cclib_parser,**kwargs)
+  qc = reader[itype](filename, all_mo=all_mo, spin=spin, 
+                     cclib_parser=cclib_parser,**kwargs)
+  if isinstance(qc,QCinfo):
+    qc.format_mo()
+  
+  if cache and itype != 'orbkit.dump':
+    cache_save(qc,filename,directory,key)
+  
+  return qc
   # main_read 
+
+#: Default directory of the cache of parsed input files (cf. :func:`main_read`).
+cache_dir = os.environ.get('ORBKIT_CACHE',
+                           os.path.join(os.path.expanduser('~'),'.cache','orbkit'))
+
+def get_cache_key(filename,**kwargs):
+  '''Returns the name of the cache entry for an input file, i.e., a hash of 
+  its absolute path and of the reading options (keyword arguments).
+  '''
+  import hashlib
+  key = repr((os.path.abspath(filename),sorted(kwargs.items())))
+  return hashlib.sha1(key.encode()).hexdigest()
+
+def get_file_info(filename):
+  '''Returns size, modification time, and SHA-1 hash of the content of a file.'''
+  import hashlib
+  stat = os.stat(filename)
+  sha = hashlib.sha1()
+  with open(filename,'rb') as fid:
+    for block in iter(lambda: fid.read(2**22),b''):
+      sha.update(block)
+  return stat.st_size, stat.st_mtime, sha.hexdigest()
+
+def cache_save(qc,filename,directory,key):
+  '''Stores a QCinfo instance in the cache of parsed input files.
+  
+  The molecular orbital coefficients are stored as a single matrix in 
+  ``<key>_<hash>.npy`` and everything else is pickled to ``<key>.pkl``
+  (the remaining arrays of :class:`orbkit.qcinfo.MOSpec` as dictionary).
+  '''
+  try:
+    import cPickle as pickle
+  except ImportError:
+    import pickle
+  try:
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+    qc = copy.copy(qc)
+    coeffs = None
+    if isinstance(qc.mo_spec,MOSpec):
+      qc.mo_spec = qc.mo_spec.todict()
+      if 'coeffs' in qc.mo_spec and qc.mo_spec['coeffs'].dtype != object:
+        coeffs = qc.mo_spec.pop('coeffs')
+    file_info = get_file_info(filename)
+    fname = os.path.join(directory,key)
+    tmp = '%s.%d.tmp' % (fname,os.getpid())
+    npy = None
+    if coeffs is not None:
+      npy = '%s_%s.npy' % (key,file_info[2])
+      with open(tmp,'wb') as fid:
+        numpy.save(fid,coeffs)
+      os.rename(tmp,os.path.join(directory,npy))
+    with open(tmp,'wb') as fid:
+      pickle.dump((file_info,npy,qc),fid,pickle.HIGHEST_PROTOCOL)
+    os.rename(tmp,'%s.pkl' % fname)
+    # Remove the coefficients of previous versions of the input file
+    for i in os.listdir(directory):
+      if i.startswith(key + '_') and i.endswith('.npy') and i != npy:
+        os.remove(os.path.join(directory,i))
+  except (IOError,OSError) as e:
+    display('Could not store the parsed data in the cache (%s).' % e)
+
+def cache_load(filename,directory,key):
+  '''Loads a QCinfo instance from the cache of parsed input files.
+  
+  The cache entry is only used if size, modification time, and content hash
+  of the input file are unchanged. The molecular orbital coefficients are 
+  memory-mapped (copy-on-write) and used as coefficient matrix of 
+  ``qc.mo_spec`` (cf. :class:`orbkit.qcinfo.MOSpec`).
+  
+  **Returns:**
+  
+    qc (class QCinfo) or None, if no valid cache entry has been found.
+  '''
+  try:
+    import cPickle as pickle
+  except ImportError:
+    import pickle
+  fname = os.path.join(directory,key)
+  try:
+    with open('%s.pkl' % fname,'rb') as fid:
+      file_info,npy,qc = pickle.load(fid)
+    stat = os.stat(filename)
+    if file_info[:2] != (stat.st_size,stat.st_mtime) or \
+        file_info != get_file_info(filename):
+      return None
+    if not isinstance(qc.mo_spec,dict):
+      # Entry of a previous version
+      return None
+    mo_spec = list(qc.mo_spec.items())
+    if npy is not None:
+      coeffs = numpy.load(os.path.join(directory,npy),mmap_mode='c')
+      mo_spec.insert(0,('coeffs',coeffs.view(numpy.ndarray)))
+    qc.mo_spec = MOSpec.fromdict(OrderedDict(mo_spec))
+  except (IOError,OSError,EOFError,ValueError,pickle.UnpicklingError):
+    return None
+  display('Loaded the parsed data from the cache\n\t%s.pkl\n' % fname)
+  return qc
   
 def read_molden(filename, all_mo=False, spin=None, i_md=-1, interactive=True,
                 **kwargs):
@@ -91,7 +211,9 @@ def read_molden(filename, all_mo=False, spin=None, i_md=-1, interactive=True,
     spin : {None, 'alpha', or 'beta'}, optional
       If not None, returns exclusively 'alpha' or 'beta' molecular orbitals.
     i_md : int, default=-1
-      Selects the `[Molden Format]` section of the output file.
+      Selects the `[Molden Format]` section of the output file. For files 
+      containing several sections, the byte offsets of the sections are 
+      stored next to the file (cf. :func:`get_molden_index`).
     interactive : bool
       If True, the user is asked to select the different sets.
   
@@ -101,21 +223,6 @@ def read_molden(filename, all_mo=False, spin=None, i_md=-1, interactive=True,
         See :ref:`Central Variables` for details.
   '''
 
-  fid    = open(filename,'r')      # Open the file
-  flines = fid.readlines()         # Read the WHOLE file into RAM
-  fid.close()                      # Close the file
-  
-  # Is this really a molden file? 
-  ismd = False
-  for line in flines:
-    if '[molden format]' in line.lower():
-      ismd = True
-  
-  if not ismd:
-    display('The input file %s is no valid molden file!\n\nIt does'  % filename+
-          ' not contain the keyword: [Molden Format]\n')
-    raise IOError('Not a valid input file')
-  
   def check_sel(count,i,interactive=False):
     if count == 0:
       raise IndexError
@@ -134,238 +241,56 @@ def read_molden(filename, all_mo=False, spin=None, i_md=-1, interactive=True,
               ('last element.' if (i == count-1) else 'element %d.' % i))
     return i
   
-  has_alpha = []
-  has_beta = []
-  restricted = []
-  cartesian_basis = []
-  mixed_warning = []
-  by_orca = []
-  count = 0
-  # Go through the file line by line 
-  for il in range(len(flines)):
-    line = flines[il]            # The current line as string
-    
-    # Check the file for keywords 
-    if '[molden format]' in line.lower():
-      count += 1
-      has_alpha.append(False)
-      has_beta.append(False)
-      restricted.append(False)
-      cartesian_basis.append(True)
-      mixed_warning.append(False)
-      by_orca.append(False)
-    if 'orca' in line.lower():
-      by_orca[-1] = True
-    if '[5d]' in line.lower() or '[5d7f]' in line.lower():
-      cartesian_basis[-1] = False
-    if '[5d10f]'  in line.lower():
-      mixed_warning[-1] = '5D, 10F'
-      cartesian_basis[-1] = False
-    if '[7f]'  in line.lower():
-      mixed_warning[-1] = '6D, 7F'
-      cartesian_basis[-1] = True
-    if 'Spin' in line and 'alpha' in line.lower():
-      has_alpha[-1] = True
-    if 'Spin' in line and 'beta' in line.lower():
-      has_beta[-1] = True
-    if 'Occup' in line:
-      restricted[-1] = restricted[-1] or (float(line.split('=')[1]) > 1.+1e-4)
-  
-  if count == 0:
-    display('The input file %s is no valid molden file!\n\nIt does' % filename +
-          ' not contain the keyword: [Molden Format]\n')
-    raise IOError('Not a valid input file')
-  else:
-    if count > 1:
+  # The file is memory-mapped and only the selected molden section is parsed
+  import mmap
+  with open(filename,'rb') as fid:
+    try:
+      mm = mmap.mmap(fid.fileno(),0,access=mmap.ACCESS_READ)
+    except ValueError:
+      # Empty file
+      mm = b''
+  try:
+    sections = get_molden_index(filename,mm=mm)['sections']
+    count = len(sections)
+    if count == 0:
+      display('The input file %s is no valid molden file!\n\nIt does' % filename +
+            ' not contain the keyword: [Molden Format]\n')
+      raise IOError('Not a valid input file')
+    elif count > 1:
       display('\nContent of the molden file:')
       display('\tFound %d [Molden Format] keywords, i.e., ' % count + 
               'this file contains %d molden files.' % count)
     i_md = check_sel(count,i_md,interactive=interactive)
+    qc,info = read_molden_section(mm,*sections[i_md])
+  finally:
+    if not isinstance(mm,bytes):
+      mm.close()
   
+  restricted = info['restricted']
   if spin is not None:
-    if restricted[i_md]:
+    if restricted:
       raise IOError('The keyword `spin` is only supported for unrestricted calculations.')    
     if spin != 'alpha' and spin != 'beta':
       raise IOError('`spin=%s` is not a valid option' % spin)
-    elif spin == 'alpha' and has_alpha[i_md]:
+    elif spin == 'alpha' and info['has_alpha']:
       display('Reading only molecular orbitals of spin alpha.')
-    elif spin == 'beta' and has_beta[i_md]:
+    elif spin == 'beta' and info['has_beta']:
       display('Reading only molecular orbitals of spin beta.')
-    elif (not has_alpha[i_md]) and (not has_beta[i_md]):
+    elif (not info['has_alpha']) and (not info['has_beta']):
       raise IOError(
            'Molecular orbitals in `molden` file do not contain `Spin=` keyword')
-    elif ((spin == 'alpha' and not has_alpha[i_md]) or 
-          (spin == 'beta' and not has_beta[i_md])):
+    elif ((spin == 'alpha' and not info['has_alpha']) or 
+          (spin == 'beta' and not info['has_beta'])):
       raise IOError('You requested `%s` orbitals, but None of them are present.'
                     % spin)
   
-  # Set a counter for the AOs 
-  basis_count = 0
-  sym = {}
-
-  # Declare synonyms for molden keywords 
-  synonyms = {'Sym': 'sym',
-              'Ene': 'energy',
-              'Occup': 'occ_num',
-              'Spin': 'spin'
-             }
-  MO_keys = synonyms.keys()
-  
-  count = 0
-  max_l = 0
-  start_reading = False
-  # Go through the file line by line 
-  for il in range(len(flines)):
-    line = flines[il]              # The current line as string
-    thisline = line.split()        # The current line split into segments
-    
-    # Check the file for keywords 
-    if '[molden format]' in line.lower():
-      # A new file begins 
-      # Initialize the variables 
-      if i_md == count:
-        qc = QCinfo()
-        sec_flag = False           # A Flag specifying the current section 
-        start_reading = True       # Found the selected section
-      else:
-        start_reading = False
-      count += 1
-      continue
-    if start_reading:
-      if '_ENERGY=' in line:
-        try:
-          qc.etot = float(thisline[1])
-        except IndexError:
-          pass
-      elif '[atoms]' in line.lower():
-        # The section containing information about 
-        # the molecular geometry begins 
-        sec_flag = 'geo_info'
-        if 'Angs' in line:
-          # The length are given in Angstroem 
-          # and have to be converted to Bohr radii --
-          aa_to_au = 1/0.52917720859
-        else:
-          # The length are given in Bohr radii 
-          aa_to_au = 1.0
-      elif '[gto]' in line.lower():
-        # The section containing information about 
-        # the atomic orbitals begins 
-        sec_flag = 'ao_info'
-        bNew = True                  # Indication for start of new AO section
-      elif '[mo]' in line.lower():
-        # The section containing information about 
-        # the molecular orbitals begins 
-        sec_flag = 'mo_info'
-        bNew = True                  # Indication for start of new MO section
-      elif '[sto]' in line.lower():
-        # The orbkit does not support Slater type orbitals 
-        display('orbkit does not work for STOs!\nEXIT\n');
-        raise IOError('Not a valid input file')
-      elif '[' in line:
-        sec_flag = None
-      else:
-        # Check if we are in a specific section 
-        if sec_flag == 'geo_info' and thisline != []:
-          # Geometry section 
-          qc.geo_info.append(thisline[0:3])
-          qc.geo_spec.append([float(ii)*aa_to_au for ii in thisline[3:]])
-        if sec_flag == 'ao_info':
-          # Atomic orbital section 
-          def check_int(i):
-            try:
-              int(i)
-              return True
-            except ValueError:
-              return False
-          
-          if thisline == []:
-            # There is a blank line after every AO 
-            bNew = True
-          elif bNew:
-            # The following AOs are for which atom? 
-            bNew = False
-            at_num = int(thisline[0]) - 1
-            ao_num = 0
-          elif len(thisline) == 3 and check_int(thisline[1]):
-            # AO information section 
-            # Initialize a new dict for this AO 
-            ao_num = 0               # Initialize number of atomic orbiatls 
-            ao_type = thisline[0].lower()    # Which type of atomic orbital do we have
-            pnum = int(thisline[1])  # Number of primatives
-            # Calculate the degeneracy of this AO and increase basis_count 
-            for i_ao in ao_type:
-              # Calculate the degeneracy of this AO and increase basis_count 
-              basis_count += l_deg(lquant[i_ao],cartesian_basis=cartesian_basis[i_md])
-              max_l = max(max_l,lquant[i_ao])
-              qc.ao_spec.append({'atom': at_num,
-                              'type': i_ao,
-                              'pnum': -pnum if by_orca[i_md] else pnum,
-                              'coeffs': numpy.zeros((pnum, 2))
-                              })
-          else:
-            # Append the AO coefficients 
-            coeffs = numpy.array(line.replace('D','e').split(), dtype=numpy.float64)
-            for i_ao in range(len(ao_type)):
-              qc.ao_spec[-len(ao_type)+i_ao]['coeffs'][ao_num,:] = [coeffs[0],
-                                                                coeffs[1+i_ao]]
-            ao_num += 1
-        if sec_flag == 'mo_info':
-          # Molecular orbital section 
-          if '=' in line:
-            # MO information section 
-            if bNew:
-              # Create a numpy array for the MO coefficients and 
-              # for backward compability create a simple counter for 'sym'
-              qc.mo_spec.append({'coeffs': numpy.zeros(basis_count),
-                                'sym': '%d.1' % (len(qc.mo_spec)+1)})
-              bNew = False
-            # Append information to dict of this MO 
-            info = line.replace('\n','').replace(' ','')
-            info = info.split('=')
-            if info[0] in MO_keys: 
-              if info[0] == 'Spin':
-                info[1] = info[1].lower()
-              elif info[0] != 'Sym':
-                info[1] = float(info[1])
-              elif not '.' in info[1]:
-                from re import search
-                try:
-                  a = search(r'\d+', info[1]).group()
-                  if a == info[1]:
-                    info[1] = '%s.1' % a
-                  elif info[1].startswith(a):
-                    info[1] = info[1].replace(a, '%s.' % a,1)
-                  else:
-                    raise AttributeError
-                except AttributeError:
-                  if info[1] not in sym.keys(): sym[info[1]] = 1
-                  else: sym[info[1]] += 1
-                  info[1] = '%d.%s' % (sym[info[1]],info[1]) 
-              qc.mo_spec[-1][synonyms[info[0]]] = info[1]
-          else:
-            if ('[' or ']') in line:
-              # start of another section that is not (yet) read
-              sec_flag = None
-            else:
-              # Append the MO coefficients 
-              bNew = True            # Reset bNew
-              index = int(thisline[0])-1
-              try: 
-                # Try to convert coefficient to float 
-                qc.mo_spec[-1]['coeffs'][index] = float(thisline[1])
-              except ValueError:
-                # If it cannot be converted print error message 
-                display('Error in coefficient %d of MO %s!' % (index, 
-                  qc.mo_spec[-1]['sym']) + '\nSetting this coefficient to zero...')
-  
   # Spherical basis?
-  if not cartesian_basis[i_md]:    
+  if not info['cartesian_basis']:    
     qc.ao_spherical = get_ao_spherical(qc.ao_spec,p=[1,0])
-  if max_l > 2 and mixed_warning[i_md]:
+  if info['max_l'] > 2 and info['mixed_warning']:
     display('='*80)
     display('The input file %s contains ' % filename +
-            'mixed spherical and Cartesian function (%s).' %  mixed_warning[i_md] + 
+            'mixed spherical and Cartesian function (%s).' %  info['mixed_warning'] + 
             'ORBKIT does not support these basis functions yet. '+
             'Pleas contact us, if you need this feature!')    
     display('='*80)
@@ -380,8 +305,14 @@ def read_molden(filename, all_mo=False, spin=None, i_md=-1, interactive=True,
     for i in range(len(qc.mo_spec))[::-1]:
       if qc.mo_spec[i]['spin'] != spin:
         del qc.mo_spec[i]
+  
+  # Release the coefficients of the molecular orbitals not selected
+  if len(qc.mo_spec) < len(info['mo_coeffs']):
+    mo_coeffs = numpy.array([mo['coeffs'] for mo in qc.mo_spec])
+    for i,mo in enumerate(qc.mo_spec):
+      mo['coeffs'] = mo_coeffs[i]
 
-  if restricted[i_md]:
+  if restricted:
     # Closed shell calculation
     for mo in qc.mo_spec:
       del mo['spin']
@@ -406,7 +337,7 @@ def read_molden(filename, all_mo=False, spin=None, i_md=-1, interactive=True,
   
   if max(numpy.abs(norm-1.)) > 1e-5:
     display('The atomic orbitals are not normalized correctly, renormalizing...\n')
-    if not by_orca[i_md]: 
+    if not info['by_orca']: 
       j = 0
       for i in range(len(qc.ao_spec)):
         qc.ao_spec[i]['coeffs'][:,1] /= numpy.sqrt(norm[j])
@@ -415,14 +346,417 @@ def read_molden(filename, all_mo=False, spin=None, i_md=-1, interactive=True,
     else:
       qc.ao_spec[0]['N'] = 1/numpy.sqrt(norm[:,numpy.newaxis])
   
-    if cartesian_basis[i_md]:
+    if info['cartesian_basis']:
       from orbkit.cy_overlap import ommited_cca_norm
       cca = ommited_cca_norm(get_lxlylz(qc.ao_spec))
       for mo in qc.mo_spec:
         mo['coeffs'] *= cca
   
-  return qc
-  # read_molden 
+  return qc
+  # read_molden 
+
+def get_molden_sections(mm):
+  '''Returns the byte ranges of all `[Molden Format]` sections of a molden file.
+  
+  **Parameters:**
+  
+    mm : mmap.mmap or bytes
+      Contains the content of the molden file.
+  
+  **Returns:**
+  
+    sections : list of tuples, (start, end)
+  '''
+  import re
+  starts = [m.start() for m in re.finditer(br'(?i)\[molden format\]',mm)]
+  return list(zip(starts,starts[1:] + [len(mm)]))
+
+def get_molden_counts(mm,start,end):
+  '''Returns the number of atomic orbitals and of molecular orbitals of a 
+  `[Molden Format]` section without parsing the section.
+  '''
+  import re
+  cartesian_basis = True
+  gto = None
+  for i,j in find_lines(mm,b'[',start,end):
+    lower = mm[i:j].lower()
+    if b'[5d]' in lower or b'[5d7f]' in lower or b'[5d10f]' in lower:
+      cartesian_basis = False
+    if b'[7f]' in lower:
+      cartesian_basis = True
+    if gto is not None and gto[1] is None:
+      gto[1] = i
+    if b'[gto]' in lower:
+      gto = [j,None]
+  nao = 0
+  if gto is not None:
+    text = mm[gto[0]:end if gto[1] is None else gto[1]]
+    for ao_type in re.findall(br'(?m)^\s*([a-zA-Z]+)\s+\d+\s+\S+\s*$',text):
+      for i_ao in ao_type.decode().lower():
+        nao += l_deg(lquant[i_ao],cartesian_basis=cartesian_basis)
+  nmo = 0
+  i = mm.find(b'Ene=',start,end)
+  while i != -1:
+    nmo += 1
+    i = mm.find(b'Ene=',i+4,end)
+  return nao, nmo
+
+def get_molden_index(filename,mm=None):
+  '''Returns the index of a molden file, i.e., the byte ranges of all 
+  `[Molden Format]` sections and the number of atomic and molecular orbitals 
+  of each section. 
+  
+  For files with more than one section, the index is stored in the file 
+  ``<filename>.index.npz`` and is reused as long as size and modification 
+  time of the molden file are unchanged.
+  
+  **Parameters:**
+  
+    filename : str
+      Specifies the filename of the molden file.
+    mm : None or mmap.mmap, optional
+      If not None, contains the content of the molden file.
+  
+  **Returns:**
+  
+    index : dict
+      Contains 'sections' (list of tuples (start, end)), 'nao', and 'nmo'.
+  '''
+  fid = '%s.index.npz' % filename
+  stat = os.stat(filename)
+  try:
+    with numpy.load(fid) as data:
+      if (data['size'] == stat.st_size and data['mtime'] == stat.st_mtime):
+        return {'sections': [tuple(i) for i in data['sections'].tolist()],
+                'nao': data['nao'], 
+                'nmo': data['nmo']}
+  except Exception:
+    # Missing, outdated, or corrupt (e.g. truncated) index
+    pass
+  
+  if mm is None:
+    import mmap
+    with open(filename,'rb') as f:
+      try:
+        mm = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+      except ValueError:
+        mm = b''
+    index = get_molden_index(filename,mm=mm)
+    if not isinstance(mm,bytes):
+      mm.close()
+    return index
+  
+  sections = get_molden_sections(mm)
+  counts = numpy.array([get_molden_counts(mm,*i) for i in sections],
+                       dtype=int).reshape((-1,2))
+  index = {'sections': sections, 'nao': counts[:,0], 'nmo': counts[:,1]}
+  if len(sections) > 1:
+    # The index is written to a temporary file and renamed (cf. cache_save),
+    # i.e., concurrent readers never see an incomplete index
+    tmp = '%s.%d.tmp' % (fid,os.getpid())
+    try:
+      with open(tmp,'wb') as f:
+        numpy.savez(f,size=stat.st_size,mtime=stat.st_mtime,
+                    sections=numpy.array(sections,dtype=numpy.int64),
+                    nao=index['nao'],nmo=index['nmo'])
+      os.rename(tmp,fid)
+    except (IOError,OSError):
+      if os.path.exists(tmp):
+        os.remove(tmp)
+  return index
+
+def _read_molden_i(args):
+  '''Reads a single section of a molden file (cf. :func:`read_molden_multiple`).'''
+  filename,i_md,kwargs = args
+  return read_molden(filename,i_md=i_md,interactive=False,**kwargs)
+
+def read_molden_multiple(filename,i_md=None,numproc=1,**kwargs):
+  '''Reads several `[Molden Format]` sections of a molden file, e.g., of a 
+  geometry scan, using the index of the file (cf. :func:`get_molden_index`).
+  
+  **Parameters:**
+  
+    filename : str
+      Specifies the filename for the input file.
+    i_md : None or list of int, optional
+      Selects the `[Molden Format]` sections. If None, all sections are read.
+    numproc : int, optional
+      Specifies number of subprocesses reading the sections.
+  
+  **Returns:**
+  
+    qc_list : list of QCinfo
+  
+  **Note:**
+  
+    All additional keyword arguments are forwarded to :func:`read_molden`.
+  '''
+  from orbkit import omp_functions
+  index = get_molden_index(filename)
+  if i_md is None:
+    i_md = range(len(index['sections']))
+  x = [(filename,i,kwargs) for i in i_md]
+  if numproc > 1 and len(x) > 1:
+    return list(omp_functions.executor.imap(_read_molden_i,x,
+                                            min(numproc,len(x))))
+  return [_read_molden_i(i) for i in x]
+
+def find_lines(mm,char,start,end):
+  '''Yields the byte ranges (start, end) of all lines in mm[start:end] 
+  containing the byte string CHAR. The line breaks are excluded.
+  '''
+  i = mm.find(char,start,end)
+  while i != -1:
+    i0 = mm.rfind(b'\n',start,i) + 1
+    i1 = mm.find(b'\n',i,end)
+    if i1 == -1: 
+      i1 = end
+    yield max(i0,start),i1
+    i = mm.find(char,i1,end)
+
+def rfind_lines(mm,char,start,end):
+  '''Yields the byte ranges (start, end) of all lines in mm[start:end] 
+  containing the byte string CHAR, starting from the end of mm[start:end]
+  (cf. :func:`find_lines`).
+  '''
+  i = mm.rfind(char,start,end)
+  while i != -1:
+    i0 = max(mm.rfind(b'\n',start,i) + 1,start)
+    i1 = mm.find(b'\n',i,end)
+    if i1 == -1: 
+      i1 = end
+    yield i0,i1
+    i = mm.rfind(char,start,i0)
+
+def read_molden_section(mm,start,end):
+  '''Reads a single `[Molden Format]` section of a molden file.
+  
+  The MO coefficients are parsed block by block with :func:`numpy.fromstring`
+  into a single preallocated array, shape=(NMO,NAO). The coefficients of each
+  MO (``mo_spec[i]['coeffs']``) are views of the rows of this array.
+  
+  **Parameters:**
+  
+    mm : mmap.mmap or bytes
+      Contains the content of the molden file.
+    start, end : int
+      Specifies the byte range of the section (cf. :func:`get_molden_sections`).
+  
+  **Returns:**
+  
+    qc (class QCinfo) with attributes geo_spec, geo_info, ao_spec, mo_spec, etot
+    info : dict
+      Contains information about the section, i.e., 'has_alpha', 'has_beta', 
+      'restricted', 'cartesian_basis', 'mixed_warning', 'by_orca', 'max_l', and 
+      'mo_coeffs'.
+  '''
+  import re
+  qc = QCinfo()
+  info = {'has_alpha': False,
+          'has_beta': False,
+          'restricted': False,
+          'cartesian_basis': True,
+          'mixed_warning': False,
+          'by_orca': False,
+          'max_l': 0}
+  
+  # Find all lines containing keywords, i.e., the beginning of the sub-sections
+  blocks = []
+  for i,j in find_lines(mm,b'[',start,end):
+    line = mm[i:j].decode('latin-1')
+    lower = line.lower()
+    if blocks:
+      blocks[-1][2] = i
+    if '[5d]' in lower or '[5d7f]' in lower:
+      info['cartesian_basis'] = False
+    if '[5d10f]'  in lower:
+      info['mixed_warning'] = '5D, 10F'
+      info['cartesian_basis'] = False
+    if '[7f]'  in lower:
+      info['mixed_warning'] = '6D, 7F'
+      info['cartesian_basis'] = True
+    if '[sto]' in lower:
+      # The orbkit does not support Slater type orbitals 
+      display('orbkit does not work for STOs!\nEXIT\n');
+      raise IOError('Not a valid input file')
+    blocks.append([line,j,end])
+  
+  # Read everything except the MO coefficients
+  gto_text = ''
+  mo_blocks = []
+  for line,i,j in blocks:
+    lower = line.lower()
+    if '[mo]' in lower:
+      mo_blocks.append((i,j))
+      continue
+    text = mm[i:j].decode('latin-1')
+    if 'orca' in lower or 'orca' in text.lower():
+      info['by_orca'] = True
+    for energy in re.findall(r'(?m)^.*_ENERGY=.*$',text):
+      try:
+        qc.etot = float(energy.split()[1])
+      except IndexError:
+        pass
+    if '[atoms]' in lower:
+      # The section containing information about 
+      # the molecular geometry begins 
+      if 'Angs' in line:
+        # The length are given in Angstroem 
+        # and have to be converted to Bohr radii --
+        aa_to_au = 1/0.52917720859
+      else:
+        # The length are given in Bohr radii 
+        aa_to_au = 1.0
+      for thisline in text.splitlines():
+        if '_ENERGY=' in thisline:
+          continue
+        thisline = thisline.split()
+        if thisline != []:
+          qc.geo_info.append(thisline[0:3])
+          qc.geo_spec.append([float(ii)*aa_to_au for ii in thisline[3:]])
+    elif '[gto]' in lower:
+      gto_text = text
+  
+  # Atomic orbital section 
+  basis_count = 0
+  def check_int(i):
+    try:
+      int(i)
+      return True
+    except ValueError:
+      return False
+  bNew = True                  # Indication for start of new AO section
+  for line in gto_text.splitlines():
+    thisline = line.split()
+    if thisline == []:
+      # There is a blank line after every AO 
+      bNew = True
+    elif bNew:
+      # The following AOs are for which atom? 
+      bNew = False
+      at_num = int(thisline[0]) - 1
+      ao_num = 0
+    elif len(thisline) == 3 and check_int(thisline[1]):
+      # AO information section 
+      # Initialize a new dict for this AO 
+      ao_num = 0               # Initialize number of atomic orbiatls 
+      ao_type = thisline[0].lower()    # Which type of atomic orbital do we have
+      pnum = int(thisline[1])  # Number of primatives
+      # Calculate the degeneracy of this AO and increase basis_count 
+      for i_ao in ao_type:
+        # Calculate the degeneracy of this AO and increase basis_count 
+        basis_count += l_deg(lquant[i_ao],
+                             cartesian_basis=info['cartesian_basis'])
+        info['max_l'] = max(info['max_l'],lquant[i_ao])
+        qc.ao_spec.append({'atom': at_num,
+                        'type': i_ao,
+                        'pnum': -pnum if info['by_orca'] else pnum,
+                        'coeffs': numpy.zeros((pnum, 2))
+                        })
+    else:
+      # Append the AO coefficients 
+      coeffs = numpy.array(line.replace('D','e').split(), dtype=numpy.float64)
+      for i_ao in range(len(ao_type)):
+        qc.ao_spec[-len(ao_type)+i_ao]['coeffs'][ao_num,:] = [coeffs[0],
+                                                          coeffs[1+i_ao]]
+      ao_num += 1
+  
+  # Find the MO information lines (containing '=') and the ranges of the 
+  # MO coefficients in between
+  mo_info = []
+  for i,j in mo_blocks:
+    last = None
+    for k0,k1 in find_lines(mm,b'=',i,j):
+      if (last is not None and k0 - last < 1024 and 
+          not mm[last:k0].strip()):
+        # Further information about the same MO
+        mo_info[-1][0].append(mm[k0:k1])
+      else:
+        if mo_info and mo_info[-1][2] is None:
+          mo_info[-1][2] = k0
+        mo_info.append([[mm[k0:k1]],None,None])
+      mo_info[-1][1] = k1
+      last = k1
+    if mo_info and mo_info[-1][2] is None:
+      mo_info[-1][2] = j
+  
+  # Declare synonyms for molden keywords 
+  synonyms = {'Sym': 'sym',
+              'Ene': 'energy',
+              'Occup': 'occ_num',
+              'Spin': 'spin'
+             }
+  MO_keys = synonyms.keys()
+  sym = {}
+  
+  mo_coeffs = numpy.zeros((len(mo_info),basis_count))
+  info['mo_coeffs'] = mo_coeffs
+  for i_mo,(lines,i,j) in enumerate(mo_info):
+    # Create a numpy array for the MO coefficients and 
+    # for backward compability create a simple counter for 'sym'
+    qc.mo_spec.append({'coeffs': mo_coeffs[i_mo],
+                      'sym': '%d.1' % (i_mo+1)})
+    for line in lines:
+      line = line.decode('latin-1')
+      if 'Spin' in line and 'alpha' in line.lower():
+        info['has_alpha'] = True
+      if 'Spin' in line and 'beta' in line.lower():
+        info['has_beta'] = True
+      if 'Occup' in line:
+        info['restricted'] = (info['restricted'] or 
+                              (float(line.split('=')[1]) > 1.+1e-4))
+      # Append information to dict of this MO 
+      line = line.replace('\r','').replace(' ','').replace('\t','')
+      line = line.split('=')
+      if line[0] in MO_keys: 
+        if line[0] == 'Spin':
+          line[1] = line[1].lower()
+        elif line[0] != 'Sym':
+          line[1] = float(line[1])
+        elif not '.' in line[1]:
+          try:
+            a = re.search(r'\d+', line[1]).group()
+            if a == line[1]:
+              line[1] = '%s.1' % a
+            elif line[1].startswith(a):
+              line[1] = line[1].replace(a, '%s.' % a,1)
+            else:
+              raise AttributeError
+          except AttributeError:
+            if line[1] not in sym.keys(): sym[line[1]] = 1
+            else: sym[line[1]] += 1
+            line[1] = '%d.%s' % (sym[line[1]],line[1]) 
+        qc.mo_spec[-1][synonyms[line[0]]] = line[1]
+    
+    # Append the MO coefficients 
+    text = mm[i:j]
+    if b'D' in text:
+      text = text.replace(b'D',b'E')
+    try:
+      with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        data = numpy.fromstring(text,dtype=float,sep=' ')
+      if data.size % 2:
+        raise ValueError
+    except (ValueError,DeprecationWarning):
+      # Parse the coefficients line by line
+      data = []
+      for thisline in text.decode('latin-1').splitlines():
+        thisline = thisline.split()
+        if thisline == []:
+          continue
+        index = int(thisline[0])-1
+        try: 
+          # Try to convert coefficient to float 
+          data.extend([index+1,float(thisline[1])])
+        except (ValueError,IndexError):
+          # If it cannot be converted print error message 
+          display('Error in coefficient %d of MO %s!' % (index, 
+            qc.mo_spec[-1]['sym']) + '\nSetting this coefficient to zero...')
+      data = numpy.array(data,dtype=float)
+    mo_coeffs[i_mo,data[::2].astype(int)-1] = data[1::2]
+  
+  return qc, info
 
 def read_gamess(filename, all_mo=False, spin=None, read_properties=False,
                 **kwargs):
@@ -830,6 +1164,10 @@ def read_gamess(filename, all_mo=False, spin=None, read_properties=False,
 
 def read_gaussian_fchk(filename, all_mo=False, spin=None, **kwargs):
   '''Reads all information desired from a Gaussian FChk file. 
+  
+  The file is memory-mapped and the arrays are located via the ``N=`` counts
+  of their headers (cf. :func:`get_fchk_index`). Only the arrays needed are 
+  parsed, each in a single call (cf. :func:`read_fchk_array`).
 
   **Parameters:**
   
@@ -837,28 +1175,43 @@ def read_gaussian_fchk(filename, all_mo=False, spin=None, **kwargs):
       Specifies the filename for the input file.
     all_mo : bool, optional
       If True, all molecular orbitals are returned.
+    spin : {None, 'alpha', or 'beta'}, optional
+      If not None, returns exclusively 'alpha' or 'beta' molecular orbitals.
   
   **Returns:**
   
     qc (class QCinfo) with attributes geo_spec, geo_info, ao_spec, mo_spec, etot :
         See :ref:`Central Variables` for details.
   '''
+  import mmap
+  with open(filename,'rb') as fid:
+    try:
+      mm = mmap.mmap(fid.fileno(),0,access=mmap.ACCESS_READ)
+    except ValueError:
+      # Empty file
+      mm = b''
+  try:
+    qc = read_fchk_index(mm,get_fchk_index(mm),all_mo=all_mo,spin=spin)
+  finally:
+    if not isinstance(mm,bytes):
+      mm.close()
   
-  fid    = open(filename,'r')   # Open the file
-  flines = fid.readlines()      # Read the WHOLE file into RAM
-  fid.close()                   # Close the file
+  return qc
+  # read_gaussian_fchk 
+
+def read_fchk_index(mm,index,all_mo=False,spin=None):
+  '''Converts the content of a Gaussian FChk file to an instance of QCinfo
+  (cf. :func:`read_gaussian_fchk`).
+  '''
+  def get(key,dtype=float,count=None,default=None):
+    if key not in index:
+      return default
+    return read_fchk_array(mm,index[key],dtype=dtype,count=count)
   
   # Is this an unrestricted calculation?
-  has_beta = False
-  is_6D = False
-  is_10F = False
-  for line in flines:
-    if 'beta mo coefficients' in line.lower():
-      has_beta = True
-    if 'Pure/Cartesian d shells' in line:
-      is_6D = int(line.split()[-1]) == 1
-    if 'Pure/Cartesian f shells' in line:
-      is_10F = int(line.split()[-1]) == 1
+  has_beta = 'Beta MO coefficients' in index
+  is_6D = get('Pure/Cartesian d shells',dtype=int) == 1
+  is_10F = get('Pure/Cartesian f shells',dtype=int) == 1
   
   cartesian_basis = (is_6D and is_10F)
   if ((not is_6D) and is_10F) or (is_6D and (not is_10F)):
@@ -874,252 +1227,91 @@ def read_gaussian_fchk(filename, all_mo=False, spin=None, **kwargs):
       raise IOError('The keyword `spin` is only supported for unrestricted calculations.')
   restricted = (not has_beta)
   
-  sec_flag = None
-  
-  el_num = [0,0]
-  mo_i0 = {'alpha': 0, 'beta': 0}
-  what = 'alpha'
-  index = 0
-  at_num = 0
+  el_num = [get('Number of alpha electrons',dtype=int,default=0),
+            get('Number of beta electrons',dtype=int,default=0)]
+  basis_number = get('Number of basis functions',dtype=int)
   
-  ao_num = 0 
-  ao_sp_coeffs = {}
-  switch = 0
   qc = QCinfo()
-  qc.geo_info = [[],[],[]]
-  if not cartesian_basis:
-    qc.ao_spherical = []
+  if 'Total Energy' in index:
+    qc.etot = get('Total Energy')
   
-  # Go through the file line by line 
-  for il in range(len(flines)):
-    line = flines[il]         # The current line as string
-    thisline = line.split()   # The current line split into segments
+  # Geometry (The tokens are kept as strings, cf. QCinfo.format_geo)
+  qc.geo_info = [[],[],[]]
+  for i,key in [(0,'Atomic numbers'),(2,'Nuclear charges')]:
+    if key in index:
+      qc.geo_info[i] = get(key,dtype=str)
+  qc.geo_info[1] = list(range(1,len(qc.geo_info[0])+1))
+  if 'Current cartesian coordinates' in index:
+    qc.geo_spec = get('Current cartesian coordinates').reshape((-1,3)).tolist()
+  
+  # Atomic orbitals
+  if 'Shell types' in index:
+    ao_type = get('Shell types',dtype=int)
+    ao_pnum = get('Number of primitives per shell',dtype=int)
+    ao_atom = get('Shell to atom map',dtype=int) - 1
+    qc.ao_spec = [{'type': orbit[abs(t)], 'pnum': int(p), 'atom': int(a)}
+                  for t,p,a in zip(ao_type,ao_pnum,ao_atom)]
+    if not cartesian_basis:
+      qc.ao_spherical = get_ao_spherical(qc.ao_spec)
     
-    # Check the file for keywords 
-    if 'Number of alpha electrons' in line:
-      el_num[0] = int(thisline[5]) 
-    elif 'Number of beta electrons' in line:
-      el_num[1] = int(thisline[5])
-    elif 'Number of basis functions' in line:
-      basis_number = int(thisline[5])
-    elif 'Atomic numbers'  in line:
-      sec_flag = 'geo_info'
-      index = 0
-      at_num = int(thisline[-1])
-      count = 0
-      qc.geo_info[1] = list(range(1,at_num+1))
-    elif 'Nuclear charges' in line:
-      sec_flag = 'geo_info'
-      index = 2
-      at_num = int(thisline[-1])
-      count = 0
-    elif 'Total Energy' in line:
-      qc.etot = float(thisline[3])
-    elif 'Current cartesian coordinates' in line:
-      at_num = int(thisline[-1])/3
-      sec_flag = 'geo_pos'
-      qc.geo_spec = []
-      count = 0
-      xyz = []
-    elif 'Shell types' in line:
-      sec_flag = 'ao_info'
-      index = 'type'
-      ao_num = int(thisline[-1])
-      count = 0
-      if qc.ao_spec == []:
-        for ii in range(ao_num):
-          qc.ao_spec.append({})
-    elif 'Number of primitives per shell' in line:
-      sec_flag = 'ao_info'
-      index = 'pnum'
-      ao_num = int(thisline[-1])
-      count = 0
-      if qc.ao_spec == []:
-        for ii in range(ao_num):
-          qc.ao_spec.append({})
-    elif 'Shell to atom map' in line:
-      sec_flag = 'ao_info'
-      index = 'atom'
-      ao_num = int(thisline[-1])
-      count = 0
-      if qc.ao_spec == []:
-        for ii in range(ao_num):
-          qc.ao_spec.append({})
-    elif 'Primitive exponents' in line:
-      sec_flag = 'ao_coeffs'
-      ao_num = int(thisline[-1])
-      count = 0
-      switch = 0
-      index = 0
-      if qc.ao_spec == []:
-        raise IOError('Shell types need to be defined before the AO exponents!')
-      if not 'coeffs' in qc.ao_spec[0].keys():
-        for ii in range(len(qc.ao_spec)):
-          pnum = qc.ao_spec[ii]['pnum']
-          qc.ao_spec[ii]['coeffs'] = numpy.zeros((pnum, 2))
-    elif 'Contraction coefficients' in line:
-      if 'P(S=P)' not in line:
-        sec_flag = 'ao_coeffs'  
-      else:
-        sec_flag = 'ao_sp_coeffs'  
-        ao_sp_coeffs = {0: []}
-      ao_num = int(thisline[-1])
-      count = 0
-      switch = 1
-      index = 0
-      if qc.ao_spec == []:
-        raise IOError('Shell types need to be defined before the AO exponents!')
-      if not 'coeffs' in qc.ao_spec[0].keys():
-        for ii in range(len(qc.ao_spec)):
-          pnum = qc.ao_spec[ii]['pnum']
-          qc.ao_spec[ii]['coeffs'] = numpy.zeros((pnum, 2))
-    elif 'Orbital Energies' in line:
-      sec_flag = 'mo_eorb'
-      mo_num = int(thisline[-1])      
-      mo_i0[thisline[0].lower()] = len(qc.mo_spec)
-      if restricted:
-        if el_num[0] == el_num[1]:
-          i = el_num[0]
-          occ = 2
-        else:
-          i = el_num[0 if 'Alpha' in line else 1]
-          occ = 1
-      else:
-        i = el_num[0 if 'Alpha' in line else 1]
-        occ = 1      
-      for ii in range(mo_num):
-        qc.mo_spec.append({'coeffs': numpy.zeros(basis_number),
-                        'energy': 0.0,
-                        'occ_num': float(occ if ii < i else 0),
-                        'sym': '%i.1' % (ii+1),
-                        'spin':thisline[0].lower()
-                        })
-    elif 'MO coefficients' in line:
-      sec_flag = 'mo_coeffs'
-      count = 0
-      index = 0
-      mo_num = int(thisline[-1])
-      what = thisline[0].lower()
-    else:
-      # Check if we are in a specific section 
-      if sec_flag == 'geo_info':
-        for ii in thisline:
-          qc.geo_info[index].append(ii)
-          count += 1
-          if count == at_num:
-            sec_flag = None
-      elif sec_flag == 'geo_pos':
-        for ii in thisline:
-          xyz.append(float(ii))
-          if len(xyz) == 3:
-            qc.geo_spec.append(xyz)
-            xyz = []
-            count += 1
-            if count == at_num:
-              sec_flag = None
-      elif sec_flag == 'ao_info':
-        for ii in thisline:
-          ii = int(ii)
-          if index is 'type':         
-            ii = orbit[abs(ii)]
-            l = lquant[ii]
-            if not cartesian_basis:
-              for m in (range(0,l+1) if l != 1 else [1,0]):
-                qc.ao_spherical.append([count,(l,m)])
-                if m != 0:
-                  qc.ao_spherical.append([count,(l,-m)])
-          elif index is 'atom':
-            ii -= 1
-          qc.ao_spec[count][index] = ii
-          count += 1
-          if count == ao_num:
-            sec_flag = None
-      elif sec_flag == 'ao_coeffs':
-        for ii in thisline:
-          qc.ao_spec[index]['coeffs'][count,switch] = float(ii)
-          count += 1
-          ao_num -= 1
-          if count == qc.ao_spec[index]['pnum']:
-            index += 1
-            count = 0
-        if not ao_num:
-          sec_flag = None
-      elif sec_flag == 'ao_sp_coeffs':
-        for ii in thisline:
-          ao_sp_coeffs[index].append(float(ii))
-          count += 1
-          ao_num -= 1
-          if count == qc.ao_spec[index]['pnum']:
-            index += 1
-            ao_sp_coeffs[index] = []
-            count = 0
-        if not ao_num:
-          sec_flag = None
-      elif sec_flag == 'mo_eorb':
-        for ii in thisline:
-          qc.mo_spec[count]['energy'] = float(ii)
-          count += 1
-          if index != 0 and not count % basis_number:
-            sec_flag = None
-      elif sec_flag == 'mo_coeffs':
-        for ii in thisline:    
-          qc.mo_spec[mo_i0[what]+index]['coeffs'][count] = float(ii)
-          count += 1
-          if count == basis_number:
-            count = 0
-            index += 1
-          if index != 0 and not index % basis_number:
-            sec_flag = None
+    if 'Primitive exponents' in index or 'Contraction coefficients' in index:
+      coeffs = numpy.zeros((ao_pnum.sum(),2))
+      for i,key in enumerate(['Primitive exponents',
+                              'Contraction coefficients']):
+        if key in index:
+          coeffs[:,i] = get(key)
+      for ao,c in zip(qc.ao_spec,numpy.split(coeffs,ao_pnum.cumsum()[:-1])):
+        ao['coeffs'] = c
+  elif 'Primitive exponents' in index or 'Contraction coefficients' in index:
+    raise IOError('Shell types need to be defined before the AO exponents!')
   
   # Look for SP atomic orbitals
-  if ao_sp_coeffs:
+  if 'P(S=P) Contraction coefficients' in index:
+    ao_sp_coeffs = numpy.split(get('P(S=P) Contraction coefficients'),
+                               ao_pnum.cumsum()[:-1])
     ao_new = []
-    ao_spherical_new = []
-    count = 0
     for i,ao in enumerate(qc.ao_spec):
       if ao['type'] == 'p' and sum(numpy.abs(ao_sp_coeffs[i])) > 0:
         ao_new.append(copy.deepcopy(ao))
         ao_new[-1]['type'] = 's'
         ao_new.append(ao)
         ao_new[-1]['type'] = 'p'
-        ao_new[-1]['coeffs'][:,1] = numpy.array(ao_sp_coeffs[i])    
+        ao_new[-1]['coeffs'][:,1] = ao_sp_coeffs[i]
       else:
         ao_new.append(ao)
     
     if not cartesian_basis:
-      ao_spherical_new = [] 
-      count = 0
-      for i,ao in enumerate(qc.ao_spec):
-        if ao['type'] == 'p' and sum(numpy.abs(ao_sp_coeffs[i])) > 0: 
-          ao_spherical_new.append([count,(0,0)])
-          count += 1 
-          for m in (1, -1, 0):
-            ao_spherical_new.append([count,(1,m)])
-          count += 1 
-        else:
-          l = lquant[ao['type']]
-          for m in (range(0,l+1) if l != 1 else [1,0]):
-            ao_spherical_new.append([count,(l,m)])
-            if m != 0:
-              ao_spherical_new.append([count,(l,-m)])
-          count += 1
-      assert count == len(ao_new)
-      qc.ao_spherical = ao_spherical_new
+      qc.ao_spherical = get_ao_spherical(ao_new)
       
     qc.ao_spec = ao_new   
-    
-    
-  # Are all MOs requested for the calculation? 
-  if not all_mo:
-    for i in range(len(qc.mo_spec))[::-1]:
-      if qc.mo_spec[i]['occ_num'] < 0.0000001:
-        del qc.mo_spec[i]
   
-  # Only molecular orbitals of one spin requested?
-  if spin is not None:
-    for i in range(len(qc.mo_spec))[::-1]:
-      if qc.mo_spec[i]['spin'] != spin:
-        del qc.mo_spec[i]
+  # Molecular orbitals
+  for what in ['alpha','beta']:
+    key = '%s MO coefficients' % what.title()
+    if key not in index or (spin is not None and spin != what):
+      continue
+    if restricted:
+      if el_num[0] == el_num[1]:
+        i = el_num[0]
+        occ = 2
+      else:
+        i = el_num[0 if what == 'alpha' else 1]
+        occ = 1
+    else:
+      i = el_num[0 if what == 'alpha' else 1]
+      occ = 1
+    mo_num = index['%s Orbital Energies' % what.title()][1]
+    # Only the coefficients of the occupied orbitals are parsed, if requested
+    n_mo = mo_num if all_mo else min(i,mo_num)
+    energy = get('%s Orbital Energies' % what.title(),count=n_mo)
+    mo_coeffs = get(key,count=n_mo*basis_number).reshape((n_mo,basis_number))
+    for ii in range(n_mo):
+      qc.mo_spec.append({'coeffs': mo_coeffs[ii],
+                         'energy': float(energy[ii]),
+                         'occ_num': float(occ if ii < i else 0),
+                         'sym': '%i.1' % (ii+1),
+                         'spin': what
+                         })
   
   if restricted:
     # Closed shell calculation
@@ -1143,12 +1335,124 @@ def read_gaussian_fchk(filename, all_mo=False, spin=None, **kwargs):
   qc.format_geo()
   
   return qc
-  # read_gaussian_fchk 
+
+def get_fchk_index(mm):
+  '''Returns the index of a Gaussian FChk file, i.e., the type, the number of
+  elements, and the byte range of each entry. 
+  
+  The data block of an array is skipped using the ``N=`` count of its header
+  and the fixed number of values per line.
+  
+  **Parameters:**
+  
+    mm : mmap.mmap or bytes
+      Contains the content of the FChk file.
+  
+  **Returns:**
+  
+    index : dict
+      Contains for each entry a tuple (type, count, start, end). For scalars,
+      count is None and mm[start:end] holds the value.
+  '''
+  import re
+  header = re.compile(br'(\S.*?)\s+([IRCL])\s+(N=)?\s*(\S+)\s*$')
+  next_header = re.compile(br'\n(?=[^ \r\n])')
+  per_line = {b'I': 6, b'R': 5, b'C': 5, b'L': 72}
+  
+  index = {}
+  size = len(mm)
+  # The first two lines contain the title and the route
+  pos = mm.find(b'\n',mm.find(b'\n') + 1) + 1
+  while 0 < pos < size:
+    eol = mm.find(b'\n',pos)
+    if eol == -1:
+      eol = size
+    line = mm[pos:eol]
+    match = header.match(line)
+    pos = eol + 1
+    if match is None:
+      continue
+    name,typ,is_array,value = match.groups()
+    name = name.decode('latin-1')
+    typ = typ.decode('latin-1')
+    if not is_array:
+      start = pos - len(line) + match.start(4) - 1
+      index[name] = (typ, None, start, start + len(value))
+      continue
+    count = int(value)
+    start = min(pos,size)
+    if count == 0:
+      index[name] = (typ, count, start, start)
+      continue
+    # Jump to the last line of the data block
+    end = -1
+    width = mm.find(b'\n',start) + 1 - start
+    if width > 0:
+      guess = start + (-(-count // per_line[typ.encode()]) - 1) * width
+      if guess < size and mm[guess-1:guess] == b'\n':
+        end = mm.find(b'\n',guess)
+        end = size if end == -1 else end + 1
+        if end < size and mm[end:end+1] == b' ':
+          end = -1
+    if end == -1:
+      # Irregular layout: search the next header
+      match = next_header.search(mm,start)
+      end = size if match is None else match.end()
+    index[name] = (typ, count, start, end)
+    pos = end
+  
+  return index
+
+def read_fchk_array(mm,entry,dtype=float,count=None):
+  '''Parses an entry of a Gaussian FChk file (cf. :func:`get_fchk_index`). 
+  
+  **Parameters:**
+  
+    mm : mmap.mmap or bytes
+      Contains the content of the FChk file.
+    entry : tuple
+      Contains (type, count, start, end) of the entry.
+    dtype : {float, int, str}
+      Specifies the data type of the values.
+    count : None or int, optional
+      If not None, only the first COUNT values of an array are parsed.
+  
+  **Returns:**
+  
+    data : scalar or numpy.ndarray
+  '''
+  typ,n,start,end = entry
+  text = mm[start:end]
+  if n is None:
+    return dtype(text.decode('latin-1'))
+  n = n if count is None else min(count,n)
+  if dtype is str:
+    return text.decode('latin-1').split()[:n]
+  try:
+    with warnings.catch_warnings():
+      warnings.simplefilter('error')
+      data = numpy.fromstring(text,dtype=dtype,count=n,sep=' ')
+  except (ValueError,DeprecationWarning):
+    data = numpy.zeros(0)
+  if len(data) != n:
+    # Neighbouring values are not separated: Use the fixed field widths
+    width = 12 if typ == 'I' else 16
+    data = []
+    for line in text.decode('latin-1').splitlines():
+      line = line.rstrip()
+      data.extend(dtype(line[i:i+width]) for i in range(0,len(line),width))
+    data = numpy.array(data[:n],dtype=dtype)
+  return data
 
 def read_gaussian_log(filename,all_mo=False,spin=None,orientation='standard',
                       i_link=-1,i_geo=-1,i_ao=-1,i_mo=-1,interactive=True,
                       **kwargs):
   '''Reads all information desired from a Gaussian .log file.
+  
+  The file is memory-mapped and the sections are located by a byte search. 
+  Only the selected geometry, atomic orbital, and molecular orbital sections 
+  are parsed. If the user is not asked, the default selections (negative 
+  indices) are searched from the end of the file.
 
   **Parameters:**
   
@@ -1179,16 +1483,31 @@ def read_gaussian_log(filename,all_mo=False,spin=None,orientation='standard',
 .. [#first] Attention: The MOs in the output are only valid for the standard orientation!
 
   '''
+  import mmap
+  with open(filename,'rb') as fid:
+    try:
+      mm = mmap.mmap(fid.fileno(),0,access=mmap.ACCESS_READ)
+    except ValueError:
+      # Empty file
+      mm = b''
+  try:
+    qc = read_gaussian_log_sections(mm,all_mo=all_mo,spin=spin,
+                                    orientation=orientation,
+                                    i_link=i_link,i_geo=i_geo,i_ao=i_ao,
+                                    i_mo=i_mo,interactive=interactive)
+  finally:
+    if not isinstance(mm,bytes):
+      mm.close()
   
-  fid    = open(filename,'r')      # Open the file
-  flines = fid.readlines()         # Read the WHOLE file into RAM
-  fid.close()                      # Close the file
-  
-  
-  # Search the file the specific sections
-  count = {'link': 0, 'geometry': 0, 'geometry_input': 0, 'atomic orbitals': 0, 
-           'molecular orbitals': [], 'state': []}
+  return qc
+  # read_gaussian_log 
 
+def read_gaussian_log_sections(mm,all_mo=False,spin=None,orientation='standard',
+                               i_link=-1,i_geo=-1,i_ao=-1,i_mo=-1,
+                               interactive=True):
+  '''Parses the selected sections of the content of a Gaussian .log file
+  (cf. :func:`read_gaussian_log`).
+  '''
   def check_sel(count,i,interactive=False,default=-1):
     if count == 0:
       raise IndexError
@@ -1208,95 +1527,120 @@ def read_gaussian_log(filename,all_mo=False,spin=None,orientation='standard',
               ('last element.' if (i == count-1) else 'element %d.' % i))
     return i
   
-  # Go through the file line by line 
-  for il in range(len(flines)):
-      line = flines[il]            # The current line as string  
-      # Check the file for keywords 
-      if ' Entering Link 1' in line:
-        count['link'] += 1
+  def locate(char,start,end,i,accept=None):
+    '''Returns the line ranges of the occurrences of CHAR in mm[start:end]
+    and whether these are all occurrences. For a default selection, only the 
+    last -I occurrences are searched.'''
+    accept = accept or (lambda line: True)
+    if i < 0 and not interactive:
+      lines = []
+      for line in rfind_lines(mm,char,start,end):
+        if accept(mm[line[0]:line[1]]):
+          lines.insert(0,line)
+          if len(lines) == -i:
+            return lines, False
+      return lines, True
+    return [line for line in find_lines(mm,char,start,end) 
+            if accept(mm[line[0]:line[1]])], True
+  
+  def select(lines,complete,i):
+    if not complete:
+      display('\tSelecting the %s' %
+              ('last element.' if i == -1 else 'element %d from the end.' % -i))
+      return lines[0]
+    return lines[check_sel(len(lines),i,interactive=interactive)]
   
+  # Search the selected linked GAUSSIAN file
+  links,complete = locate(b' Entering Link 1',0,len(mm),i_link)
   try:
-    display('\tFound %d linked GAUSSIAN files.' % count['link'])
-    i_link = check_sel(count['link'],i_link,interactive=interactive)
+    if complete:
+      display('\tFound %d linked GAUSSIAN files.' % len(links))
+    l0 = select(links,complete,i_link)[0]
   except IndexError:
     raise IOError('Found no `Entering Link 1` keyword!')
+  l1 = mm.find(b' Entering Link 1',mm.find(b'\n',l0,len(mm)))
+  l1 = len(mm) if l1 == -1 else mm.rfind(b'\n',l0,l1) + 1
   
-  cartesian_basis = True
-  c_link = 0
-  # Go through the file line by line 
-  for il in range(len(flines)):
-      line = flines[il]            # The current line as string
-      thisline = line.split()      # The current line split into segments
-      
-      
-      # Check the file for keywords 
-      if ' Entering Link 1' in line:
-        c_link += 1
-      if i_link == (c_link-1):
-        if ' orientation:' in line:
-          if '%s orientation:' % orientation in line.lower():
-            count['geometry'] += 1
-          if 'input orientation:' in line.lower():
-            count['geometry_input'] += 1
-        elif 'Standard basis:' in line or 'General basis read from cards:' in line:
-          # Check if a cartesian basis has been applied
-          if '(5D, 7F)' in line:
-            cartesian_basis = False
-          elif '(6D, 10F)' not in line:
-            raise IOError('Please apply a Spherical Harmonics (5D, 7F) or '+
-                          'a Cartesian Gaussian Basis Set (6D, 10F)!')
-        elif 'AO basis set' in line:
-          count['atomic orbitals'] += 1
-        elif 'The electronic state is ' in line:
-          count['state'].append(thisline[-1][:-1])
-        elif 'Orbital Coefficients:' in line:
-          mo_type = thisline[0]
-          if mo_type != 'Beta':
-            count['molecular orbitals'].append(mo_type)
-          else:
-            count['molecular orbitals'][-1] = 'Alpha&Beta'
- 
   display('\nContent of the GAUSSIAN .log file:')
-  display('\tFound %d geometry section(s). (%s orientation)' % 
-          (count['geometry'], orientation))
-  try:
-    i_geo = check_sel(count['geometry'],i_geo,interactive=interactive)
-  except IndexError:
-    count['geometry'] = count['geometry_input']
-    orientation = 'input'
-    display('\Looking for "Input orientation": \n' + 
-            '\tFound %d geometry section(s). (%s orientation)' % 
-            (count['geometry'], orientation))
+  
+  # Search the selected geometry section
+  geo = None
+  for o in [orientation] + (['input'] if orientation != 'input' else []):
+    lines,complete = locate(b'orientation:',l0,l1,i_geo,
+                            accept=lambda line: ('%s orientation:' % o).encode() 
+                                                in line.lower())
+    if o != orientation:
+      orientation = o
+      display('\Looking for "Input orientation": \n')
+    if complete:
+      display('\tFound %d geometry section(s). (%s orientation)' % 
+              (len(lines), orientation))
     try:
-      i_geo = check_sel(count['geometry'],i_geo,interactive=interactive)
+      geo = select(lines,complete,i_geo)
+      break
     except IndexError:
-      raise IOError('Found no geometry section!'+
-                    ' Are you sure this is a GAUSSIAN .log file?')
-    
+      pass
+  if geo is None:
+    raise IOError('Found no geometry section!'+
+                  ' Are you sure this is a GAUSSIAN .log file?')
   
+  # Search the selected atomic orbitals section
+  lines,complete = locate(b'AO basis set',l0,l1,i_ao)
+  # Check if a cartesian basis has been applied
+  cartesian_basis = True
+  basis = (-1,-1)
+  for char in [b'Standard basis:',b'General basis read from cards:']:
+    basis = max(basis,next(rfind_lines(mm,char,l0,lines[-1][0] if lines else l1),
+                           (-1,-1)))
+  if basis[0] != -1:
+    line = mm[basis[0]:basis[1]].decode('latin-1')
+    if '(5D, 7F)' in line:
+      cartesian_basis = False
+    elif '(6D, 10F)' not in line:
+      raise IOError('Please apply a Spherical Harmonics (5D, 7F) or '+
+                    'a Cartesian Gaussian Basis Set (6D, 10F)!')
   try:
-    display('\tFound %d atomic orbitals section(s) %s.' % 
-            (count['atomic orbitals'],
-             '(6D, 10F)' if cartesian_basis else '(5D, 7F)'))
-    i_ao = check_sel(count['atomic orbitals'],i_ao,interactive=interactive)
+    if complete:
+      display('\tFound %d atomic orbitals section(s) %s.' % 
+              (len(lines),'(6D, 10F)' if cartesian_basis else '(5D, 7F)'))
+    ao = select(lines,complete,i_ao)
   except IndexError:
     raise IOError('Write GFINPUT in your GAUSSIAN route section to print' + 
                   ' the basis set information!')
   
-  try:
+  # Search the selected molecular orbitals section
+  lines,complete = locate(b'Orbital Coefficients:',l0,l1,i_mo,
+                          accept=lambda line: line.split()[0] != b'Beta')
+  if complete:
+    # List the molecular orbital sections and the electronic states
+    mo_types = []
+    for i,j in find_lines(mm,b'Orbital Coefficients:',l0,l1):
+      mo_type = mm[i:j].decode('latin-1').split()[0]
+      if mo_type != 'Beta':
+        mo_types.append(mo_type)
+      else:
+        mo_types[-1] = 'Alpha&Beta'
+    state = [mm[i:j].decode('latin-1').split()[-1][:-1] for i,j in 
+             find_lines(mm,b'The electronic state is ',l0,l1)]
     display('\tFound the following %d molecular orbitals section(s):' % 
-            len(count['molecular orbitals']))
+            len(mo_types))
+    for i,j in enumerate(mo_types):
+      string = '\t\tSection %d: %s Orbitals'% (i,j)
+      try:
+        string += ' (electronic state: %s)' % state[i]
+      except IndexError:
+        pass
+      display(string)
+  try:
+    mo = select(lines,complete,i_mo)
   except IndexError:
     raise IOError('Write IOP(6/7=3) in your GAUSSIAN route section to print\n' + 
                   ' all molecular orbitals!')
-  for i,j in enumerate(count['molecular orbitals']):
-    string = '\t\tSection %d: %s Orbitals'% (i,j)
-    try:
-      string += ' (electronic state: %s)' % count['state'][i]
-    except IndexError:
-      pass
-    display(string)
-  i_mo = check_sel(len(count['molecular orbitals']),i_mo,interactive=interactive)
+  mo_type = mm[mo[0]:mo[1]].decode('latin-1').split()[0]
+  following = next(find_lines(mm,b'Orbital Coefficients:',mo[1],l1),None)
+  if (following is not None and 
+      mm[following[0]:following[1]].split()[0] == b'Beta'):
+    mo_type = 'Alpha&Beta'
   
   if spin is not None:
     if spin != 'alpha' and spin != 'beta':
@@ -1305,198 +1649,160 @@ def read_gaussian_log(filename,all_mo=False,spin=None,orientation='standard',
       display('Reading only molecular orbitals of spin %s.' % spin)
   
   aa_to_au = 1/0.52917720859  # conversion factor for Angstroem to bohr radii
-
-  # Set a counter for the AOs 
-  basis_count = 0
   
-  # Initialize some variables 
-  sec_flag = None
-  skip = 0
-  c_link = 0
-  c_geo = 0
-  c_ao = 0
-  c_mo = 0
-  c_sao = 0
-  old_ao = -1
-  orb_sym = []
   qc = QCinfo()
-  index = []
   
-  # Go through the file line by line 
-  for il in range(len(flines)):
-    line = flines[il]              # The current line as string
-    thisline = line.split()        # The current line split into segments
-    
-    # Check the file for keywords 
-    if ' Entering Link 1' in line:
-      c_link += 1
-    if i_link == (c_link-1):
-      if '%s orientation:' % orientation in line.lower():
-        # The section containing information about 
-        # the molecular geometry begins 
-        if i_geo == c_geo:
-          qc.geo_info = []
-          qc.geo_spec = []
-          sec_flag = 'geo_info'
-        c_geo += 1
-        skip = 4
-      elif 'Standard basis:' in line or 'General basis read from cards:' in line:
-        # Check if a cartesian basis has been applied
-        if '(5D, 7F)' in line:
-          cartesian_basis = False
-        elif '(6D, 10F)' not in line:
-          raise IOError('Please apply a Spherical Harmonics (5D, 7F) or '+
-                        'a Cartesian Gaussian Basis Sets (6D, 10F)!')
-      elif 'AO basis set' in line:
-        # The section containing information about 
-        # the atomic orbitals begins
-        if i_ao == c_ao:
-          qc.ao_spec = []
-          if not cartesian_basis:
-            qc.ao_spherical = []
-          sec_flag = 'ao_info'
-        c_ao += 1
-        basis_count = 0
-        bNew = True                  # Indication for start of new AO section
-      elif 'Orbital symmetries:' in line:
-          sec_flag = 'mo_sym'
-          add = ''
-          orb_sym = []
-      elif 'Orbital Coefficients:' in line:
-        # The section containing information about 
-        # the molecular orbitals begins 
-        if (i_mo == c_mo):
-          sec_flag = 'mo_info'
-          mo_type = count['molecular orbitals'][i_mo]
-          qc.mo_spec = []
-          offset = 0
-          add = ''
-          orb_spin = []
-          if orb_sym == []:
-            if 'Alpha' in mo_type:
-              add = '_a'
-              orb_spin = ['alpha'] * basis_count
-            orb_sym = ['A1'+add] * basis_count
-            if 'Beta' in mo_type:
-              add = '_b'
-              orb_spin += ['beta'] * basis_count
-              orb_sym += ['A1'+add] * basis_count
-          for i in range(len(orb_sym)):
-            # for numpy version < 1.6 
-            c = ((numpy.array(orb_sym[:i+1]) == orb_sym[i]) != 0).sum()
-            # for numpy version >= 1.6 this could be used:
-            #c = numpy.count_nonzero(numpy.array(orb_sym[:i+1]) == orb_sym[i])
-            qc.mo_spec.append({'coeffs': numpy.zeros(basis_count),
-                            'energy': 0.,
-                            'sym': '%d.%s' % (c,orb_sym[i])})
-            if orb_spin != []:
-              qc.mo_spec[-1]['spin'] = orb_spin[i]
-        if mo_type != 'Beta':
-          c_mo += 1
-        bNew = True                  # Indication for start of new MO section
-      elif 'E(' in line:
-        qc.etot = float(line.split('=')[1].split()[0])
+  # The total energy is taken from the last line containing `E(`
+  for i,j in rfind_lines(mm,b'E(',l0,l1):
+    qc.etot = float(mm[i:j].decode('latin-1').split('=')[1].split()[0])
+    break
+  
+  # The section containing information about the molecular geometry 
+  qc.geo_info = []
+  qc.geo_spec = []
+  for il,line in enumerate(iter_lines(mm,geo[1]+1,l1)):
+    if il < 4:
+      continue
+    if '-----------' in line:
+      break
+    thisline = line.split()
+    qc.geo_info.append([thisline[1],thisline[0],thisline[1]])
+    qc.geo_spec.append([aa_to_au*float(ij) for ij in thisline[3:]])
+  
+  # The section containing information about the atomic orbitals
+  qc.ao_spec = []
+  if not cartesian_basis:
+    qc.ao_spherical = []
+  basis_count = 0
+  bNew = True                        # Indication for start of new AO section
+  stars = False
+  for line in iter_lines(mm,ao[1]+1,l1):
+    thisline = line.split()
+    if stars and thisline == []:
+      # If there is an additional blank line, the AO section is complete
+      break
+    stars = False
+    if ' ****' in line: 
+      # There is a line with stars after every AO 
+      bNew = True
+      stars = True
+    elif bNew:
+      # The following AOs are for which atom? 
+      bNew = False
+      at_num = int(thisline[0]) - 1
+      ao_num = 0
+    elif len(thisline) == 4:
+      # AO information section 
+      # Initialize a new dict for this AO 
+      ao_num = 0               # Initialize number of atomic orbiatls 
+      ao_type = thisline[0].lower()   # Type of atomic orbital            
+      pnum = int(thisline[1])  # Number of primatives
+      for i_ao in ao_type:
+        # Calculate the degeneracy of this AO and increase basis_count 
+        basis_count += l_deg(lquant[i_ao],cartesian_basis=cartesian_basis)
+        qc.ao_spec.append({'atom': at_num,
+                        'type': i_ao,
+                        'pnum': pnum,
+                        'coeffs': numpy.zeros((pnum, 2))
+                        })
+    else:
+      # Append the AO coefficients 
+      coeffs = numpy.array(line.replace('D','e').split(), dtype=numpy.float64)
+      for i_ao in range(len(ao_type)):
+        qc.ao_spec[-len(ao_type)+i_ao]['coeffs'][ao_num,:] = [coeffs[0],
+                                                          coeffs[1+i_ao]]
+      ao_num += 1
+  
+  # The section containing the symmetries of the molecular orbitals 
+  orb_sym = []
+  for i,j in rfind_lines(mm,b'Orbital symmetries:',l0,mo[0]):
+    add = ''
+    for line in iter_lines(mm,j+1,mo[0]):
+      if 'electronic state' in line:
+        break
+      info = line[18:].replace('(','').replace(')','').split()
+      if 'Alpha' in line:
+        add = '_a'
+      elif 'Beta' in line:
+        add = '_b'
+      for sym in info:
+        orb_sym.append(sym + add)
+    break
+  
+  # The section containing information about the molecular orbitals 
+  add = ''
+  orb_spin = []
+  if orb_sym == []:
+    if 'Alpha' in mo_type:
+      add = '_a'
+      orb_spin = ['alpha'] * basis_count
+    orb_sym = ['A1'+add] * basis_count
+    if 'Beta' in mo_type:
+      add = '_b'
+      orb_spin += ['beta'] * basis_count
+      orb_sym += ['A1'+add] * basis_count
+  c = {}
+  for i in range(len(orb_sym)):
+    c[orb_sym[i]] = c.get(orb_sym[i],0) + 1
+    qc.mo_spec.append({'coeffs': numpy.zeros(basis_count),
+                    'energy': 0.,
+                    'sym': '%d.%s' % (c[orb_sym[i]],orb_sym[i])})
+    if orb_spin != []:
+      qc.mo_spec[-1]['spin'] = orb_spin[i]
+  
+  offset = 0
+  index = []
+  c_sao = 0
+  old_ao = -1
+  bNew = True                        # Indication for start of new MO section
+  for line in iter_lines(mm,mo[1]+1,l1):
+    if 'Orbital Coefficients:' in line:
+      # The beta molecular orbitals begin
+      bNew = True
+      continue
+    info = line[:21].split()          
+    if info == []:
+      coeffs = line[21:].split()
+      if bNew:
+        index = [offset+i for i in range(len(coeffs))]
+        bNew = False
       else:
-        # Check if we are in a specific section 
-        if sec_flag == 'geo_info':
-          if not skip:
-            qc.geo_info.append([thisline[1],thisline[0],thisline[1]])
-            qc.geo_spec.append([aa_to_au*float(ij) for ij in thisline[3:]])
-            if '-----------' in flines[il+1]:
-              sec_flag = None
-          else:
-            skip -= 1
-        if sec_flag == 'ao_info':
-          # Atomic orbital section 
-          if ' ****' in line: 
-            # There is a line with stars after every AO 
-            bNew = True
-            # If there is an additional blank line, the AO section is complete
-            if flines[il+1].split() == []:
-              sec_flag = None
-          elif bNew:
-            # The following AOs are for which atom? 
-            bNew = False
-            at_num = int(thisline[0]) - 1
-            ao_num = 0
-          elif len(thisline) == 4:
-            # AO information section 
-            # Initialize a new dict for this AO 
-            ao_num = 0               # Initialize number of atomic orbiatls 
-            ao_type = thisline[0].lower()   # Type of atomic orbital            
-            pnum = int(thisline[1])  # Number of primatives
-            for i_ao in ao_type:
-              # Calculate the degeneracy of this AO and increase basis_count 
-              basis_count += l_deg(lquant[i_ao],cartesian_basis=cartesian_basis)
-              qc.ao_spec.append({'atom': at_num,
-                              'type': i_ao,
-                              'pnum': pnum,
-                              'coeffs': numpy.zeros((pnum, 2))
-                              })
-          else:
-            # Append the AO coefficients 
-            coeffs = numpy.array(line.replace('D','e').split(), dtype=numpy.float64)
-            for i_ao in range(len(ao_type)):
-              qc.ao_spec[-len(ao_type)+i_ao]['coeffs'][ao_num,:] = [coeffs[0],
-                                                                coeffs[1+i_ao]]
-            ao_num += 1
-        if sec_flag == 'mo_sym':
-          if 'electronic state' in line:
-            sec_flag = None
-          else:
-            info = line[18:].replace('(','').replace(')','').split()
-            if 'Alpha' in line:
-              add = '_a'
-            elif 'Beta' in line:
-              add = '_b'
-            for i in info:
-              orb_sym.append(i + add)   
-        if sec_flag == 'mo_info':
-          # Molecular orbital section 
-          info = line[:21].split()          
-          if info == []:
-            coeffs = line[21:].split()
-            if bNew:
-              index = [offset+i for i in range(len(coeffs))]
-              bNew = False
-            else:
-              for i,j in enumerate(index):
-                qc.mo_spec[j]['occ_num'] = int('O' in coeffs[i])
-                if mo_type not in 'Alpha&Beta':
-                  qc.mo_spec[j]['occ_num'] *= 2
-          elif 'Eigenvalues' in info:
-            coeffs = line[21:].replace('-',' -').split()
-            if mo_type == 'Natural':
-              key = 'occ_num'
-            else:
-              key = 'energy'
-            for i,j in enumerate(index):
-              qc.mo_spec[j][key] = float(coeffs[i])
-          else:
-            coeffs = line[21:].replace('-',' -').split()
-            if not cartesian_basis and offset == 0:
-              if old_ao != line[:14].split()[-1] or len(line[:14].split()) == 4:
-                old_ao = line[:14].split()[-1]
-                c_sao += 1
-              i = c_sao-1
-              l = lquant[line[13].lower()] 
-              m = line[14:21].replace(' ', '').lower()
-              p = 'yzx'.find(m) if len(m) == 1 else -1
-              if p != -1:
-                m = p - 1
-              elif m == '':
-                m = 0
-              else:
-                m = int(m)
-              qc.ao_spherical.append([i,(l,m)])
-            for i,j in enumerate(index):
-              qc.mo_spec[j]['coeffs'][int(info[0])-1] = float(coeffs[i])
-            if int(info[0]) == basis_count:
-              bNew = True
-              offset = index[-1]+1
-              if index[-1]+1 == len(orb_sym):
-                sec_flag = None
-                orb_sym = []
+        for i,j in enumerate(index):
+          qc.mo_spec[j]['occ_num'] = int('O' in coeffs[i])
+          if mo_type not in 'Alpha&Beta':
+            qc.mo_spec[j]['occ_num'] *= 2
+    elif 'Eigenvalues' in info:
+      coeffs = line[21:].replace('-',' -').split()
+      if mo_type == 'Natural':
+        key = 'occ_num'
+      else:
+        key = 'energy'
+      for i,j in enumerate(index):
+        qc.mo_spec[j][key] = float(coeffs[i])
+    else:
+      coeffs = line[21:].replace('-',' -').split()
+      if not cartesian_basis and offset == 0:
+        if old_ao != line[:14].split()[-1] or len(line[:14].split()) == 4:
+          old_ao = line[:14].split()[-1]
+          c_sao += 1
+        i = c_sao-1
+        l = lquant[line[13].lower()] 
+        m = line[14:21].replace(' ', '').lower()
+        p = 'yzx'.find(m) if len(m) == 1 else -1
+        if p != -1:
+          m = p - 1
+        elif m == '':
+          m = 0
+        else:
+          m = int(m)
+        qc.ao_spherical.append([i,(l,m)])
+      for i,j in enumerate(index):
+        qc.mo_spec[j]['coeffs'][int(info[0])-1] = float(coeffs[i])
+      if int(info[0]) == basis_count:
+        bNew = True
+        offset = index[-1]+1
+        if index[-1]+1 == len(orb_sym):
+          break
   
   # Are all MOs requested for the calculation? 
   if not all_mo:
@@ -1516,7 +1822,15 @@ def read_gaussian_log(filename,all_mo=False,spin=None,orientation='standard',
   # Convert geo_info and geo_spec to numpy.ndarrays
   qc.format_geo()
   return qc
-  # read_gaussian_log 
+
+def iter_lines(mm,start,end):
+  '''Yields the lines of mm[start:end] as strings.
+  '''
+  while start < end:
+    i = mm.find(b'\n',start,end)
+    i = end if i == -1 else i + 1
+    yield mm[start:i].decode('latin-1')
+    start = i
 
 
 def spin_check(spin,restricted,has_alpha,has_beta):
@@ -2273,6 +2587,227 @@ def convert_cclib(ccData, all_mo=False, spin=None):
 
   return qc
 
+def read_cube(filename, set_grid=True, mmap=False):
+  '''Reads a Gaussian cube file (e.g., created by :func:`orbkit.output.cube_creator`).
+  
+  The header is converted to geo_info and geo_spec, and the regular grid is
+  set up. Only grids with axes parallel to x, y, and z are supported. 
+  
+  **Parameters:**
+  
+    filename : str
+      Specifies the filename of the cube file (.cb, .cube, or gzip-compressed 
+      .gz).
+    set_grid : bool, optional
+      If True, the grid of the cube file is set up (cf. :mod:`orbkit.grid`).
+    mmap : bool, optional
+      If True, the data is not parsed at once. Instead, a :class:`CubeData`
+      instance is returned, which parses the requested x-planes of the 
+      memory-mapped file on demand. Not available for gzip-compressed files.
+  
+  **Returns:**
+  
+    data : numpy.ndarray or CubeData, shape=(Nx,Ny,Nz) or (NMO,Nx,Ny,Nz)
+      Contains the data of the cube file. For cube files containing several 
+      molecular orbitals, the first axis corresponds to the orbitals.
+    qc (class QCinfo) with attributes geo_spec, geo_info :
+      See :ref:`Central Variables` for details.
+  '''
+  from orbkit import grid
+  is_gzip = filename.endswith('.gz')
+  if is_gzip:
+    import gzip
+    fid = gzip.open(filename,'rb')
+  else:
+    fid = open(filename,'rb')
+  
+  with fid:
+    # Parse the header
+    header = [fid.readline(),fid.readline()]
+    def read_line(n,dtype=float):
+      line = fid.readline()
+      header.append(line)
+      line = line.split()
+      if len(line) < n:
+        raise IOError('The header of the cube file %s is not valid.' % filename)
+      return [dtype(i) for i in line[:n]]
+    line = read_line(4)
+    natoms = int(line[0])
+    origin = numpy.array(line[1:])
+    N = []
+    axes = []
+    for i in range(3):
+      line = read_line(4)
+      N.append(int(line[0]))
+      axes.append(line[1:])
+    axes = numpy.array(axes)
+    if numpy.count_nonzero(axes - numpy.diag(numpy.diag(axes))):
+      raise NotImplementedError('Only cube files with axes parallel to x, y, ' + 
+                                'and z are supported.')
+    qc = QCinfo()
+    for i in range(abs(natoms)):
+      line = read_line(5)
+      qc.geo_info.append([int(line[0]),i+1,int(line[0])])
+      qc.geo_spec.append(line[2:])
+    qc.format_geo()
+    
+    nval = 1
+    if natoms < 0:
+      # Indices of the molecular orbitals
+      nval = read_line(1,dtype=int)[0]
+      mo_index = header[-1].split()[1:]
+      while len(mo_index) < nval:
+        read_line(1,dtype=int)
+        mo_index.extend(header[-1].split())
+    offset = sum(len(i) for i in header)
+    
+    if any(i < 0 for i in N):
+      # The coordinates are given in Angstrom
+      aa_to_au = 1/0.52917720859
+      origin *= aa_to_au
+      axes *= aa_to_au
+      qc.geo_spec *= aa_to_au
+      N = [abs(i) for i in N]
+    shape = tuple(N)
+    
+    if mmap and not is_gzip:
+      data = CubeData(filename,offset,shape,nval)
+    else:
+      data = numpy.fromstring(fid.read().decode('ascii'),dtype=float,sep=' ')
+      if data.size != numpy.prod(shape)*nval:
+        raise IOError('The cube file %s contains %d instead of %d values.' % 
+                      (filename,data.size,numpy.prod(shape)*nval))
+      data = data.reshape(shape + (nval,))
+      data = data[...,0] if nval == 1 else numpy.moveaxis(data,-1,0)
+  
+  if set_grid:
+    xyz = [origin[i] + axes[i,i]*numpy.arange(N[i]) for i in range(3)]
+    grid.set_grid(*xyz,is_vector=False)
+    grid.delta_ = [axes[i,i] if N[i] > 1 else 1. for i in range(3)]
+    grid.d3r = numpy.prod(grid.delta_)
+  
+  return data, qc
+
+class CubeData(object):
+  '''Lazily parsed data of a cube file (cf. :func:`read_cube`).
+  
+  The data of each x-plane is parsed from the memory-mapped file on demand, 
+  e.g., ``data[10]`` parses the plane x[10] only, while ``data[...]`` or 
+  ``numpy.asarray(data)`` parse the complete file. 
+  
+  If the z-rows of the file do not have the same number of bytes, the 
+  offsets of the x-planes are determined by a single pass over the file.
+  '''
+  def __init__(self,filename,offset,shape,nval=1):
+    import mmap
+    self.filename = filename
+    self.nval = nval
+    self.grid_shape = tuple(shape)
+    self.shape = self.grid_shape if nval == 1 else (nval,) + self.grid_shape
+    with open(filename,'rb') as fid:
+      self.mm = mmap.mmap(fid.fileno(),0,access=mmap.ACCESS_READ)
+    self.offsets = self._get_offsets(offset)
+  
+  def _get_offsets(self,offset):
+    '''Returns the byte offsets of the x-planes (and the end of the data).'''
+    nx,ny,nz = self.grid_shape
+    nrow = nz*self.nval
+    # Number of bytes of the first z-row
+    end = offset
+    count = 0
+    while count < nrow:
+      k = self.mm.find(b'\n',end)
+      k = len(self.mm) if k < 0 else k + 1
+      if k == end:
+        break
+      count += len(self.mm[end:k].split())
+      end = k
+    # If Nz is a multiple of six, each z-row is followed by an empty line
+    # (cf. :func:`orbkit.output.cube_creator`)
+    k = self.mm.find(b'\n',end)
+    if count == nrow and k >= 0 and len(self.mm[end:k].strip()) == 0:
+      end = k + 1
+    row_bytes = end - offset
+    if (count == nrow and 
+        len(self.mm[offset + nx*ny*row_bytes:].strip()) == 0 and 
+        len(self.mm[offset + nx*ny*row_bytes - row_bytes:
+                    offset + nx*ny*row_bytes].split()) == nrow):
+      # All z-rows have the same number of bytes
+      return offset + numpy.arange(nx+1)*ny*row_bytes
+    # Count the values line by line
+    offsets = [offset]
+    count = 0
+    pos = offset
+    self.mm.seek(offset)
+    for line in iter(self.mm.readline,b''):
+      n = len(line.split())
+      count += n
+      pos += len(line)
+      if n and count % (ny*nrow) == 0 and len(offsets) <= nx:
+        offsets.append(pos)
+    if len(offsets) != nx+1 or count != nx*ny*nrow:
+      raise IOError('The cube file %s contains %d instead of %d values.' % 
+                    (self.filename,count,nx*ny*nrow))
+    return numpy.array(offsets)
+  
+  @property
+  def ndim(self):
+    return len(self.shape)
+  
+  @property
+  def size(self):
+    return int(numpy.prod(self.shape))
+  
+  @property
+  def dtype(self):
+    return numpy.dtype(float)
+  
+  def __len__(self):
+    return self.shape[0]
+  
+  def read_planes(self,planes):
+    '''Parses the x-planes with the indices PLANES.
+    
+    **Returns:**
+    
+      data : numpy.ndarray, shape=(NPLANES,Ny,Nz) or (NMO,NPLANES,Ny,Nz)
+    '''
+    nx,ny,nz = self.grid_shape
+    data = numpy.empty((len(planes),ny,nz,self.nval))
+    for i,p in enumerate(planes):
+      block = self.mm[self.offsets[p]:self.offsets[p+1]].decode('ascii')
+      data[i] = numpy.fromstring(block,dtype=float,sep=' ').reshape(
+                                                           (ny,nz,self.nval))
+    return data[...,0] if self.nval == 1 else numpy.moveaxis(data,-1,0)
+  
+  def __getitem__(self,index):
+    if not isinstance(index,tuple):
+      index = (index,)
+    ax = 0 if self.nval == 1 else 1
+    n = self.grid_shape[0]
+    if any(i is Ellipsis for i in index) or len(index) <= ax:
+      return self.read_planes(range(n))[index]
+    ix = index[ax]
+    if isinstance(ix,(int,numpy.integer)):
+      if not -n <= ix < n:
+        raise IndexError('index %d is out of bounds for axis %d with size %d' 
+                         % (ix,ax,n))
+      planes = [ix % n]
+      index = index[:ax] + (0,) + index[ax+1:]
+    elif isinstance(ix,slice):
+      planes = range(*ix.indices(n))
+      index = index[:ax] + (slice(None),) + index[ax+1:]
+    else:
+      planes = range(n)
+    return self.read_planes(planes)[index]
+  
+  def __array__(self,dtype=None):
+    data = self.read_planes(range(self.grid_shape[0]))
+    return data if dtype is None else data.astype(dtype)
+  
+  def close(self):
+    self.mm.close()
+
 def get_ao_spherical(ao_spec,p=[1,0]):
   ao_spherical = []
   for i,ao in enumerate(ao_spec):
@@ -2324,7 +2859,8 @@ def mo_select(mo_spec, fid_mo_list, strict=False):
     Dictionary with following Members:
       :mo: - List of molecular orbital labels.
       :mo_ii: - List of molecular orbital indices.
-      :mo_spec: - Selected elements of mo_spec. See :ref:`Central Variables` for details.
+      :mo_spec: - Selected elements of mo_spec (:class:`orbkit.qcinfo.MOSpec` 
+        sharing the data with mo_spec). See :ref:`Central Variables` for details.
       :mo_in_file: - List of molecular orbital labels within the fid_mo_list file.
       :sym_select: - If True, symmetry labels have been used. 
   
@@ -2342,21 +2878,29 @@ def mo_select(mo_spec, fid_mo_list, strict=False):
   mo_in_file = []
   selected_mo = []
   sym_select = False
-  
-  def assign_selected_mo(selected_mo,mo_spec,strict=False,  
-                          what=lambda x,y: y[x]['sym']):
-    selected_mo_spec = []
-    selected_mo_ii = [] 
+  if not isinstance(mo_spec,MOSpec):
+    mo_spec = MOSpec(mo_spec)
+  
+  def assign_selected_mo(selected_mo,labels,strict=False):
+    # Positions of the labels in mo_spec
+    positions = {}
+    for k,label in enumerate(labels):
+      positions.setdefault(label,[]).append(k)
+    index = []
+    selected_mo_ii = []
+    selected = set()
     for i in selected_mo:
-      is_present = False
-      for k in range(len(mo_spec)):
-        if (what(k,mo_spec) == i):
-          is_present = True
-          if strict or (i not in selected_mo_ii):
-            selected_mo_spec.append(mo_spec[k])
-            selected_mo_ii.append(what(k,mo_spec))
-      if not is_present:
+      if i not in positions:
         raise IOError('Cannot find %s in mo_spec' % i)
+      if strict:
+        index.extend(positions[i])
+        selected_mo_ii.extend([i]*len(positions[i]))
+      elif i not in selected:
+        index.append(positions[i][0])
+        selected_mo_ii.append(i)
+        selected.add(i)
+    # Index view of the selected molecular orbitals
+    selected_mo_spec = mo_spec[numpy.array(index,dtype=numpy.intp)]
     selected_mo_ii = numpy.array(selected_mo_ii)
     return selected_mo_spec,selected_mo_ii
   
@@ -2369,11 +2913,6 @@ def mo_select(mo_spec, fid_mo_list, strict=False):
     return x
   
   def get_selection(selected_mo):
-    mo_occup = numpy.array([i['occ_num'] for i in mo_spec])
-    homo = (mo_occup>0.).nonzero()[0][-1]   + 1 # molden numbering
-    lumo = (mo_occup>0.).nonzero()[0][-1]+1 + 1 # molden numbering
-    mo_energy = numpy.array([i['energy'] for i in mo_spec])
-    last_bound = sum(mo_energy<=0.0)            # molden numbering
     sel = []
     for i in selected_mo:
       i = i.lower().replace('homo',str(homo)).replace('lumo',str(lumo))
@@ -2390,10 +2929,10 @@ def mo_select(mo_spec, fid_mo_list, strict=False):
     return sel
   
   if isinstance(fid_mo_list,str) and fid_mo_list.lower() == 'all_mo':
-    selected_mo = numpy.array(numpy.arange(len(mo_spec))+1, dtype=numpy.str)
+    selected_mo = numpy.array(numpy.arange(len(mo_spec))+1, dtype=str)
     mo_in_file = [selected_mo]
     selected_mo_spec = mo_spec
-    selected_mo_ii = numpy.array([i['sym'] for i in selected_mo_spec])
+    selected_mo_ii = numpy.array(mo_spec.sym.tolist())
   else:
     if isinstance(fid_mo_list,str) and not os.path.exists(fid_mo_list):
       if ',' in fid_mo_list:
@@ -2449,23 +2988,25 @@ def mo_select(mo_spec, fid_mo_list, strict=False):
                       'symmetry labels')
     
     if sym_select:
-      what = lambda x,y: y[x]['sym']
       selected_mo_spec,selected_mo_ii = assign_selected_mo(selected_mo,
-                                                           mo_spec,
-                                                           strict=strict,
-                                                           what=what)
+                                                           mo_spec.sym,
+                                                           strict=strict)
     else:
+      mo_occup = mo_spec.occ_num
+      homo = (mo_occup>0.).nonzero()[0][-1]   + 1 # molden numbering
+      lumo = (mo_occup>0.).nonzero()[0][-1]+1 + 1 # molden numbering
+      mo_energy = mo_spec.energy
+      last_bound = (mo_energy<=0.0).sum()         # molden numbering
       selected_mo = get_selection(selected_mo)
       
       if not strict:
         selected_mo = list(map(int, selected_mo))            
         selected_mo.sort()
       selected_mo = list(map(str, selected_mo))
-      what = lambda x,y: str(x+1)
+      labels = [str(k+1) for k in range(len(mo_spec))]
       selected_mo_spec,selected_mo_ii = assign_selected_mo(selected_mo,
-                                                           mo_spec,
-                                                           strict=strict,
-                                                           what=what)
+                                                           labels,
+                                                           strict=strict)
       selected_mo = selected_mo_ii
       for i in range(len(mo_in_file)):
         mo_in_file[i] = list(map(str, get_selection(mo_in_file[i])))
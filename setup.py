@@ -4,9 +4,18 @@ from distutils.core import setup
 from distutils.extension import Extension
 from Cython.Distutils import build_ext
 from os.path import join
+import os
 
 import numpy
 
+# The Cython kernels use OpenMP (cf. options.numthreads). 
+# Set ORBKIT_OPENMP=0 for compilers without OpenMP support.
+if os.environ.get('ORBKIT_OPENMP','1') == '0':
+  openmp = {}
+else:
+  openmp = {'extra_compile_args': ['-fopenmp'], 
+            'extra_link_args': ['-fopenmp']}
+
 setup(
     cmdclass = {'build_ext': build_ext},
     ext_modules = [Extension("orbkit.cy_grid",
@@ -19,6 +28,7 @@ setup(
                              "orbkit/c_support.c"],
                     include_dirs=[numpy.get_include()],
                     depends=[join('orbkit', '*.h')],
+                    **openmp
                     ),
                    Extension("orbkit.cy_overlap",
                     sources=["orbkit/cy_overlap.pyx",
@@ -26,6 +36,7 @@ setup(
                              "orbkit/c_support.c"],
                     include_dirs=[numpy.get_include()],
                     depends=[join('orbkit', '*.h')],
+                    **openmp
                     ),
                    # detCI@ORBKIT
                    Extension("orbkit.detci.cy_occ_check",
@@ -35,6 +46,7 @@ setup(
                    Extension("orbkit.detci.cy_ci",
                     sources=["orbkit/detci/cy_ci.pyx"],
                     include_dirs=[numpy.get_include()],
+                    **openmp
                     ),
                    ],
 )
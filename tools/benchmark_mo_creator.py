@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+'''Benchmark of the molecular orbital contraction mo_list = mo_coeff . ao_list.
+
+Compares the BLAS-backed kernel :func:`orbkit.cy_core.mocreator` (used by
+:func:`orbkit.core.mo_creator`) with the former triple loop
+:func:`orbkit.cy_core.mocreator_naive` for various numbers of atomic orbitals
+(NAO), molecular orbitals (NMO), and grid points (NPTS).
+
+Usage::
+
+  python benchmark_mo_creator.py [--repeat=3] [--skip_naive]
+'''
+
+from __future__ import print_function
+
+import sys
+import time
+import numpy
+
+from orbkit import cy_core
+
+sizes = [# (NAO, NMO, NPTS)
+         ( 25,  10, 10000),
+         (100,  50, 10000),
+         (100,  50, 50000),
+         (300, 150, 10000),
+         (300, 150, 50000),
+         (600, 300, 10000),
+        ]
+
+def timeit(func,repeat=3):
+  '''Returns the best wall-clock time of `repeat` calls of func().'''
+  t = []
+  for i in range(repeat):
+    t0 = time.time()
+    func()
+    t.append(time.time() - t0)
+  return min(t)
+
+def run(repeat=3,skip_naive=False):
+  print('%5s %5s %7s %12s %12s %12s %9s' % ('NAO','NMO','NPTS','naive/s',
+                                             'blas/s','blas+out/s','speedup'))
+  for nao,nmo,npts in sizes:
+    ao_list = numpy.random.rand(nao,npts)
+    mo_coeff = numpy.random.rand(nmo,nao)
+    out = numpy.empty((nmo,npts))
+    t_blas = timeit(lambda: cy_core.mocreator(ao_list,mo_coeff),repeat)
+    t_out = timeit(lambda: cy_core.mocreator(ao_list,mo_coeff,out=out),repeat)
+    if skip_naive:
+      t_naive = numpy.nan
+    else:
+      t_naive = timeit(lambda: cy_core.mocreator_naive(ao_list,mo_coeff),repeat)
+      ref = cy_core.mocreator_naive(ao_list,mo_coeff)
+      if not numpy.allclose(out,ref):
+        raise ValueError('Results of the BLAS and the naive kernel differ.')
+    print('%5d %5d %7d %12.4f %12.4f %12.4f %9.1f' % (nao,nmo,npts,t_naive,
+                                                      t_blas,t_out,
+                                                      t_naive/t_out))
+
+if __name__ == '__main__':
+  repeat = 3
+  for arg in sys.argv[1:]:
+    if arg.startswith('--repeat='):
+      repeat = int(arg.split('=')[1])
+  run(repeat=repeat,skip_naive='--skip_naive' in sys.argv)